@@ -0,0 +1,19 @@
+import json
+import sys
+
+import pandas as pd
+from src.models.forecast import train_forecast_model
+
+# Trains the multi-horizon soil forecast on a csv of samples (nothing is uploaded) and prints the per-horizon RMSE.
+# Usage: python -m cli.forecast [path/to/data.csv]
+
+csv_path = sys.argv[1] if len(sys.argv) > 1 else "src/testdata.csv"
+
+df = pd.read_csv(csv_path, parse_dates=["timestamp"])
+
+sample_list = df.copy()
+sample_list["timestamp"] = sample_list["timestamp"].dt.strftime("%Y-%m-%dT%H:%M:%S")
+sample_list = sample_list.to_dict(orient="records")
+
+result = train_forecast_model(json.dumps(sample_list), upload=False)
+print(json.dumps(result, indent=2))
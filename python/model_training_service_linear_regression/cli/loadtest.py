@@ -0,0 +1,95 @@
+import argparse
+import glob
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+# End-to-end load test of scheduler.job() against the local MAL-API stand-in and a filesystem blob store.
+# Each size runs the real job in a fresh process (own models dir, blob dir and trace), so peak RSS is per run.
+# Usage: python -m cli.loadtest [--sizes 10000 50000 200000] [--latency-ms 200] [--output out.json]
+
+SPANS = ["fetch", "parse", "clean", "target", "fit", "export", "upload"]
+
+
+def run_once():
+    """Child process: runs job() once with the environment prepared by the parent and prints a JSON summary."""
+    from src.scheduler import job
+
+    start = time.perf_counter()
+    job()
+    wall_s = time.perf_counter() - start
+
+    spans = {}
+    for trace_file in glob.glob(os.path.join(os.environ["TRAINING_TRACE_DIR"], "*.trace.jsonl")):
+        with open(trace_file) as f:
+            for line in f:
+                record = json.loads(line)
+                if record["name"] in SPANS:
+                    spans[record["name"]] = round(record["duration_ms"] / 1000, 3)
+
+    blob_dir = os.environ["MODEL_BLOB_DIR"]
+    print(json.dumps({
+        "ok": bool(glob.glob(os.path.join(blob_dir, "*.metadata.json"))),
+        "wall_s": round(wall_s, 3),
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "spans_s": spans,
+    }))
+
+
+def run_sizes(sizes, latency_s: float, threshold: float):
+    from src.services.mal_api_standin import MalApiStandIn
+
+    results = []
+    with MalApiStandIn(n_samples=sizes[0], threshold=threshold, latency_s=latency_s) as standin, \
+            tempfile.TemporaryDirectory() as scratch:
+        for n in sizes:
+            standin.set_samples(n)
+            bytes_before = standin.bytes_served
+            run_dir = os.path.join(scratch, str(n))
+            env = dict(
+                os.environ,
+                MAL_API_BASE_URL=standin.base_url,
+                MODEL_BLOB_DIR=os.path.join(run_dir, "blobs"),
+                MODELS_DIR=os.path.join(run_dir, "models"),
+                TRAINING_TRACE="1",
+                TRAINING_TRACE_DIR=os.path.join(run_dir, "traces"),
+            )
+            proc = subprocess.run([sys.executable, "-m", "cli.loadtest", "--run-once"], env=env,
+                                  capture_output=True, text=True)
+            if proc.returncode != 0:
+                raise RuntimeError(f"Load test run with {n} samples failed:\n{proc.stderr[-2000:]}")
+
+            summary = json.loads(proc.stdout.strip().splitlines()[-1])
+            summary.update({
+                "samples": n,
+                "payload_mb": round((standin.bytes_served - bytes_before) / 1e6, 2),
+                "samples_per_s": round(n / summary["wall_s"], 1),
+            })
+            results.append(summary)
+            print(f"{n:>9} samples: ok={summary['ok']} wall={summary['wall_s']:.2f}s "
+                  f"throughput={summary['samples_per_s']:.0f}/s peak_rss={summary['peak_rss_mb']}MB "
+                  f"spans={summary['spans_s']}", flush=True)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end load test of scheduler.job()")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 50_000, 200_000])
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--threshold", type=float, default=30)
+    parser.add_argument("--output")
+    parser.add_argument("--run-once", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_once:
+        run_once()
+    else:
+        results = run_sizes(args.sizes, args.latency_ms / 1000, args.threshold)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(results, f, indent=2)
@@ -4,8 +4,6 @@ import time
 from http.server import HTTPServer, BaseHTTPRequestHandler
 
 import onnx
-import onnxconverter_common
-import skl2onnx
 from src.config import HEALTH_PORT
 from src.scheduler import start_scheduler
 
@@ -36,8 +34,6 @@ if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
 
     logger.info(f"ONNX version: {onnx.__version__}")
-    logger.info(f"skl2onnx version: {skl2onnx.__version__}")
-    logger.info(f"onnxconverter_common version: {onnxconverter_common.__version__}")
 
     # Start scheduler i en baggrundstråd
     scheduler_thread = threading.Thread(target=run_scheduler, daemon=True)
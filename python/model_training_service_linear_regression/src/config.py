@@ -1,10 +1,125 @@
-# Endpoints (hardcoded)
-SENSOR_BASE_URL = "https://mal-api.whitebush-734a9017.northeurope.azurecontainerapps.io"
-DATA_ENDPOINT = "https://mal-api.whitebush-734a9017.northeurope.azurecontainerapps.io/sensor/data"
-THRESHOLD_ENDPOINT = "https://mal-api.whitebush-734a9017.northeurope.azurecontainerapps.io/sensor/soilhumiditythreshold"
+import os
+import tempfile
+
+# Endpoints. MAL_API_BASE_URL points the service at another MAL-API, e.g. the local stand-in used by load tests
+SENSOR_BASE_URL = os.getenv("MAL_API_BASE_URL", "https://mal-api.whitebush-734a9017.northeurope.azurecontainerapps.io")
+DATA_ENDPOINT = f"{SENSOR_BASE_URL}/sensor/data"
+THRESHOLD_ENDPOINT = f"{SENSOR_BASE_URL}/sensor/soilhumiditythreshold"
+
+# When set, this directory is used as the 'models' blob container instead of Azure Blob Storage
+LOCAL_BLOB_DIR = os.getenv("MODEL_BLOB_DIR")
 
 # HTTP-server & scheduler (hardcoded)
 HEALTH_PORT = 8081
 TIMEZONE = "Europe/Copenhagen"
 # Cron expression for scheduling jobs: minute hour day month weekday
 SCHEDULE_CRON = "0 0 * * *"
+
+# Event-driven retraining next to the cron job. The cron job stays as a fallback but skips runs with no new samples
+TRIGGERS_ENABLED = True
+# How often new samples are counted and drift is scored
+TRIGGER_POLL_SECONDS = 300
+# Retrain once this many samples arrived since the last trained model
+TRIGGER_MIN_NEW_SAMPLES = 144
+# Retrain when the max per-feature KS distance of the new samples exceeds this, given enough of them
+TRIGGER_DRIFT_THRESHOLD = 0.3
+TRIGGER_DRIFT_MIN_SAMPLES = 36
+# Triggers arriving within this window are merged into one run
+TRIGGER_DEBOUNCE_SECONDS = 600
+# Minimum time between two training runs, bounds compute when data keeps drifting
+TRIGGER_MIN_INTERVAL_SECONDS = 3600
+# After a failed run the interval doubles per consecutive failure, up to this. A successful run resets it
+TRIGGER_MAX_BACKOFF_SECONDS = 86400
+
+# Single-leader training across replicas (services/job_lock.py): each run first claims its schedule slot, and replicas
+# that find it claimed skip the run. JOB_LOCK_BACKEND=blob leases a lock blob in the models container (set in the
+# Dockerfile), =file locks files in JOB_LOCK_DIR (one host: tests, local stack). Unset, every replica trains
+JOB_LOCK_BACKEND = os.getenv("JOB_LOCK_BACKEND", "")
+JOB_LOCK_DIR = os.getenv("JOB_LOCK_DIR", os.path.join(LOCAL_BLOB_DIR or tempfile.gettempdir(), "locks"))
+# Runs within the same slot of this many seconds are one run, at most one replica trains per slot
+JOB_LOCK_SLOT_SECONDS = 3600
+# A claim lapses this long after its holder stopped renewing it (blob leases allow 15-60 s)
+JOB_LOCK_TTL_SECONDS = 60
+
+# Spike filter in clean_sensor_data (data/cleaning.py filter_spikes): per device, readings further than
+# SPIKE_FILTER_SENSITIVITY scaled MADs from the median of the centred SPIKE_FILTER_WINDOW samples are repaired to it
+# (single spikes) or dropped (runs of spikes). The MAD is the median of |reading - that median| over the same window
+# (Hampel filter). Off by default
+SPIKE_FILTER_ENABLED = False
+# Centred window in samples, odd
+SPIKE_FILTER_WINDOW = 7
+SPIKE_FILTER_SENSITIVITY = 3.0
+# Checked columns, with the smallest deviation that counts as a spike (flat signals have a MAD of 0)
+SPIKE_FILTER_MIN_DEVIATION = {"soil_humidity": 5.0, "air_humidity": 10.0, "temperature": 3.0}
+
+# Ridge training mode: "incremental" folds only new rows into the persisted sufficient statistics,
+# "full" refits (with hyperparameter search) on the whole history every run
+RIDGE_TRAINING_MODE = "incremental"
+# Force a full refit after this many consecutive incremental runs
+RIDGE_FULL_REFIT_EVERY = 7
+# Incremental runs never drop folded-in rows, so a full refit is forced once the oldest of them is more than this many
+# days older than the training window (TRAINING_MAX_AGE_DAYS) start
+RIDGE_WINDOW_SLACK_DAYS = 7
+# Max per-feature KS distance between the newest day of rows and the previous run's reference window before a full
+# refit is forced. Calibrated on nightly runs over generated drying cycles with days-long weather (air humidity
+# sd 10%): drying cycles alone score up to ~0.55, weather up to ~0.8 (99th percentile 0.77). A sensor reading outside
+# its usual range (swapped, miscalibrated) scores close to 1
+DRIFT_REFIT_THRESHOLD = 0.85
+# The reference window: sketches of this many days before each run's newest sample are kept with the model
+DRIFT_REFERENCE_DAYS = 7
+# "native" exports the Ridge pipeline as a single Gemm with the scaler folded into the coefficients (onnx only),
+# "skl2onnx" uses the converter stack. Native export falls back to skl2onnx if its predictions differ by more
+# than RIDGE_ONNX_PARITY_TOLERANCE minutes from the pipeline on the training rows
+RIDGE_ONNX_EXPORTER = "native"
+RIDGE_ONNX_PARITY_TOLERANCE = 0.1
+
+# Warm-started hyperparameter search: full refits first search the previous model's best parameters and their
+# neighbours within WARM_START_RADIUS grid steps (one parameter at a time). The full grid is searched only if that
+# CV RMSE is worse than the previous model's by more than WARM_START_TOLERANCE (relative)
+WARM_START_SEARCH = True
+WARM_START_RADIUS = 2
+WARM_START_TOLERANCE = 0.05
+
+# threshold is a model feature: targets are built for every threshold in this grid and stacked, so one model
+# serves any threshold. Set to None to train only on the threshold from /sensor/soilhumiditythreshold
+TARGET_THRESHOLD_GRID = [10, 15, 20, 25, 30, 35, 40, 45, 50, 55, 60]
+# Cap on stacked (sample, threshold) training rows, sampled evenly across the grid. Only used when TRAINING_MAX_ROWS is None
+TARGET_GRID_MAX_ROWS = 200_000
+
+# Training data budget, so fit time and memory stay flat as the sensor history grows. None disables a limit.
+# Samples older than this many days before the newest sample are not trained on
+TRAINING_MAX_AGE_DAYS = 180
+# Samples are averaged onto a regular grid of this many minutes before targets are built
+TRAINING_RESAMPLE_MINUTES = 10
+# Labelled training rows kept after downsampling. Every drying cycle keeps at least one row
+TRAINING_MAX_ROWS = 100_000
+# Recent drying cycles get a larger share of the rows: the weight halves every this many days
+TRAINING_DECAY_HALF_LIFE_DAYS = 30
+
+# Multi-horizon forecast mode: one multi-output model predicting soil humidity this many minutes ahead
+FORECAST_HORIZONS_MINUTES = [60, 180, 360, 720]
+# A horizon target is the sample nearest to t + horizon, if it is at most this far from it
+FORECAST_HORIZON_TOLERANCE_MINUTES = 10
+
+# Temporal features (src/features/temporal.py): gap-aware lags, rolling means/slopes and EWMs per device, appended
+# after FEATURE_COLS. Off by default: the prediction build service feeds the 8 FEATURE_COLS only
+TEMPORAL_FEATURES = False
+# Soil humidity change since this many minutes ago
+TEMPORAL_LAGS_MINUTES = [30, 60, 180]
+# Rolling mean and slope windows
+TEMPORAL_ROLLING_MINUTES = [60, 360]
+# EWM half-lives
+TEMPORAL_EWM_HALFLIFE_MINUTES = [60, 360]
+# A lag value is the sample nearest to t - lag, if it is at most this far from it
+TEMPORAL_LAG_TOLERANCE_MINUTES = 10
+
+
+# Tracing (opt-in). Read from the environment so it can be switched on for a run without a new image.
+# TRAINING_TRACE=1 writes a JSONL span trace per run to TRACE_DIR; TRAINING_PROFILER=cprofile|sampling adds a profile
+TRACE_ENABLED = os.getenv("TRAINING_TRACE", "0") == "1"
+TRACE_DIR = os.getenv("TRAINING_TRACE_DIR", os.path.join(tempfile.gettempdir(), "training_traces"))
+TRACE_PROFILER = os.getenv("TRAINING_PROFILER", "")
+# Seconds between stack samples for the sampling profiler
+TRACE_SAMPLE_INTERVAL_S = float(os.getenv("TRAINING_PROFILER_INTERVAL", "0.005"))
+# Also upload trace and profile to blob storage under traces/
+TRACE_UPLOAD = os.getenv("TRAINING_TRACE_UPLOAD", "0") == "1"
@@ -1,14 +1,82 @@
 import logging
+from typing import Optional
 
+import numpy as np
 import pandas as pd
+from src.config import SPIKE_FILTER_ENABLED, SPIKE_FILTER_MIN_DEVIATION, SPIKE_FILTER_SENSITIVITY, SPIKE_FILTER_WINDOW
+from src.services.tracing import span
 
 logger = logging.getLogger(__name__)
 
+# Scales a MAD to the standard deviation of normally distributed data
+_MAD_TO_STD = 1.4826
 
-def clean_sensor_data(df: pd.DataFrame, expected_interval_minutes=20, gap_drop_threshold=60) -> pd.DataFrame:
+
+def filter_spikes(df: pd.DataFrame, min_deviation: dict, window: int, sensitivity: float,
+                  group_col: str = "device_id"):
+    """
+    Hampel filter per device: a reading is a spike if it is further than sensitivity * 1.4826 * MAD from the
+    median of the centred window of `window` samples (odd, at least 3), and at least min_deviation[column]
+    from it. The MAD is the median absolute deviation of the window's readings from that same median.
+    Only columns in min_deviation are checked; the floor keeps flat signals (MAD 0) from flagging sensor
+    noise. Medians need at least half the window, so the first and last readings of a short device history
+    are kept as they are.
+
+    A spike with unflagged neighbours is repaired to the window median. Rows in a run of consecutive spikes
+    are dropped, no value in the window is trustworthy there. Step changes (watering) are not spikes.
+
+    Returns (df without the dropped rows, in input order, report) where report holds the "dropped" row
+    count and the "repaired" value count per column.
+    """
+    if window < 3 or window % 2 == 0:
+        raise ValueError(f"Spike filter window must be an odd number of at least 3 samples, got {window}")
+    report = {"window": window, "sensitivity": sensitivity, "dropped": 0, "repaired": {}}
+    if df.empty:
+        return df, report
+
+    # All devices in one array sorted by device and time, each preceded by half a window of NaN. Rolling
+    # windows then never mix devices (the median skips NaN), and neighbours across a device boundary are NaN
+    half = window // 2
+    groups = pd.factorize(df[group_col])[0] if group_col in df else np.zeros(len(df), dtype=int)
+    order = np.lexsort((df["timestamp"].to_numpy("datetime64[ns]").astype("int64"), groups))
+    sorted_groups = groups[order]
+    group_starts = np.r_[True, sorted_groups[1:] != sorted_groups[:-1]]
+    positions = np.arange(len(df)) + np.cumsum(group_starts) * half
+    offsets = np.arange(-half, half + 1)
+
+    df = df.copy()
+    drop = np.zeros(len(df), dtype=bool)
+    for column, floor in min_deviation.items():
+        padded = np.full(len(df) + (group_starts.sum() + 1) * half, np.nan)
+        padded[positions] = df[column].to_numpy(dtype=float)[order]
+        median = pd.Series(padded).rolling(window, center=True, min_periods=half + 1).median().to_numpy()
+        deviation = np.abs(padded - median)
+
+        # The MAD is only needed where the deviation passes the floor, a small share of the rows. A candidate
+        # has a median, so its window holds more than half a window of readings (padding is NaN)
+        candidates = positions[deviation[positions] > floor]
+        mad = np.nanmedian(np.abs(padded[candidates[:, None] + offsets] - median[candidates, None]), axis=1)
+        spikes = np.zeros(len(padded), dtype=bool)
+        spikes[candidates] = deviation[candidates] > sensitivity * _MAD_TO_STD * mad
+
+        isolated = spikes & ~np.r_[False, spikes[:-1]] & ~np.r_[spikes[1:], False]
+        padded[isolated] = median[isolated]
+        repaired = np.empty(len(df))
+        repaired[order] = padded[positions]
+        df[column] = repaired
+        drop[order[(spikes & ~isolated)[positions]]] = True
+        report["repaired"][column] = int(isolated.sum())
+
+    report["dropped"] = int(drop.sum())
+    return df[~drop], report
+
+
+def clean_sensor_data(df: pd.DataFrame, expected_interval_minutes=20, gap_drop_threshold=60,
+                      spike_filter: Optional[bool] = None) -> pd.DataFrame:
     """
     Cleans sensor data by:
     - Filtering out physically impossible values
+    - Repairing or dropping spikes per device (filter_spikes), if spike_filter (default SPIKE_FILTER_ENABLED)
     - Detecting and handling gaps in data
     - Adjusting soil_delta where needed
     """
@@ -25,6 +93,14 @@ def clean_sensor_data(df: pd.DataFrame, expected_interval_minutes=20, gap_drop_t
 
     logger.info("Samples after hard limits filter: %d", len(df_clean))
 
+    if SPIKE_FILTER_ENABLED if spike_filter is None else spike_filter:
+        with span("spike_filter") as s:
+            df_clean, report = filter_spikes(df_clean, SPIKE_FILTER_MIN_DEVIATION, SPIKE_FILTER_WINDOW,
+                                             SPIKE_FILTER_SENSITIVITY)
+            s.update(dropped=report["dropped"], repaired=sum(report["repaired"].values()))
+        logger.info("Spike filter: dropped %d samples, repaired %s. Remaining: %d",
+                    report["dropped"], report["repaired"], len(df_clean))
+
     # Sort by timestamp
     df_clean.sort_values("timestamp", inplace=True)
 
@@ -8,6 +8,13 @@ def fetch_sensor_data(timeout=120):
     return r.json()
 
 
+def fetch_sensor_data_since(since: str, timeout=30):
+    """Samples newer than since (ISO timestamp). Used by the retraining triggers to poll cheaply."""
+    r = requests.get(DATA_ENDPOINT, params={"from": since}, timeout=timeout)
+    r.raise_for_status()
+    return r.json()
+
+
 def fetch_threshold(timeout=120):
     r = requests.get(THRESHOLD_ENDPOINT, timeout=timeout)
     r.raise_for_status()
@@ -0,0 +1,75 @@
+import logging
+
+import pandas as pd
+from src.config import (TRAINING_MAX_AGE_DAYS, TRAINING_RESAMPLE_MINUTES, TRAINING_MAX_ROWS,
+                        TRAINING_DECAY_HALF_LIFE_DAYS, FORECAST_HORIZON_TOLERANCE_MINUTES)
+from src.data.cleaning import clean_sensor_data
+from src.data.parsing import parse_samples
+from src.data.window import apply_training_window, downsample_training_rows
+from src.features.engineering import add_time_features
+from src.features.horizons import add_soil_horizons
+from src.services.tracing import span
+
+logger = logging.getLogger(__name__)
+
+
+def load_clean_samples(json_samples: str) -> pd.DataFrame:
+    """parse -> clean, the first steps of every trainer. Returns an empty frame when nothing usable is left."""
+    with span("parse", payload_bytes=len(json_samples)) as s:
+        df = parse_samples(json_samples)
+        s["rows"] = len(df)
+    with span("clean") as s:
+        df = clean_sensor_data(df, expected_interval_minutes=10, gap_drop_threshold=60)
+        s["rows"] = len(df)
+    if df.empty:
+        logger.error("No valid samples after data cleaning.")
+    return df
+
+
+def training_budget(window: dict, rows: dict) -> dict:
+    """The "training_budget" metadata block: the TRAINING_* settings, the kept window and the row counts."""
+    return {
+        "max_age_days": TRAINING_MAX_AGE_DAYS,
+        "resample_minutes": TRAINING_RESAMPLE_MINUTES,
+        "max_rows": TRAINING_MAX_ROWS,
+        "decay_half_life_days": TRAINING_DECAY_HALF_LIFE_DAYS,
+        **window,
+        **rows,
+    }
+
+
+def prepare_forecast_frame(json_samples: str, horizons_minutes):
+    """
+    Data pipeline for the multi-horizon forecast: parse -> clean -> window -> horizon targets -> downsample
+    -> features. Returns (df, training_budget, error_message): error_message is None unless no rows are left.
+    """
+    df = load_clean_samples(json_samples)
+    if df.empty:
+        return df, None, "No valid training samples found after cleaning."
+
+    with span("window") as s:
+        df, window = apply_training_window(df, TRAINING_MAX_AGE_DAYS, TRAINING_RESAMPLE_MINUTES)
+        s["rows"] = len(df)
+    with span("target", horizons=list(horizons_minutes)) as s:
+        df = add_soil_horizons(df, horizons_minutes, FORECAST_HORIZON_TOLERANCE_MINUTES)
+        s["rows"] = len(df)
+    if df.empty:
+        logger.error("No samples with observed values at every forecast horizon.")
+        return df, None, "No samples with observed values at every forecast horizon."
+
+    with span("downsample") as s:
+        df, rows = downsample_training_rows(df, TRAINING_MAX_ROWS, TRAINING_DECAY_HALF_LIFE_DAYS)
+        s["rows"] = len(df)
+    with span("features"):
+        df = add_time_features(df)
+    return df, training_budget(window, rows), None
+
+
+def empty_result(message: str) -> dict:
+    return {
+        "message": message,
+        "model_file": None,
+        "metadata_file": None,
+        "rmse_cv": None,
+        "r2_insample": None
+    }
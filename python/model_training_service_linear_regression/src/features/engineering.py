@@ -0,0 +1,22 @@
+import numpy as np
+import pandas as pd
+
+FEATURE_COLS = [
+    "soil_humidity",
+    "soil_delta",
+    "air_humidity",
+    "temperature",
+    "light",
+    "hour_sin",
+    "hour_cos",
+    "threshold",
+]
+
+# The soil forecast does not depend on a threshold
+FORECAST_FEATURE_COLS = [c for c in FEATURE_COLS if c != "threshold"]
+
+
+def add_time_features(df: pd.DataFrame) -> pd.DataFrame:
+    df["hour_sin"] = np.sin(df["timestamp"].dt.hour / 24 * 2 * np.pi)
+    df["hour_cos"] = np.cos(df["timestamp"].dt.hour / 24 * 2 * np.pi)
+    return df
@@ -0,0 +1,48 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+def horizon_target_cols(horizons_minutes) -> list:
+    return [f"soil_humidity_plus_{int(h)}min" for h in horizons_minutes]
+
+
+def soil_at_horizons(soil: np.ndarray, ts_minutes: np.ndarray, horizons_minutes, tolerance_minutes: float) -> np.ndarray:
+    """
+    Soil humidity horizon minutes after each sample, shape (samples, horizons). Timestamps must be sorted.
+
+    Uses the sample nearest to t + horizon, found for all rows and horizons with one searchsorted.
+    NaN where no sample lies within tolerance_minutes of it (end of the series, sensor gaps).
+    """
+    horizons = np.asarray(horizons_minutes, dtype=ts_minutes.dtype)
+    n = ts_minutes.size
+    if n == 0:
+        return np.empty((0, horizons.size))
+
+    wanted = ts_minutes[:, None] + horizons[None, :]
+    after = np.minimum(np.searchsorted(ts_minutes, wanted, side="left"), n - 1)
+    before = np.maximum(after - 1, 0)
+    nearest = np.where(np.abs(ts_minutes[before] - wanted) <= np.abs(ts_minutes[after] - wanted), before, after)
+
+    return np.where(np.abs(ts_minutes[nearest] - wanted) <= tolerance_minutes, soil[nearest], np.nan)
+
+
+def add_soil_horizons(df: pd.DataFrame, horizons_minutes, tolerance_minutes: float = 10) -> pd.DataFrame:
+    """
+    Adds one soil humidity target column per horizon (see horizon_target_cols) to the cleaned, sorted
+    samples and drops rows where any horizon has no observed value.
+    """
+    soil = df["soil_humidity"].to_numpy(dtype=float)
+    ts_minutes = df["timestamp"].values.astype("datetime64[m]").view("int")
+
+    targets = soil_at_horizons(soil, ts_minutes, horizons_minutes, tolerance_minutes)
+    complete = ~np.isnan(targets).any(axis=1)
+
+    out = df[complete].copy()
+    out[horizon_target_cols(horizons_minutes)] = targets[complete]
+    logger.info("Horizon targets %s min: %d of %d samples have all horizons.", list(horizons_minutes),
+                len(out), len(df))
+    return out
@@ -0,0 +1,126 @@
+import json
+import logging
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.linear_model import Ridge
+from sklearn.metrics import r2_score
+from sklearn.model_selection import TimeSeriesSplit, GridSearchCV
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+from src.config import FORECAST_HORIZONS_MINUTES
+from src.data.preparation import empty_result, prepare_forecast_frame
+from src.features.engineering import FORECAST_FEATURE_COLS
+from src.features.horizons import horizon_target_cols
+from src.models import ridge as ridge_mod
+from src.models.onnx_export import export_ridge_onnx
+from src.services.blob_uploader import upload_to_blob
+from src.services.tracing import record_cv_fits, span, trace_run
+
+logger = logging.getLogger(__name__)
+
+BASE_NAME = "soil_humidity_forecast_ridge"
+
+
+def train_forecast_model(json_samples: str, upload: bool = False) -> dict:
+    """
+    Multi-horizon soil humidity forecast: one Ridge fit with a target column per FORECAST_HORIZONS_MINUTES
+    entry, exported as one ONNX graph whose output row is the whole forecast.
+
+    Upload is off by default: the prediction build service does not know this model type yet.
+    """
+    with trace_run("train_forecast_model", upload=upload) as trace:
+        result = _train_forecast_model(json_samples, upload)
+        trace["message"] = result["message"]
+        return result
+
+
+def _train_forecast_model(json_samples: str, upload: bool) -> dict:
+    horizons = list(FORECAST_HORIZONS_MINUTES)
+    target_cols = horizon_target_cols(horizons)
+
+    df, training_budget, error = prepare_forecast_frame(json_samples, horizons)
+    if error:
+        return empty_result(error)
+    X = df[FORECAST_FEATURE_COLS].astype(float)
+    Y = df[target_cols].astype(float)
+
+    with span("fit", rows=len(X), outputs=len(target_cols)) as fit_span:
+        tscv = TimeSeriesSplit(n_splits=5)
+        gscv = GridSearchCV(
+            estimator=make_pipeline(StandardScaler(), Ridge()),
+            param_grid={"ridge__alpha": np.logspace(-4, 3, 20)},
+            cv=tscv,
+            scoring="neg_root_mean_squared_error",
+            n_jobs=-1,
+        )
+        gscv.fit(X, Y)
+        record_cv_fits(gscv)
+        model = gscv.best_estimator_
+        rmse = -gscv.best_score_
+        rmse_by_horizon = last_fold_rmse(model, X, Y, tscv)
+        r2 = r2_score(Y, model.predict(X))
+        fit_span["rmse"] = round(rmse, 4)
+
+    with span("export") as s:
+        onnx_model, onnx_exporter, onnx_parity = export_ridge_onnx(model, X)
+        model_size = onnx_model.ByteSize()
+        s.update(exporter=onnx_exporter, model_size_bytes=model_size)
+
+    now = datetime.now()
+    ts_str = now.strftime("%Y%m%d%H%M%S")
+    model_fname = f"{BASE_NAME}_{ts_str}.onnx"
+    meta_fname = f"{BASE_NAME}_{ts_str}.metadata.json"
+    local_models_dir = ridge_mod.LOCAL_MODELS_DIR
+    os.makedirs(local_models_dir, exist_ok=True)
+
+    model_path = os.path.join(local_models_dir, model_fname)
+    with open(model_path, "wb") as f:
+        f.write(onnx_model.SerializeToString())
+
+    metadata = {
+        "model_type": "Ridge (linear) forecast",
+        "target": f"soil_humidity at +{', +'.join(str(h) for h in horizons)} minutes",
+        "horizons_minutes": horizons,
+        "output_names": target_cols,
+        "feature_names": FORECAST_FEATURE_COLS,
+        "alpha": float(gscv.best_params_["ridge__alpha"]),
+        "cross_val_splits": tscv.n_splits,
+        "training_timestamp_utc": now.isoformat(),
+        "rmse_cv": round(rmse, 2),
+        "rmse_last_fold_by_horizon": {col: round(v, 2) for col, v in zip(target_cols, rmse_by_horizon)},
+        "r2_insample": round(r2, 2),
+        "training_budget": training_budget,
+        "onnx_exporter": onnx_exporter,
+        "onnx_parity_max_abs_diff": onnx_parity,
+        "model_size_bytes": model_size,
+    }
+    meta_path = os.path.join(local_models_dir, meta_fname)
+    with open(meta_path, "w") as f:
+        json.dump(metadata, f, indent=4)
+
+    if upload:
+        with span("upload"):
+            upload_to_blob(model_path, model_fname)
+            upload_to_blob(meta_path, meta_fname)
+        logger.info("Forecast model and metadata uploaded: %s, %s", model_fname, meta_fname)
+
+    return {
+        "message": "Model and metadata uploaded successfully." if upload else "Model and metadata saved locally.",
+        "model_file": model_fname,
+        "metadata_file": meta_fname,
+        "rmse_cv": round(rmse, 2),
+        "r2_insample": round(r2, 2),
+        "rmse_last_fold_by_horizon": metadata["rmse_last_fold_by_horizon"],
+    }
+
+
+def last_fold_rmse(estimator, X: pd.DataFrame, Y: pd.DataFrame, tscv: TimeSeriesSplit) -> list:
+    """Per-output RMSE of the estimator's parameters refit on the last time-series training split."""
+    train_idx, test_idx = list(tscv.split(X))[-1]
+    fold_model = clone(estimator).fit(X.iloc[train_idx], Y.iloc[train_idx])
+    errors = fold_model.predict(X.iloc[test_idx]) - Y.iloc[test_idx].to_numpy()
+    return np.sqrt(np.mean(errors ** 2, axis=0)).tolist()
@@ -1,139 +1,409 @@
 import json
 import logging
 import os
-import re
 from datetime import datetime
+from typing import Optional
 
 import numpy as np
 import pandas as pd
-from skl2onnx import convert_sklearn
-from skl2onnx.common.data_types import FloatTensorType
 from sklearn.linear_model import Ridge
 from sklearn.metrics import r2_score
 from sklearn.model_selection import TimeSeriesSplit, GridSearchCV
 from sklearn.pipeline import make_pipeline
 from sklearn.preprocessing import StandardScaler
-from src.data.cleaning import clean_sensor_data
-from src.features.target import add_minutes_to_dry
+from src.config import (RIDGE_TRAINING_MODE, RIDGE_FULL_REFIT_EVERY, RIDGE_WINDOW_SLACK_DAYS, DRIFT_REFIT_THRESHOLD,
+                        DRIFT_REFERENCE_DAYS, TARGET_THRESHOLD_GRID,
+                        TARGET_GRID_MAX_ROWS, TRAINING_MAX_AGE_DAYS, TRAINING_RESAMPLE_MINUTES, TRAINING_MAX_ROWS,
+                        TRAINING_DECAY_HALF_LIFE_DAYS, WARM_START_SEARCH, WARM_START_RADIUS, WARM_START_TOLERANCE,
+                        TEMPORAL_FEATURES, TEMPORAL_LAGS_MINUTES, TEMPORAL_ROLLING_MINUTES,
+                        TEMPORAL_EWM_HALFLIFE_MINUTES, TEMPORAL_LAG_TOLERANCE_MINUTES)
+from src.data.preparation import empty_result, load_clean_samples, training_budget
+from src.data.window import apply_training_window, downsample_training_rows
+from src.features.engineering import FEATURE_COLS, add_time_features
+from src.features.sketches import (adjust_threshold, build_sketches, reference_sketches, sketches_to_dict,
+                                   update_feature_sketches)
+from src.features.temporal import (TemporalSpec, add_temporal_features, metadata_block, state_from_metadata,
+                                   temporal_state)
+from src.features.target import add_minutes_to_dry, add_minutes_to_dry_grid
+from src.models.onnx_export import export_ridge_onnx
+from src.models.ridge_stats import RidgeSufficientStats, STATS_SUFFIX, threshold_key
+from src.models.search import warm_started_search
+from src.services.artifacts import latest_artifact_path, load_latest_metadata
 from src.services.blob_uploader import upload_to_blob
+from src.services.tracing import span, trace_run
 
 logger = logging.getLogger(__name__)
 
-def train_model(json_samples: str, json_threshold: str) -> dict:
-
-    # Parse the incoming JSON samples
-    parsed_samples = json.loads(json_samples)
+BASE_NAME = "soil_humidity_baseline_ridge"
+# MODELS_DIR moves the local artifact dir, e.g. to a scratch dir for load tests
+LOCAL_MODELS_DIR = os.getenv("MODELS_DIR", os.path.join(os.path.dirname(__file__), "models"))
+
+
+def load_previous_stats(models_dir: str) -> Optional[RidgeSufficientStats]:
+    """
+    Loads the sufficient statistics saved with the last Ridge model.
+    Looks in the local models dir first and falls back to blob storage.
+    """
+    path = latest_artifact_path(models_dir, BASE_NAME, STATS_SUFFIX)
+    if path is None:
+        return None
+
+    logger.info("Loaded previous Ridge statistics from %s", path)
+    return RidgeSufficientStats.load(path)
+
+
+def temporal_spec() -> Optional[TemporalSpec]:
+    """The configured temporal feature windows, or None when TEMPORAL_FEATURES is off."""
+    if not TEMPORAL_FEATURES:
+        return None
+    return TemporalSpec(tuple(TEMPORAL_LAGS_MINUTES), tuple(TEMPORAL_ROLLING_MINUTES),
+                        tuple(TEMPORAL_EWM_HALFLIFE_MINUTES), TEMPORAL_LAG_TOLERANCE_MINUTES)
+
+
+def can_fold_in(stats: Optional[RidgeSufficientStats], threshold: float, drift: Optional[dict] = None,
+                threshold_grid: Optional[list] = None, feature_cols: Optional[list] = None,
+                window_start: Optional[str] = None) -> bool:
+    """
+    Checks whether new rows can be folded into the previous statistics instead of refitting.
+    With a threshold grid the received threshold does not change the training set, only the grid does.
+    window_start is the oldest sample of this run's training window: folded-in rows are never removed, so the
+    statistics are refitted once they reach back more than RIDGE_WINDOW_SLACK_DAYS before it.
+    """
+    if (stats is None or stats.n == 0 or stats.alpha is None or stats.rmse_cv is None
+            or stats.last_timestamp is None or stats.first_timestamp is None):
+        logger.info("No usable previous Ridge statistics. Running full refit.")
+        return False
+    if TRAINING_MAX_AGE_DAYS and window_start is not None:
+        oldest_allowed = pd.Timestamp(window_start) - pd.Timedelta(days=RIDGE_WINDOW_SLACK_DAYS)
+        if pd.Timestamp(stats.first_timestamp) < oldest_allowed:
+            logger.info("Ridge statistics reach back to %s, before the training window (%s). Running full refit.",
+                        stats.first_timestamp, window_start)
+            return False
+    if stats.feature_names != (feature_cols or FEATURE_COLS):
+        logger.info("Feature set changed since last run. Running full refit.")
+        return False
+    if stats.threshold_watermarks is None:
+        logger.info("Previous Ridge statistics have no per-threshold watermarks. Running full refit.")
+        return False
+    if stats.threshold_grid != threshold_grid:
+        logger.info("Threshold grid changed (%s -> %s). Running full refit.", stats.threshold_grid, threshold_grid)
+        return False
+    if threshold_grid is None and not np.isclose(stats.threshold, threshold):
+        logger.info("Threshold changed (%.2f -> %.2f). Running full refit.", stats.threshold, threshold)
+        return False
+    if stats.runs_since_full_refit >= RIDGE_FULL_REFIT_EVERY:
+        logger.info("%d incremental runs since last full refit. Running periodic full refit.",
+                    stats.runs_since_full_refit)
+        return False
+    if drift and drift["max"] is not None and drift["max"] > DRIFT_REFIT_THRESHOLD:
+        logger.info("Feature drift %.2f above %.2f. Running full refit.", drift["max"], DRIFT_REFIT_THRESHOLD)
+        return False
+    return True
+
+
+def threshold_watermarks(labelled: pd.DataFrame, thresholds, prev: Optional[dict] = None) -> dict:
+    """
+    Newest labelled sample time per threshold, or the previous watermark if no newer sample got a target.
+    Targets only look forward, so for each threshold the labelled samples are all samples up to this one.
+    """
+    newest = labelled.groupby("threshold")["timestamp"].max()
+    watermarks = {}
+    for threshold in thresholds:
+        key = threshold_key(threshold)
+        candidates = [(prev or {}).get(key)]
+        if float(threshold) in newest.index:
+            candidates.append(newest[float(threshold)].isoformat())
+        watermarks[key] = max(filter(None, candidates), key=np.datetime64, default=None)
+    return watermarks
+
+
+def unsettled_rows(labelled: pd.DataFrame, watermarks: dict) -> pd.DataFrame:
+    """The (sample, threshold) rows after their threshold's watermark, i.e. not folded in by an earlier run."""
+    settled_until = pd.to_datetime(labelled["threshold"].map(
+        {float(key): pd.Timestamp(ts) for key, ts in watermarks.items() if ts}))
+    return labelled[settled_until.isna() | (labelled["timestamp"] > settled_until)].reset_index(drop=True)
+
+
+def train_model(json_samples: str, json_threshold: str, mode: Optional[str] = None) -> dict:
+    # "incremental" or "full", defaults to RIDGE_TRAINING_MODE
+    mode = mode or RIDGE_TRAINING_MODE
+
+    with trace_run("train_model", mode=mode) as trace:
+        result = _train_model(json_samples, json_threshold, mode)
+        trace["message"] = result["message"]
+        return result
+
+
+def _train_model(json_samples: str, json_threshold: str, mode: str) -> dict:
+    df = load_clean_samples(json_samples)
+    if df.empty:
+        return empty_result("No valid training samples found after cleaning.")
 
-    sample_data = None
+    local_models_dir = LOCAL_MODELS_DIR
+    os.makedirs(local_models_dir, exist_ok=True)
+    prev_metadata = load_latest_metadata(local_models_dir, BASE_NAME)
+    feature_sketches, drift = _profile(df, prev_metadata, mode)
 
-    if isinstance(parsed_samples, dict) and "response" in parsed_samples and "list" in parsed_samples["response"]:
-        # Format 1: {"response": {"list": [{"SampleDTO": {...}}]}}
-        logger.info("Detected nested response/list/SampleDTO structure.")
-        sample_data = [item["SampleDTO"] for item in parsed_samples["response"]["list"]]
+    # Training window: max age, regular grid and drying cycle labels
+    with span("window") as s:
+        df, window = apply_training_window(df, TRAINING_MAX_AGE_DAYS, TRAINING_RESAMPLE_MINUTES)
+        s["rows"] = len(df)
 
-    elif isinstance(parsed_samples, list) and parsed_samples and isinstance(parsed_samples[0], dict):
-        if "SampleDTO" in parsed_samples[0]:
-            # Format 2: [{"SampleDTO": {...}}]
-            logger.info("Detected list of SampleDTO wrappers.")
-            sample_data = [item["SampleDTO"] for item in parsed_samples]
-        else:
-            # Format 3: Clean list of SampleDTO dicts
-            logger.info("Detected direct list of SampleDTO dicts.")
-            sample_data = parsed_samples
+    # Threshold handling, on the samples the targets are built from
+    threshold = json.loads(json_threshold)
+    logger.info("Threshold value received: %s", threshold)
+    threshold = adjust_threshold(threshold, build_sketches(df, ["soil_humidity"])["soil_humidity"])
+
+    with span("load_stats"):
+        prev_stats = load_previous_stats(local_models_dir) if mode == "incremental" else None
+    threshold_grid = list(TARGET_THRESHOLD_GRID) if TARGET_THRESHOLD_GRID else None
+    temporal = temporal_spec()
+    feature_cols = FEATURE_COLS + (temporal.feature_cols if temporal else [])
+    incremental = mode == "incremental" and can_fold_in(prev_stats, threshold, drift, threshold_grid, feature_cols,
+                                                        window["window_start"])
+
+    # Temporal features of the re-selected samples are computed from the window state saved at the oldest watermark
+    prev_temporal = None
+    if incremental and temporal and prev_stats.resume_from() is not None:
+        prev_temporal = state_from_metadata(prev_metadata, temporal)
+        if prev_temporal is None:
+            logger.info("No temporal feature state from the last run. Running full refit.")
+            incremental = False
+    if not incremental:
+        prev_stats = None
+
+    df, temporal_rows, threshold_grid, watermarks = _labelled_rows(df, threshold, threshold_grid, temporal,
+                                                                   prev_stats, prev_temporal)
+    if df.empty:
+        if incremental:
+            logger.info("No new labelled samples since last run. Keeping the current model.")
+            return empty_result("No new training samples since last run.")
+        logger.error("No data remains after filtering minutes_to_dry. Skipping model training.")
+        return empty_result("No valid training samples found after threshold filtering.")
 
-    if sample_data is None:
-        raise ValueError("Unexpected JSON structure from /sensor/data")
+    with span("downsample") as s:
+        df, rows = downsample_training_rows(df, TRAINING_MAX_ROWS, TRAINING_DECAY_HALF_LIFE_DAYS)
+        s["rows"] = len(df)
 
-    logger.info("Parsed %d samples", len(sample_data))
+    # Feature engineering
+    with span("features"):
+        df = add_time_features(df)
+        X = df[feature_cols].astype(float)
+        y = df["minutes_to_dry"].astype(float)
+        batch_stats = _batch_stats(df, X, y, feature_cols, threshold, threshold_grid, watermarks)
+
+        # Window state where the next incremental run resumes
+        temporal_features = None
+        if temporal:
+            until = batch_stats.resume_from() or batch_stats.last_timestamp
+            state = temporal_state(temporal_rows, temporal, until=until, prev_state=prev_temporal)
+            temporal_features = metadata_block(temporal, state)
+
+    with span("fit", incremental=incremental, rows=len(X)) as fit_span:
+        model, fit = _fit(X, y, batch_stats, prev_stats, prev_metadata)
+        fit_span["rmse"] = round(fit["rmse_prequential"] if incremental else fit["stats"].rmse_cv, 4)
 
-    unique_keys = set()
-    for sample in sample_data:
-        unique_keys.update(sample.keys())
-    logger.debug("Unique keys in sample data: %s", unique_keys)
+    # Export to ONNX
+    with span("export") as s:
+        onnx_model, onnx_exporter, onnx_parity = export_ridge_onnx(model, X)
+        s.update(exporter=onnx_exporter, model_size_bytes=onnx_model.ByteSize())
 
-    df = pd.DataFrame(sample_data)
+    now = datetime.now()
+    metadata = _metadata(fit, batch_stats, feature_cols, threshold, threshold_grid, now)
+    metadata.update(
+        temporal_features=temporal_features,
+        training_budget=training_budget(window, rows),
+        drift=drift,
+        feature_sketches=feature_sketches,
+        onnx_exporter=onnx_exporter,
+        onnx_parity_max_abs_diff=onnx_parity,
+        model_size_bytes=onnx_model.ByteSize(),
+    )
+    model_fname, meta_fname = _save_artifacts(onnx_model, metadata, fit["stats"], local_models_dir, now)
 
-    # Normalize column names
-    rename_map = {
-        "soilhumidity": "soil_humidity",
-        "airhumidity": "air_humidity",
-        "airtemperature": "temperature",
-        "lightvalue": "light",
-        "timestamp": "timestamp"
+    # Return a short summary to caller
+    result = {
+        "message": "Model and metadata uploaded successfully.",
+        "model_file": model_fname,
+        "metadata_file": meta_fname,
+        "rmse_cv": metadata["rmse_cv"],
+        "r2_insample": metadata["r2_insample"],
     }
+    if incremental:
+        result["rmse_prequential"] = metadata["rmse_prequential"]
+    return result
+
+
+def _profile(df: pd.DataFrame, prev_metadata: Optional[dict], mode: str):
+    """
+    Per-feature quantile sketches: profile the data and measure drift against the previous run.
+    Returns (feature_sketches metadata block, drift).
+    """
+    with span("sketches") as s:
+        sketches, drift = update_feature_sketches(df, prev_metadata, incremental=mode == "incremental")
+        s["drift_max"] = drift["max"] if drift else None
+        feature_sketches = sketches_to_dict(sketches, watermark=df["timestamp"].max().isoformat(),
+                                            reference=reference_sketches(df, DRIFT_REFERENCE_DAYS))
+    return feature_sketches, drift
+
+
+def _labelled_rows(df: pd.DataFrame, threshold: float, threshold_grid: Optional[list],
+                   temporal: Optional[TemporalSpec], prev_stats: Optional[RidgeSufficientStats] = None,
+                   prev_temporal=None):
+    """
+    Temporal features and minutes_to_dry targets for the windowed samples. With prev_stats (an incremental run)
+    only the (sample, threshold) rows not folded in yet are returned.
+
+    Returns (labelled rows, the unlabelled rows the temporal features were computed on, threshold grid,
+    threshold watermarks). The grid is None when the run falls back to the single threshold.
+    """
+    # Samples after the oldest threshold watermark are selected again (all samples while some threshold has none)
+    resume_from = prev_stats.resume_from() if prev_stats else None
+    if resume_from is not None:
+        # minutes_to_dry only looks forward in time, so samples settled for every threshold are not needed
+        df = df[df["timestamp"] > pd.Timestamp(resume_from)].copy()
+        logger.info("Incremental mode: %d rows newer than %s.", len(df), resume_from)
+
+    # Lags and rolling windows need the unlabelled samples too, so they are computed before the target
+    if temporal:
+        with span("temporal_features", incremental=prev_stats is not None) as s:
+            df = add_temporal_features(df, temporal, prev_temporal)
+            s["rows"] = len(df)
+
+    samples = df
+    with span("target", threshold=threshold, threshold_grid=threshold_grid) as s:
+        if threshold_grid:
+            # The training budget downsamples below, the grid cap is only the fallback without one
+            grid_max_rows = None if TRAINING_MAX_ROWS else TARGET_GRID_MAX_ROWS
+            df = add_minutes_to_dry_grid(samples, threshold_grid, max_rows=grid_max_rows)
+            if df.empty and prev_stats is None:
+                logger.warning("No samples below any grid threshold. Training on the threshold %.2f only.", threshold)
+                threshold_grid = None
+        if not threshold_grid:
+            df = add_minutes_to_dry(samples, threshold)
+            df.dropna(subset=["minutes_to_dry"], inplace=True)
+
+        prev_watermarks = prev_stats.threshold_watermarks if prev_stats else None
+        if prev_stats:
+            df = unsettled_rows(df, prev_watermarks)
+        watermarks = threshold_watermarks(df, threshold_grid or [threshold], prev_watermarks)
+        s["rows"] = len(df)
+    return df, samples, threshold_grid, watermarks
+
+
+def _batch_stats(df: pd.DataFrame, X: pd.DataFrame, y: pd.Series, feature_cols: list, threshold: float,
+                 threshold_grid: Optional[list], watermarks: dict) -> RidgeSufficientStats:
+    """Sufficient statistics of this run's training rows, with their time range and per-threshold bookkeeping."""
+    stats = RidgeSufficientStats.from_arrays(X, y, feature_cols, threshold,
+                                             last_timestamp=df["timestamp"].max().isoformat(),
+                                             first_timestamp=df["timestamp"].min().isoformat())
+    stats.threshold_grid = threshold_grid
+    stats.threshold_watermarks = watermarks
+    stats.threshold_rows = {threshold_key(t): int(n) for t, n in df["threshold"].value_counts().items()}
+    return stats
+
+
+def _metadata(fit: dict, batch_stats: RidgeSufficientStats, feature_cols: list, threshold: float,
+              threshold_grid: Optional[list], now: datetime) -> dict:
+    """Model, fit and validation part of the metadata (rmse_cv is always a time-series CV score)."""
+    stats = fit["stats"]
+    incremental = fit["rmse_prequential"] is not None
+    metadata = {
+        "model_type": "Ridge (linear)",
+        "target": (f"minutes_to_dry (<threshold% soil humidity, thresholds {min(threshold_grid)}-{max(threshold_grid)})"
+                   if threshold_grid else f"minutes_to_dry (<{threshold}% soil humidity)"),
+        "threshold_grid": threshold_grid,
+        "feature_names": feature_cols,
+        "alpha": stats.alpha,
+        "cross_val_splits": fit["cv_splits"],
+        "training_timestamp_utc": now.isoformat(),
+        # Incremental runs keep the alpha of the last full refit, and with it its CV score
+        "rmse_cv": round(stats.rmse_cv, 2),
+        "rmse_cv_from": "last_full_refit" if incremental else "this_run",
+        # RMSE of the previous model on the rows folded in by this run, before it saw them
+        "rmse_prequential": round(fit["rmse_prequential"], 2) if incremental else None,
+        "r2_insample": round(fit["r2"], 2),
+        "training_mode": "incremental" if incremental else "full",
+        "validation": "time_series_cv",
+        "training_rows_total": stats.n,
+        "training_rows_new": batch_stats.n,
+        # Oldest row in the statistics: incremental runs may keep rows that already left the training window
+        "training_rows_since": stats.first_timestamp,
+        "hyperparameter_search": fit["search"],
+    }
+    if fit["parity"] is not None:
+        metadata["stats_parity_max_abs_diff"] = fit["parity"]
+    return metadata
 
-    def normalize_col(col: str) -> str:
-        return re.sub(r"[^a-z0-9]", "", col.lower())
-
-    df.rename(columns={col: rename_map.get(normalize_col(col), col) for col in df.columns}, inplace=True)
-
-    logger.debug("DataFrame columns after rename: %s", df.columns.tolist())
-
-    required_cols = ["soil_humidity", "air_humidity", "temperature", "light", "timestamp"]
-    missing = set(required_cols) - set(df.columns)
-    if missing:
-        raise ValueError(f"Missing required columns in sample data: {missing}")
-
-    # Convert timestamp column
-    df["timestamp"] = pd.to_datetime(df["timestamp"])
-
-    # --- Data Cleaning Pipeline ---
-    df = clean_sensor_data(df, expected_interval_minutes=10, gap_drop_threshold=60)
-
-    if df.empty:
-        logger.error("No valid samples after data cleaning. Skipping model training.")
-        return {
-            "message": "No valid training samples found after cleaning.",
-            "model_file": None,
-            "metadata_file": None,
-            "rmse_cv": None,
-            "r2_insample": None
-        }
-
-    # Threshold handling
-    threshold = json.loads(json_threshold)
-    logger.info("Threshold value received: %s", threshold)
-
-    if df["soil_humidity"].min() >= threshold:
-        new_threshold = df["soil_humidity"].quantile(0.10)
-        logger.warning(
-            "Threshold %.2f is too low (min soil_humidity = %.2f). Adjusting threshold to 10th percentile: %.2f",
-            threshold, df["soil_humidity"].min(), new_threshold
-        )
-        threshold = new_threshold
 
-    # Target variable creation
-    df = add_minutes_to_dry(df, threshold)
-    df.dropna(subset=["minutes_to_dry"], inplace=True)
+def _save_artifacts(onnx_model, metadata: dict, stats: RidgeSufficientStats, local_models_dir: str,
+                    now: datetime):
+    """Writes model, metadata and statistics to local_models_dir and uploads them. Returns the file names."""
+    ts_str = now.strftime("%Y%m%d%H%M%S")
+    model_fname = f"{BASE_NAME}_{ts_str}.onnx"
+    meta_fname = f"{BASE_NAME}_{ts_str}.metadata.json"
+    stats_fname = f"{BASE_NAME}_{ts_str}{STATS_SUFFIX}"
+    metadata["stats_file"] = stats_fname
 
-    if df.empty:
-        logger.error("No data remains after filtering minutes_to_dry. Skipping model training.")
-        return {
-            "message": "No valid training samples found after threshold filtering.",
-            "model_file": None,
-            "metadata_file": None,
-            "rmse_cv": None,
-            "r2_insample": None
-        }
+    model_path = os.path.join(local_models_dir, model_fname)
+    with open(model_path, "wb") as f:
+        f.write(onnx_model.SerializeToString())
+    meta_path = os.path.join(local_models_dir, meta_fname)
+    with open(meta_path, "w") as f:
+        json.dump(metadata, f, indent=4)
+    stats_path = os.path.join(local_models_dir, stats_fname)
+    stats.save(stats_path)
 
-    # Feature engineering
-    df["hour_sin"] = np.sin(df["timestamp"].dt.hour / 24 * 2 * np.pi)
-    df["hour_cos"] = np.cos(df["timestamp"].dt.hour / 24 * 2 * np.pi)
-
-    feature_cols = [
-        "soil_humidity",
-        "soil_delta",
-        "air_humidity",
-        "temperature",
-        "light",
-        "hour_sin",
-        "hour_cos",
-        "threshold",
-    ]
-
-    X = df[feature_cols].astype(float)
-    y = df["minutes_to_dry"].astype(float)
+    # Upload to Azure Blob Storage. Statistics go first so the next run can pick them up
+    with span("upload"):
+        upload_to_blob(stats_path,  stats_fname)
+        upload_to_blob(model_path,  model_fname)
+        upload_to_blob(meta_path,   meta_fname)
 
+    logger.info("Model and metadata uploaded: %s, %s", model_fname, meta_fname)
+    return model_fname, meta_fname
+
+
+def _fit(X: pd.DataFrame, y: pd.Series, batch_stats: RidgeSufficientStats,
+         prev_stats: Optional[RidgeSufficientStats], prev_metadata: Optional[dict] = None):
+    """
+    Folds the batch into prev_stats (an incremental run) or refits from scratch (prev_stats None).
+    Returns (model, fit) where fit holds "stats", "r2", "cv_splits", "parity", "search" (the metadata block)
+    and "rmse_prequential" (None for a full refit, whose CV RMSE is stats.rmse_cv).
+    """
+    if prev_stats is not None:
+        # Score the previous model on rows it has never seen before folding them in (prequential validation)
+        prev_model = prev_stats.to_pipeline(prev_stats.alpha)
+        rmse_prequential = float(np.sqrt(np.mean((prev_model.predict(X.to_numpy()) - y.to_numpy()) ** 2)))
+
+        stats = prev_stats.merge(batch_stats)
+        stats.runs_since_full_refit += 1
+        model = stats.to_pipeline(stats.alpha)
+        # No search: carry the last one forward so the next full refit can start from it
+        search = {**((prev_metadata or {}).get("hyperparameter_search") or {}), "strategy": "none (incremental)"}
+        logger.info("Folded %d new rows into Ridge statistics (total %d rows).", batch_stats.n, stats.n)
+        return model, {"stats": stats, "r2": stats.r2(model), "cv_splits": 0, "parity": None, "search": search,
+                       "rmse_prequential": rmse_prequential}
+
+    model, alpha, rmse, r2, cv_splits, search = _full_refit(X, y, prev_metadata)
+
+    stats = batch_stats
+    stats.alpha = alpha
+    stats.rmse_cv = rmse
+    stats.runs_since_full_refit = 0
+
+    # Check that the statistics route reproduces the full refit before relying on it next run
+    parity = float(np.max(np.abs(stats.to_pipeline(alpha).predict(X.to_numpy()) - model.predict(X))))
+    logger.info("Full refit check: max |prediction diff| between refit and statistics model = %.3g", parity)
+    return model, {"stats": stats, "r2": r2, "cv_splits": cv_splits, "parity": parity, "search": search,
+                   "rmse_prequential": None}
+
+
+def _full_refit(X: pd.DataFrame, y: pd.Series, prev_metadata: Optional[dict] = None):
+    """
+    Hyperparameter search + refit on the whole history, warm-started from the previous model's alpha.
+    Returns (model, alpha, rmse_cv, r2, cv_splits, search).
+    """
     # Build a pipeline so scaler + model are saved together
     pipe = make_pipeline(StandardScaler(), Ridge())
 
@@ -143,61 +413,20 @@ def train_model(json_samples: str, json_threshold: str) -> dict:
     tscv = TimeSeriesSplit(n_splits=5)
     param_grid = {"ridge__alpha": np.logspace(-4, 3, 20)}
 
-    gscv = GridSearchCV(
-        estimator=pipe,
-        param_grid=param_grid,
-        cv=tscv,
-        scoring="neg_root_mean_squared_error",
-        n_jobs=-1,
-    )
-    gscv.fit(X, y)
+    def make_search(grid):
+        return GridSearchCV(
+            estimator=pipe,
+            param_grid=grid,
+            cv=tscv,
+            scoring="neg_root_mean_squared_error",
+            n_jobs=-1,
+        )
+
+    gscv, search = warm_started_search(make_search, X, y, param_grid, prev_metadata, {"ridge__alpha": "alpha"},
+                                       WARM_START_RADIUS, WARM_START_TOLERANCE, enabled=WARM_START_SEARCH)
 
     rmse = -gscv.best_score_
     r2 = r2_score(y, gscv.predict(X))
 
-    # Export to ONNX
-    initial_type = [("input", FloatTensorType([None, len(feature_cols)]))]
-    onnx_model = convert_sklearn(gscv.best_estimator_, initial_types=initial_type)
-
-    # Save model & metadata
-    now = datetime.now()
-    ts_str = now.strftime("%Y%m%d%H%M%S")
-    base_name = "soil_humidity_baseline_ridge"
-    model_fname = f"{base_name}_{ts_str}.onnx"
-    meta_fname = f"{base_name}_{ts_str}.metadata.json"
-
-    local_models_dir = os.path.join(os.path.dirname(__file__), "models")
-    os.makedirs(local_models_dir, exist_ok=True)
-
-    model_path = os.path.join(local_models_dir, model_fname)
-    with open(model_path, "wb") as f:
-        f.write(onnx_model.SerializeToString())
-
-    metadata = {
-        "model_type": "Ridge (linear)",
-        "target": f"minutes_to_dry (<{threshold}% soil humidity)",
-        "feature_names": feature_cols,
-        "alpha": gscv.best_params_["ridge__alpha"],
-        "cross_val_splits": tscv.n_splits,
-        "training_timestamp_utc": now.isoformat(),
-        "rmse_cv": round(rmse, 2),
-        "r2_insample": round(r2, 2),
-    }
-    meta_path = os.path.join(local_models_dir, meta_fname)
-    with open(meta_path, "w") as f:
-        json.dump(metadata, f, indent=4)
-
-    # Upload to Azure Blob Storage
-    upload_to_blob(model_path,  model_fname)
-    upload_to_blob(meta_path,   meta_fname)
+    return gscv.best_estimator_, float(gscv.best_params_["ridge__alpha"]), rmse, r2, tscv.n_splits, search
 
-    logger.info("Model and metadata uploaded: %s, %s", model_fname, meta_fname)
-
-    # Return a short summary to caller
-    return {
-        "message": "Model and metadata uploaded successfully.",
-        "model_file": model_fname,
-        "metadata_file": meta_fname,
-        "rmse_cv": round(rmse, 2),
-        "r2_insample": round(r2, 2),
-    }
@@ -0,0 +1,219 @@
+import json
+import logging
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+from sklearn.linear_model import Ridge
+from sklearn.pipeline import Pipeline, make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+logger = logging.getLogger(__name__)
+
+STATS_SUFFIX = ".stats.json"
+
+
+def threshold_key(threshold: float) -> str:
+    """Key of a threshold in the per-threshold fields (JSON object keys are strings)."""
+    return str(float(threshold))
+
+
+def _merge_dicts(a: Optional[dict], b: Optional[dict], combine) -> Optional[dict]:
+    if a is None or b is None:
+        return b if a is None else a
+    return {key: combine(a.get(key), b.get(key)) for key in {**a, **b}}
+
+
+@dataclass
+class RidgeSufficientStats:
+    """
+    Sufficient statistics for a StandardScaler + Ridge pipeline.
+
+    Holds the row count, feature/target means and the centered scatter matrices
+    (X^T X, X^T y and y^T y around the means). Two sets of statistics can be merged
+    exactly, so new rows can be folded in without revisiting the history.
+    """
+
+    feature_names: list
+    threshold: float
+    n: int = 0
+    mean_x: np.ndarray = None
+    mean_y: float = 0.0
+    xtx: np.ndarray = None
+    xty: np.ndarray = None
+    yty: float = 0.0
+    last_timestamp: Optional[str] = None
+    # Oldest row summarized, the start of the time range the statistics cover
+    first_timestamp: Optional[str] = None
+    alpha: Optional[float] = None
+    # Time-series CV RMSE of the last full refit, which chose alpha
+    rmse_cv: Optional[float] = None
+    runs_since_full_refit: int = 0
+    # Thresholds the targets were stacked over (None: single threshold)
+    threshold_grid: Optional[list] = None
+    # Per threshold (threshold_key): time of the newest sample whose row for that threshold is settled, i.e. folded
+    # in or dropped by the training budget. Later samples may still get a target. None until one has a target
+    threshold_watermarks: Optional[dict] = None
+    # Rows folded in per threshold (threshold_key)
+    threshold_rows: Optional[dict] = None
+
+    def __post_init__(self):
+        k = len(self.feature_names)
+        if self.mean_x is None:
+            self.mean_x = np.zeros(k)
+        if self.xtx is None:
+            self.xtx = np.zeros((k, k))
+        if self.xty is None:
+            self.xty = np.zeros(k)
+        self.mean_x = np.asarray(self.mean_x, dtype=float)
+        self.xtx = np.asarray(self.xtx, dtype=float)
+        self.xty = np.asarray(self.xty, dtype=float)
+
+    @classmethod
+    def from_arrays(cls, X, y, feature_names, threshold, last_timestamp=None,
+                    first_timestamp=None) -> "RidgeSufficientStats":
+        X = np.asarray(X, dtype=float)
+        y = np.asarray(y, dtype=float)
+        stats = cls(feature_names=list(feature_names), threshold=float(threshold), last_timestamp=last_timestamp,
+                    first_timestamp=first_timestamp)
+        if len(y) == 0:
+            return stats
+
+        stats.n = len(y)
+        stats.mean_x = X.mean(axis=0)
+        stats.mean_y = float(y.mean())
+        xc = X - stats.mean_x
+        yc = y - stats.mean_y
+        stats.xtx = xc.T @ xc
+        stats.xty = xc.T @ yc
+        stats.yty = float(yc @ yc)
+        return stats
+
+    def resume_from(self) -> Optional[str]:
+        """
+        The oldest threshold watermark. Incremental runs re-select the samples after it, because a sample may get a
+        target for a low threshold long after it got one for a high threshold. None when some threshold has no
+        watermark yet: then every sample may still get a target.
+        """
+        watermarks = list((self.threshold_watermarks or {}).values())
+        if not watermarks or None in watermarks:
+            return None
+        return min(watermarks, key=np.datetime64)
+
+    def merge(self, other: "RidgeSufficientStats") -> "RidgeSufficientStats":
+        """
+        Returns the statistics of the union of both row sets (Chan et al. pairwise update).
+        Bookkeeping fields (alpha, CV RMSE, run counter) are taken from self, last_timestamp and the threshold
+        watermarks from the newest side, first_timestamp from the oldest, per-threshold row counts are added up.
+        """
+        if list(other.feature_names) != list(self.feature_names):
+            raise ValueError("Cannot merge statistics computed over different feature sets.")
+
+        merged = RidgeSufficientStats(
+            feature_names=list(self.feature_names),
+            threshold=self.threshold,
+            threshold_grid=self.threshold_grid,
+            alpha=self.alpha,
+            rmse_cv=self.rmse_cv,
+            runs_since_full_refit=self.runs_since_full_refit,
+            last_timestamp=max(filter(None, [self.last_timestamp, other.last_timestamp]), default=None),
+            first_timestamp=min(filter(None, [self.first_timestamp, other.first_timestamp]), default=None),
+            threshold_watermarks=_merge_dicts(self.threshold_watermarks, other.threshold_watermarks,
+                                              lambda a, b: max(filter(None, [a, b]), key=np.datetime64, default=None)),
+            threshold_rows=_merge_dicts(self.threshold_rows, other.threshold_rows, lambda a, b: (a or 0) + (b or 0)),
+        )
+        n = self.n + other.n
+        if n == 0:
+            return merged
+
+        dx = other.mean_x - self.mean_x
+        dy = other.mean_y - self.mean_y
+        weight = self.n * other.n / n
+
+        merged.n = n
+        merged.mean_x = self.mean_x + dx * other.n / n
+        merged.mean_y = self.mean_y + dy * other.n / n
+        merged.xtx = self.xtx + other.xtx + np.outer(dx, dx) * weight
+        merged.xty = self.xty + other.xty + dx * dy * weight
+        merged.yty = self.yty + other.yty + dy * dy * weight
+        return merged
+
+    def _scale(self) -> np.ndarray:
+        # Same convention as StandardScaler: population std, zero variance -> scale 1
+        var = np.diag(self.xtx) / self.n
+        scale = np.sqrt(var)
+        scale[scale < 10 * np.finfo(float).eps] = 1.0
+        return scale
+
+    def to_pipeline(self, alpha: float) -> Pipeline:
+        """
+        Solves the Ridge normal equations in standardized space and returns a fitted
+        StandardScaler + Ridge pipeline, equivalent to make_pipeline(StandardScaler(), Ridge(alpha)).fit(X, y).
+        """
+        if self.n == 0:
+            raise ValueError("Cannot fit Ridge from empty statistics.")
+
+        k = len(self.feature_names)
+        scale = self._scale()
+        xtx_std = self.xtx / np.outer(scale, scale)
+        xty_std = self.xty / scale
+        coef = np.linalg.solve(xtx_std + alpha * np.eye(k), xty_std)
+
+        scaler = StandardScaler()
+        scaler.mean_ = self.mean_x.copy()
+        scaler.var_ = np.diag(self.xtx) / self.n
+        scaler.scale_ = scale
+        scaler.n_samples_seen_ = self.n
+        scaler.n_features_in_ = k
+
+        ridge = Ridge(alpha=alpha)
+        ridge.coef_ = coef
+        # Standardized features are centered, so the intercept is the target mean
+        ridge.intercept_ = self.mean_y
+        ridge.n_features_in_ = k
+
+        return make_pipeline(scaler, ridge)
+
+    def r2(self, pipeline: Pipeline) -> float:
+        """In-sample R² of a fitted pipeline over all rows summarized by these statistics."""
+        scaler, ridge = pipeline.steps[0][1], pipeline.steps[-1][1]
+        b = ridge.coef_ / scaler.scale_
+        # Gap between the mean prediction and the target mean (zero for pipelines fitted on these rows)
+        offset = ridge.intercept_ + (self.mean_x - scaler.mean_) @ b - self.mean_y
+        sse = self.yty - 2 * b @ self.xty + b @ self.xtx @ b + self.n * offset ** 2
+        if self.yty == 0:
+            return 0.0
+        return float(1 - sse / self.yty)
+
+    def to_dict(self) -> dict:
+        return {
+            "feature_names": list(self.feature_names),
+            "threshold": self.threshold,
+            "n": self.n,
+            "mean_x": self.mean_x.tolist(),
+            "mean_y": self.mean_y,
+            "xtx": self.xtx.tolist(),
+            "xty": self.xty.tolist(),
+            "yty": self.yty,
+            "last_timestamp": self.last_timestamp,
+            "first_timestamp": self.first_timestamp,
+            "alpha": self.alpha,
+            "rmse_cv": self.rmse_cv,
+            "runs_since_full_refit": self.runs_since_full_refit,
+            "threshold_grid": self.threshold_grid,
+            "threshold_watermarks": self.threshold_watermarks,
+            "threshold_rows": self.threshold_rows,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "RidgeSufficientStats":
+        return cls(**data)
+
+    def save(self, path: str):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=4)
+
+    @classmethod
+    def load(cls, path: str) -> "RidgeSufficientStats":
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
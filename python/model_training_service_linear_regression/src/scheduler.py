@@ -2,29 +2,99 @@ import json
 import logging
 import time
 from datetime import datetime
+from typing import Optional
 
 from apscheduler.schedulers.background import BackgroundScheduler
 from pytz import timezone
-from src.config import TIMEZONE, SCHEDULE_CRON
+from src.config import JOB_LOCK_BACKEND, TIMEZONE, SCHEDULE_CRON, TRIGGERS_ENABLED, TRIGGER_POLL_SECONDS
 from src.data.io import fetch_sensor_data, fetch_threshold
-from src.models.ridge import train_model
+from src.models.ridge import BASE_NAME, LOCAL_MODELS_DIR, train_model
+from src.services.artifacts import load_latest_metadata
+from src.services.job_lock import job_lock, leadership, schedule_slot, trigger_slot
+from src.services.tracing import span, trace_run
+from src.triggers import RetrainCoordinator, RetrainTrigger
 
 logger = logging.getLogger(__name__)
 
 
-def job():
+def job(slot: Optional[str] = None) -> dict:
+    """
+    One training run, if this replica wins the schedule slot (schedule_slot() of now by default). Replicas that
+    find the slot claimed by another skip right away. Returns {"slot", "status", "holder"} with status
+    'trained', 'skipped' or 'failed', and records the slot and the outcome on the job trace.
+    """
     ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     logger.info(f"[{ts}] Starting model-training via scheduler...")
+    report = {"slot": slot or schedule_slot(BASE_NAME), "status": "failed", "holder": None}
+
     try:
-        data = fetch_sensor_data()
-        threshold = fetch_threshold()
-        result = train_model(
-            json.dumps(data),
-            json.dumps(threshold),
-        )
+        with trace_run("job", slot=report["slot"]) as run, leadership(job_lock(), report["slot"]) as lead:
+            run["leader"] = lead["leader"]
+            if not lead["leader"]:
+                report.update(status="skipped", holder=lead["holder"])
+                logger.info("Skipping training: schedule slot %s is claimed by another replica (%s).",
+                            report["slot"], lead["holder"])
+                return report
+
+            with span("fetch"):
+                with span("fetch_sensor_data"):
+                    data = fetch_sensor_data()
+                with span("fetch_threshold"):
+                    threshold = fetch_threshold()
+            result = train_model(
+                json.dumps(data),
+                json.dumps(threshold),
+            )
         logger.info(f"Result: RMSE={result['rmse_cv']} R2={result['r2_insample']}")
+        report["status"] = "trained"
     except Exception as e:
         logger.exception("Scheduler-job error: %s", e)
+    return report
+
+
+def build_triggers():
+    """Trigger referenced to the latest Ridge model, and a coordinator that runs job() and moves the reference."""
+    trigger = RetrainTrigger(lambda: load_latest_metadata(LOCAL_MODELS_DIR, BASE_NAME))
+
+    def run_training(reasons):
+        # Keyed by the reference model too: a cron slot would swallow a second triggered run within the hour
+        report = job(trigger_slot(BASE_NAME, trigger.watermark))
+        if report["status"] == "skipped":
+            logger.info("Slot %s trained by another replica, taking its model as the trigger reference.",
+                        report["slot"])
+        # load_latest_metadata() resolves a model another replica published from blob storage
+        trigger.refresh()
+        return report["status"]
+
+    trigger.refresh()
+    return trigger, RetrainCoordinator(run_training)
+
+
+def poll_triggers(trigger: RetrainTrigger, coordinator: RetrainCoordinator):
+    try:
+        if JOB_LOCK_BACKEND:
+            # The leader of a slot this replica skipped may have published its model since
+            trigger.refresh()
+        for reason in trigger.check():
+            coordinator.request(reason)
+    except Exception as e:
+        logger.warning("Retrain trigger check failed: %s", e)
+    coordinator.tick()
+
+
+def cron_fallback(trigger: RetrainTrigger, coordinator: RetrainCoordinator):
+    """Nightly run as before, unless the trigger knows that no samples arrived since the last model."""
+    try:
+        _reasons, new_samples = trigger.check_new_samples()
+    except Exception as e:
+        logger.warning("Retrain trigger check failed, running cron training anyway: %s", e)
+        new_samples = None
+
+    if new_samples == 0:
+        logger.info("Cron fallback: no new samples since the last model. Skipping training.")
+        return
+    coordinator.request("cron", delay=0)
+    coordinator.tick()
 
 
 def start_scheduler():
@@ -32,7 +102,14 @@ def start_scheduler():
     sched = BackgroundScheduler(timezone=tz)
     # Cron-format: minut time dag måned ugedag
     minute, hour, day, month, weekday = SCHEDULE_CRON.split()
-    sched.add_job(job, trigger='cron', minute=minute, hour=hour)
+    if TRIGGERS_ENABLED:
+        trigger, coordinator = build_triggers()
+        sched.add_job(poll_triggers, trigger='interval', seconds=TRIGGER_POLL_SECONDS, args=[trigger, coordinator],
+                      max_instances=1, coalesce=True)
+        sched.add_job(cron_fallback, trigger='cron', minute=minute, hour=hour, args=[trigger, coordinator])
+        logger.info("Retrain triggers polling every %ds.", TRIGGER_POLL_SECONDS)
+    else:
+        sched.add_job(job, trigger='cron', minute=minute, hour=hour)
     sched.start()
     logger.info("Scheduler is running: cron=%s %s", TIMEZONE, SCHEDULE_CRON)
 
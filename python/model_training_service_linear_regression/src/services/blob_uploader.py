@@ -1,11 +1,19 @@
+import glob
 import logging
+import os
+import shutil
+from typing import Optional
 
 from azure.identity import DefaultAzureCredential
 from azure.storage.blob import BlobServiceClient
+from src.config import LOCAL_BLOB_DIR
 
 logger = logging.getLogger(__name__)
 
 def upload_to_blob(local_path: str, blob_name: str):
+    if LOCAL_BLOB_DIR:
+        return _upload_local(local_path, blob_name)
+
     try:
         account_url = "https://modelregistrymal.blob.core.windows.net/"
         container_name = "models"
@@ -34,3 +42,76 @@ def upload_to_blob(local_path: str, blob_name: str):
         logger.exception("Upload failed for %s : %s", blob_name, e)
         raise
 
+
+def download_latest_blob(prefix: str, suffix: str, local_dir: str):
+    """
+    Downloads the newest blob named '<prefix>...<suffix>' into local_dir.
+    Returns the local path, or None if no such blob exists.
+    """
+    if LOCAL_BLOB_DIR:
+        return _download_latest_local(prefix, suffix, local_dir)
+
+    account_url = "https://modelregistrymal.blob.core.windows.net/"
+    container_name = "models"
+
+    credential = DefaultAzureCredential()
+    blob_service_client = BlobServiceClient(account_url=account_url, credential=credential)
+    container_client = blob_service_client.get_container_client(container_name)
+
+    # Timestamped blob names sort chronologically
+    names = sorted(b.name for b in container_client.list_blobs(name_starts_with=prefix) if b.name.endswith(suffix))
+    if not names:
+        logger.info("No blob matching '%s*%s' found in container '%s'.", prefix, suffix, container_name)
+        return None
+
+    blob_name = names[-1]
+    os.makedirs(local_dir, exist_ok=True)
+    local_path = os.path.join(local_dir, blob_name)
+    with open(local_path, "wb") as f:
+        f.write(container_client.get_blob_client(blob_name).download_blob().readall())
+
+    logger.info("Downloaded '%s' from container '%s'.", blob_name, container_name)
+    return local_path
+
+
+def latest_blob_name(prefix: str, suffix: str) -> Optional[str]:
+    """Name of the newest blob '<prefix>...<suffix>' without downloading it, or None if no such blob exists."""
+    if LOCAL_BLOB_DIR:
+        return _latest_local_name(prefix, suffix)
+
+    account_url = "https://modelregistrymal.blob.core.windows.net/"
+    container_name = "models"
+
+    credential = DefaultAzureCredential()
+    blob_service_client = BlobServiceClient(account_url=account_url, credential=credential)
+    container_client = blob_service_client.get_container_client(container_name)
+
+    names = sorted(b.name for b in container_client.list_blobs(name_starts_with=prefix) if b.name.endswith(suffix))
+    return names[-1] if names else None
+
+
+def _upload_local(local_path: str, blob_name: str):
+    target = os.path.join(LOCAL_BLOB_DIR, blob_name)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    shutil.copyfile(local_path, target)
+    logger.info("Uploaded '%s' to local blob store '%s'.", blob_name, LOCAL_BLOB_DIR)
+
+
+def _latest_local_name(prefix: str, suffix: str) -> Optional[str]:
+    names = sorted(os.path.relpath(path, LOCAL_BLOB_DIR)
+                   for path in glob.glob(os.path.join(LOCAL_BLOB_DIR, f"{prefix}*{suffix}")))
+    return names[-1] if names else None
+
+
+def _download_latest_local(prefix: str, suffix: str, local_dir: str):
+    names = sorted(os.path.relpath(path, LOCAL_BLOB_DIR)
+                   for path in glob.glob(os.path.join(LOCAL_BLOB_DIR, f"{prefix}*{suffix}")))
+    if not names:
+        logger.info("No blob matching '%s*%s' found in local blob store '%s'.", prefix, suffix, LOCAL_BLOB_DIR)
+        return None
+
+    os.makedirs(local_dir, exist_ok=True)
+    local_path = os.path.join(local_dir, os.path.basename(names[-1]))
+    shutil.copyfile(os.path.join(LOCAL_BLOB_DIR, names[-1]), local_path)
+    logger.info("Downloaded '%s' from local blob store '%s'.", names[-1], LOCAL_BLOB_DIR)
+    return local_path
@@ -0,0 +1,225 @@
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+
+from src.config import JOB_LOCK_BACKEND, JOB_LOCK_DIR, JOB_LOCK_SLOT_SECONDS, JOB_LOCK_TTL_SECONDS, LOCAL_BLOB_DIR
+
+logger = logging.getLogger(__name__)
+
+# Azure blob leases last 15-60 seconds (or forever, which a crashed replica would never give back)
+_BLOB_LEASE_RANGE = (15, 60)
+
+
+def replica_id() -> str:
+    """Host name (the replica name in Container Apps) and process id."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def schedule_slot(name: str, slot_seconds: int = JOB_LOCK_SLOT_SECONDS, now: Optional[float] = None) -> str:
+    """
+    '<name>_<slot start>' of the schedule slot a run at `now` belongs to. A slot covers slot_seconds around its
+    start, so replicas firing the same cron a few seconds apart on skewed clocks agree on it.
+    """
+    now = time.time() if now is None else now
+    start = round(now / slot_seconds) * slot_seconds
+    return f"{name}_{datetime.fromtimestamp(start, timezone.utc):%Y%m%dT%H%MZ}"
+
+
+def trigger_slot(name: str, watermark: Optional[str], slot_seconds: int = JOB_LOCK_SLOT_SECONDS,
+                 now: Optional[float] = None) -> str:
+    """
+    Slot of a trigger-fired run: the schedule slot of `now` and the trigger's reference watermark (the newest
+    sample of the model it measures against). Replicas polling the same model agree on it. Once a run publishes a
+    model the watermark moves, so the next triggered run gets a new slot even within the same schedule slot. A run
+    that published no model holds its slot only until the schedule slot ends.
+    """
+    after = datetime.fromisoformat(watermark).strftime("%Y%m%dT%H%M%S") if watermark else "none"
+    return f"{schedule_slot(name, slot_seconds, now)}_after_{after}"
+
+
+class FileJobLock:
+    """
+    Slot claims as JSON files in a directory, updated under an exclusive flock. Works between processes on one
+    host (or on a shared POSIX file system), which covers tests and the local stack.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    @contextmanager
+    def _record(self, slot: str):
+        import fcntl
+
+        os.makedirs(self.directory, exist_ok=True)
+        fd = os.open(os.path.join(self.directory, f"{slot}.json"), os.O_RDWR | os.O_CREAT, 0o644)
+        with os.fdopen(fd, "r+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            text = f.read()
+            record = json.loads(text) if text else {}
+            yield record
+            f.seek(0)
+            f.truncate()
+            json.dump(record, f)
+
+    def acquire(self, slot: str, owner: str, ttl_s: float) -> Tuple[bool, dict]:
+        with self._record(slot) as record:
+            now = time.time()
+            held = record.get("state") == "running" and record["expires_at"] > now
+            if record.get("state") == "done" or held:
+                return False, dict(record)
+            record.clear()
+            record.update(owner=owner, state="running", acquired_at=now, expires_at=now + ttl_s)
+            return True, dict(record)
+
+    def renew(self, slot: str, owner: str, ttl_s: float) -> bool:
+        with self._record(slot) as record:
+            if record.get("owner") != owner or record.get("state") != "running":
+                return False
+            record["expires_at"] = time.time() + ttl_s
+            return True
+
+    def release(self, slot: str, owner: str, done: bool):
+        with self._record(slot) as record:
+            if record.get("owner") == owner:
+                record.update(state="done" if done else "released", released_at=time.time())
+
+
+class BlobLeaseJobLock:
+    """
+    Slot claims as leases on 'locks/<slot>' blobs in the models container. The lease is the lock: Azure lets one
+    client hold it, and it lapses on its own if the replica holding it dies. The blob's metadata records the
+    owner and whether the slot is done.
+    """
+
+    def __init__(self, account_url: str = "https://modelregistrymal.blob.core.windows.net/",
+                 container_name: str = "models", prefix: str = "locks/"):
+        from azure.identity import DefaultAzureCredential
+        from azure.storage.blob import BlobServiceClient
+
+        service = BlobServiceClient(account_url=account_url, credential=DefaultAzureCredential())
+        self.container = service.get_container_client(container_name)
+        self.prefix = prefix
+        self._leases = {}
+
+    def _blob(self, slot: str):
+        return self.container.get_blob_client(f"{self.prefix}{slot}")
+
+    @staticmethod
+    def _metadata(blob) -> dict:
+        return dict(blob.get_blob_properties().metadata or {})
+
+    def acquire(self, slot: str, owner: str, ttl_s: float) -> Tuple[bool, dict]:
+        from azure.core.exceptions import HttpResponseError
+
+        blob = self._blob(slot)
+        try:
+            blob.upload_blob(b"", overwrite=False)
+        except HttpResponseError as e:
+            # 409: the blob exists, 412: it exists and is leased
+            if e.status_code not in (409, 412):
+                raise
+        try:
+            lease = blob.acquire_lease(lease_duration=int(min(max(ttl_s, _BLOB_LEASE_RANGE[0]), _BLOB_LEASE_RANGE[1])))
+        except HttpResponseError as e:
+            if e.status_code != 409:
+                raise
+            return False, self._metadata(blob)
+
+        metadata = self._metadata(blob)
+        if metadata.get("state") == "done":
+            lease.release()
+            return False, metadata
+        metadata = {"owner": owner, "state": "running", "acquired_at": str(time.time())}
+        blob.set_blob_metadata(metadata, lease=lease)
+        self._leases[slot] = lease
+        return True, metadata
+
+    def renew(self, slot: str, owner: str, ttl_s: float) -> bool:
+        lease = self._leases.get(slot)
+        if lease is None:
+            return False
+        lease.renew()
+        return True
+
+    def release(self, slot: str, owner: str, done: bool):
+        lease = self._leases.pop(slot, None)
+        if lease is None:
+            return
+        metadata = {"owner": owner, "state": "done" if done else "released", "released_at": str(time.time())}
+        try:
+            self._blob(slot).set_blob_metadata(metadata, lease=lease)
+        finally:
+            lease.release()
+
+
+def job_lock():
+    """
+    Lock backend selected by JOB_LOCK_BACKEND, or None if job locking is off. With a local blob store
+    (MODEL_BLOB_DIR) the locks are files next to it whatever the backend, so the local stack never calls Azure.
+    """
+    if not JOB_LOCK_BACKEND:
+        return None
+    if LOCAL_BLOB_DIR:
+        return FileJobLock(JOB_LOCK_DIR)
+    if JOB_LOCK_BACKEND == "blob":
+        return BlobLeaseJobLock()
+    if JOB_LOCK_BACKEND == "file":
+        return FileJobLock(JOB_LOCK_DIR)
+    raise ValueError(f"Unknown JOB_LOCK_BACKEND '{JOB_LOCK_BACKEND}', expected 'blob' or 'file'")
+
+
+def _keep_renewed(lock, slot: str, owner: str, ttl_s: float, stop: threading.Event):
+    while not stop.wait(ttl_s / 3):
+        try:
+            if not lock.renew(slot, owner, ttl_s):
+                logger.warning("Lost the claim on job slot %s.", slot)
+                return
+        except Exception as e:
+            logger.warning("Could not renew the claim on job slot %s: %s", slot, e)
+
+
+@contextmanager
+def leadership(lock, slot: str, ttl_s: float = JOB_LOCK_TTL_SECONDS, owner: Optional[str] = None):
+    """
+    Claims `slot` for this replica and yields {"slot", "owner", "leader", "holder"}. Only the leader should run
+    the job; holder is the claim record found when another replica got there first. Without a lock (None)
+    every replica leads. A lock backend error counts as not leading, so a storage outage cannot start two runs.
+
+    The claim is renewed in the background while the block runs. When the block completes the slot is marked
+    done and replicas arriving later skip it too. When it raises, the slot is released for another replica.
+    """
+    owner = owner or replica_id()
+    status = {"slot": slot, "owner": owner, "leader": True, "holder": None}
+    if lock is None:
+        yield status
+        return
+
+    try:
+        status["leader"], status["holder"] = lock.acquire(slot, owner, ttl_s)
+    except Exception as e:
+        logger.warning("Could not claim job slot %s: %s", slot, e)
+        status.update(leader=False, holder={"error": str(e)})
+    if not status["leader"]:
+        yield status
+        return
+
+    stop = threading.Event()
+    renewer = threading.Thread(target=_keep_renewed, args=(lock, slot, owner, ttl_s, stop), daemon=True)
+    renewer.start()
+    done = False
+    try:
+        yield status
+        done = True
+    finally:
+        stop.set()
+        renewer.join()
+        try:
+            lock.release(slot, owner, done=done)
+        except Exception as e:
+            logger.warning("Could not release job slot %s: %s", slot, e)
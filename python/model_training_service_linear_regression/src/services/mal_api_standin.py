@@ -0,0 +1,139 @@
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+def generate_samples(n: int, start: str = "2025-01-01", interval_minutes: int = 10, seed: int = 0) -> pd.DataFrame:
+    """
+    Synthetic sensor history in the MAL-API SampleDTO format: soil dries faster when warm and bright and is
+    watered back up when it gets low, with daily cycles in temperature, light and air humidity.
+    """
+    rng = np.random.default_rng(seed)
+    timestamps = pd.date_range(start, periods=n, freq=f"{interval_minutes}min")
+    day = 2 * np.pi * (timestamps.hour.to_numpy() + timestamps.minute.to_numpy() / 60) / 24
+
+    temperature = 18 + 6 * np.sin(day - 2.2) + rng.normal(0, 0.8, n)
+    light = np.clip(900 * np.sin(day - 1.6), 0, None) + rng.normal(0, 10, n).clip(0)
+    air_humidity = np.clip(65 - 12 * np.sin(day - 2.2) + rng.normal(0, 3, n), 25, 88)
+
+    # Drying per interval in %, watering resets the soil to 60-75% once it drops below 12-25%
+    drying = (0.05 + 0.006 * temperature + 0.0002 * light) * interval_minutes / 10
+    soil = np.empty(n)
+    level = rng.uniform(60, 75)
+    refill_at = rng.uniform(12, 25)
+    for i in range(n):
+        soil[i] = level
+        level -= drying[i]
+        if level < refill_at:
+            level = rng.uniform(60, 75)
+            refill_at = rng.uniform(12, 25)
+    soil += rng.normal(0, 0.3, n)
+
+    return pd.DataFrame({
+        "timestamp": timestamps,
+        "soil_humidity": soil.round(2),
+        "air_humidity": air_humidity.round(2),
+        "air_temperature": temperature.round(2),
+        "light_value": light.round(1),
+        "lower_threshold": 20.0,
+    })
+
+
+class MalApiStandIn:
+    """
+    Local HTTP stand-in for the MAL-API /sensor/data and /sensor/soilhumiditythreshold endpoints.
+
+    Serves generated samples (honouring the from/to query parameters like the real API) after an
+    artificial latency. Point the service at it with MAL_API_BASE_URL=<base_url>.
+    """
+
+    def __init__(self, n_samples: int = 10_000, threshold: float = 30.0, latency_s: float = 0.0,
+                 host: str = "127.0.0.1", port: int = 0, seed: int = 0):
+        self.threshold = threshold
+        self.latency_s = latency_s
+        self.seed = seed
+        self.requests = 0
+        self.bytes_served = 0
+        self.set_samples(n_samples)
+
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                standin._handle(self)
+
+            def log_message(self, _format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def set_samples(self, n_samples: int):
+        self.samples = generate_samples(n_samples, seed=self.seed)
+        self._full_body = None
+
+    def _samples_body(self, query: dict) -> bytes:
+        frm, to = query.get("from", [None])[0], query.get("to", [None])[0]
+        if frm is None and to is None and self._full_body is not None:
+            return self._full_body
+
+        df = self.samples
+        if frm is not None:
+            df = df[df["timestamp"] >= pd.Timestamp(frm)]
+        if to is not None:
+            df = df[df["timestamp"] <= pd.Timestamp(to)]
+        body = df.to_json(orient="records", date_format="iso").encode()
+
+        if frm is None and to is None:
+            self._full_body = body
+        return body
+
+    def _handle(self, request: BaseHTTPRequestHandler):
+        url = urlparse(request.path)
+        if url.path == "/sensor/data":
+            body = self._samples_body(parse_qs(url.query))
+        elif url.path == "/sensor/soilhumiditythreshold":
+            body = json.dumps(self.threshold).encode()
+        else:
+            request.send_error(404)
+            return
+
+        if self.latency_s:
+            time.sleep(self.latency_s)
+
+        request.send_response(200)
+        request.send_header("Content-Type", "application/json")
+        request.send_header("Content-Length", str(len(body)))
+        request.end_headers()
+        request.wfile.write(body)
+        self.requests += 1
+        self.bytes_served += len(body)
+
+    def start(self) -> "MalApiStandIn":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mal-api-standin", daemon=True)
+        self._thread.start()
+        logger.info("MAL-API stand-in serving %d samples on %s", len(self.samples), self.base_url)
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "MalApiStandIn":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
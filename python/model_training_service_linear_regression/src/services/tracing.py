@@ -0,0 +1,217 @@
+import contextvars
+import cProfile
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+from src.config import TRACE_ENABLED, TRACE_DIR, TRACE_PROFILER, TRACE_SAMPLE_INTERVAL_S, TRACE_UPLOAD
+from src.services.blob_uploader import upload_to_blob
+
+logger = logging.getLogger(__name__)
+
+TRACE_SUFFIX = ".trace.jsonl"
+
+# The open trace of the current thread (the scheduler runs jobs on its own worker threads)
+_current_run = contextvars.ContextVar("trace_run", default=None)
+
+
+class _TraceRun:
+    """One traced run: a JSONL file with one record per finished span, plus the stack of open spans."""
+
+    def __init__(self, path: str):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.path = path
+        self.stack = []
+        self._file = open(path, "w", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def write(self, record: dict):
+        with self._lock:
+            self._file.write(json.dumps(record, default=str) + "\n")
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def _record(run: _TraceRun, span_id: str, parent_id, name: str, start: float, duration_s: float, attrs: dict,
+            error=None):
+    record = {
+        "run_id": run.run_id,
+        "span_id": span_id,
+        "parent_id": parent_id,
+        "name": name,
+        "start": datetime.fromtimestamp(start).isoformat(),
+        "duration_ms": round(duration_s * 1000, 3),
+        "status": "error" if error else "ok",
+        "attrs": attrs,
+    }
+    if error:
+        record["error"] = repr(error)
+    run.write(record)
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """
+    Times the enclosed block as a child of the innermost open span. Does nothing outside a traced run.
+    Yields the attribute dict, so the block can attach results (row counts, scores) to the span.
+    """
+    run = _current_run.get()
+    if run is None:
+        yield attrs
+        return
+
+    span_id = uuid.uuid4().hex[:8]
+    parent_id = run.stack[-1] if run.stack else None
+    run.stack.append(span_id)
+    start = time.time()
+    t0 = time.perf_counter()
+    try:
+        yield attrs
+    except BaseException as e:
+        _record(run, span_id, parent_id, name, start, time.perf_counter() - t0, attrs, error=e)
+        raise
+    else:
+        _record(run, span_id, parent_id, name, start, time.perf_counter() - t0, attrs)
+    finally:
+        run.stack.pop()
+
+
+def record_cv_fits(search, name: str = "cv_fit"):
+    """
+    Adds one span per hyperparameter candidate of a fitted GridSearchCV under the current span.
+
+    The fits run in joblib worker processes, so they cannot be timed in place. The spans are built from
+    cv_results_ instead: duration is the summed fit time over all folds, with the per-fold scores as attributes.
+    """
+    run = _current_run.get()
+    if run is None:
+        return
+
+    results = search.cv_results_
+    n_splits = search.n_splits_
+    parent_id = run.stack[-1] if run.stack else None
+    now = time.time()
+    for i, params in enumerate(results["params"]):
+        attrs = {
+            "params": {k: float(v) if hasattr(v, "dtype") else v for k, v in params.items()},
+            "n_splits": n_splits,
+            "mean_fit_time_s": float(results["mean_fit_time"][i]),
+            "mean_score_time_s": float(results["mean_score_time"][i]),
+            "fold_scores": [float(results[f"split{k}_test_score"][i]) for k in range(n_splits)],
+            "rank": int(results["rank_test_score"][i]),
+        }
+        _record(run, uuid.uuid4().hex[:8], parent_id, name, now,
+                float(results["mean_fit_time"][i]) * n_splits, attrs)
+
+
+class _SamplingProfiler(threading.Thread):
+    """Samples the stack of one thread at a fixed interval and counts identical stacks (collapsed format)."""
+
+    def __init__(self, thread_id: int, interval_s: float):
+        super().__init__(name="trace-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval_s = interval_s
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval_s):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def dump(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def _start_profiler(kind: str):
+    if kind == "cprofile":
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+    if kind == "sampling":
+        profiler = _SamplingProfiler(threading.get_ident(), TRACE_SAMPLE_INTERVAL_S)
+        profiler.start()
+        return profiler
+    if kind:
+        logger.warning("Unknown profiler '%s'. Expected 'cprofile' or 'sampling'. Profiling disabled.", kind)
+    return None
+
+
+def _stop_profiler(profiler, base_path: str):
+    """Stops the profiler and writes its output. Returns the profile path, or None if nothing was profiled."""
+    if profiler is None:
+        return None
+    if isinstance(profiler, cProfile.Profile):
+        profiler.disable()
+        path = base_path + ".prof"
+        profiler.dump_stats(path)
+    else:
+        profiler.stop()
+        path = base_path + ".folded"
+        profiler.dump(path)
+    return path
+
+
+@contextmanager
+def trace_run(name: str, **attrs):
+    """
+    Root of a trace. With tracing enabled (TRAINING_TRACE=1) this opens '<TRACE_DIR>/<name>_<timestamp>.trace.jsonl'
+    and records the block as the root span. Inside an already traced run it is an ordinary nested span, so
+    train_model traces on its own as well as under scheduler.job().
+
+    TRAINING_PROFILER=cprofile writes a pstats '.prof' file next to the trace (flameprof, snakeviz),
+    TRAINING_PROFILER=sampling writes collapsed stacks to '.folded' (flamegraph.pl, speedscope).
+    """
+    if _current_run.get() is not None:
+        with span(name, **attrs) as s:
+            yield s
+        return
+    if not TRACE_ENABLED:
+        yield attrs
+        return
+
+    os.makedirs(TRACE_DIR, exist_ok=True)
+    base_path = os.path.join(TRACE_DIR, f"{name}_{datetime.now().strftime('%Y%m%d%H%M%S')}")
+    run = _TraceRun(base_path + TRACE_SUFFIX)
+    token = _current_run.set(run)
+    profiler = _start_profiler(TRACE_PROFILER)
+    try:
+        with span(name, **attrs) as s:
+            yield s
+    finally:
+        profile_path = _stop_profiler(profiler, base_path)
+        _current_run.reset(token)
+        run.close()
+        logger.info("Trace written to %s%s", run.path, f", profile to {profile_path}" if profile_path else "")
+        if TRACE_UPLOAD:
+            _upload([run.path, profile_path])
+
+
+def _upload(paths):
+    # Traces are diagnostics, a failed upload must not fail the training run
+    for path in filter(None, paths):
+        try:
+            upload_to_blob(path, f"traces/{os.path.basename(path)}")
+        except Exception as e:
+            logger.warning("Could not upload trace file %s: %s", path, e)
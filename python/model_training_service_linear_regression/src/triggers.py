@@ -0,0 +1,168 @@
+import json
+import logging
+import threading
+import time
+from typing import Callable, List, Optional
+
+import pandas as pd
+from src.config import (TRIGGER_MIN_NEW_SAMPLES, TRIGGER_DRIFT_THRESHOLD, TRIGGER_DRIFT_MIN_SAMPLES,
+                        TRIGGER_DEBOUNCE_SECONDS, TRIGGER_MIN_INTERVAL_SECONDS, TRIGGER_MAX_BACKOFF_SECONDS)
+from src.data.cleaning import clean_sensor_data
+from src.data.io import fetch_sensor_data_since
+from src.data.parsing import parse_samples
+from src.features.sketches import build_sketches, drift_scores, sketches_from_dict
+
+logger = logging.getLogger(__name__)
+
+
+def _is_empty_payload(payload) -> bool:
+    if isinstance(payload, dict):
+        return not payload.get("response", {}).get("list")
+    return not payload
+
+
+class RetrainTrigger:
+    """
+    Decides whether new data justifies a training run.
+
+    The reference is the last trained model's metadata: its feature sketches and their watermark (newest
+    ingested timestamp). Each check fetches only the samples after the watermark, counts them and scores
+    their drift against the sketches. Call refresh() after every training run to move the watermark.
+    Checks and refreshes from different scheduler threads are serialized.
+    """
+
+    def __init__(self, load_metadata: Callable[[], Optional[dict]], fetch_since=fetch_sensor_data_since,
+                 min_new_samples: int = TRIGGER_MIN_NEW_SAMPLES, drift_threshold: float = TRIGGER_DRIFT_THRESHOLD,
+                 drift_min_samples: int = TRIGGER_DRIFT_MIN_SAMPLES):
+        self.load_metadata = load_metadata
+        self.fetch_since = fetch_since
+        self.min_new_samples = min_new_samples
+        self.drift_threshold = drift_threshold
+        self.drift_min_samples = drift_min_samples
+        self.sketches = {}
+        self.watermark = None
+        # Result of the last check, for logging and the cron fallback. None after a failed check
+        self.new_samples = None
+        self.drift = None
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        metadata = self.load_metadata() or {}
+        with self._lock:
+            self.sketches, self.watermark = sketches_from_dict(metadata.get("feature_sketches", {}))
+            logger.info("Retrain trigger reference watermark: %s", self.watermark)
+
+    def check(self) -> List[str]:
+        """Returns the reasons to retrain now (empty if none)."""
+        return self.check_new_samples()[0]
+
+    def check_new_samples(self):
+        """
+        Like check(), but returns (reasons, new sample count) from the same check, so another thread's check cannot
+        come in between.
+        """
+        with self._lock:
+            try:
+                return self._check(), self.new_samples
+            except Exception:
+                self.new_samples, self.drift = None, None
+                raise
+
+    def _check(self) -> List[str]:
+        if self.watermark is None:
+            self.new_samples, self.drift = None, None
+            return ["no_model"]
+
+        payload = self.fetch_since(self.watermark)
+        if _is_empty_payload(payload):
+            self.new_samples, self.drift = 0, None
+            return []
+
+        df = parse_samples(json.dumps(payload))
+        df = df[df["timestamp"] > pd.Timestamp(self.watermark)]
+        self.new_samples = len(df)
+
+        reasons = []
+        if self.new_samples >= self.min_new_samples:
+            reasons.append(f"new_samples={self.new_samples}")
+
+        self.drift = None
+        if self.new_samples >= self.drift_min_samples and self.sketches:
+            cleaned = clean_sensor_data(df, expected_interval_minutes=10, gap_drop_threshold=60)
+            if not cleaned.empty:
+                self.drift = drift_scores(self.sketches, build_sketches(cleaned))
+                if self.drift["max"] is not None and self.drift["max"] > self.drift_threshold:
+                    reasons.append(f"drift={self.drift['max']}")
+
+        logger.info("Retrain trigger check: %d new samples, drift %s -> %s",
+                    self.new_samples, self.drift and self.drift["max"], reasons or "no trigger")
+        return reasons
+
+
+class RetrainCoordinator:
+    """
+    Turns trigger requests into training runs: requests within the debounce window are merged into one run,
+    runs are at least min_interval_s apart and never overlap. tick() starts a due run on the calling thread.
+    run_training returns the run's status: after a 'failed' run the interval doubles per consecutive failure (up
+    to max_backoff_s), so a trigger that keeps firing does not retry a broken run every min_interval_s.
+    """
+
+    def __init__(self, run_training: Callable[[List[str]], Optional[str]], debounce_s: float = TRIGGER_DEBOUNCE_SECONDS,
+                 min_interval_s: float = TRIGGER_MIN_INTERVAL_SECONDS,
+                 max_backoff_s: float = TRIGGER_MAX_BACKOFF_SECONDS, clock=time.monotonic):
+        self.run_training = run_training
+        self.debounce_s = debounce_s
+        self.min_interval_s = min_interval_s
+        self.max_backoff_s = max_backoff_s
+        self.clock = clock
+        # Consecutive failed runs
+        self.failures = 0
+        # Latest reason per trigger kind ('new_samples', 'drift', 'cron', ...)
+        self.pending = {}
+        self.due = None
+        self.last_run = None
+        self._lock = threading.Lock()
+        self._running = threading.Lock()
+
+    def request(self, reason: str, delay: Optional[float] = None):
+        with self._lock:
+            self.pending[reason.split("=")[0]] = reason
+            due = self.clock() + (self.debounce_s if delay is None else delay)
+            if self.due is None:
+                self.due = due
+            elif delay is not None:
+                # Merged into the pending run, an explicit delay can only bring it forward
+                self.due = min(self.due, due)
+
+    def interval(self) -> float:
+        """Minimum time after the last run before the next one: min_interval_s, backed off after failed runs."""
+        if not self.failures:
+            return self.min_interval_s
+        return max(self.min_interval_s, min(self.min_interval_s * 2 ** self.failures, self.max_backoff_s))
+
+    def tick(self) -> bool:
+        """Runs training if a merged request is due. Returns True if a run happened."""
+        with self._lock:
+            now = self.clock()
+            if self.due is None or now < self.due:
+                return False
+            interval = self.interval()
+            if self.last_run is not None and now - self.last_run < interval:
+                self.due = self.last_run + interval
+                logger.info("Retraining postponed by the minimum interval (%ds, %d failed runs). Pending triggers: %s",
+                            interval, self.failures, list(self.pending.values()))
+                return False
+            if not self._running.acquire(blocking=False):
+                return False
+            reasons, self.pending, self.due = list(self.pending.values()), {}, None
+
+        status = "failed"
+        try:
+            logger.info("Starting triggered training run. Triggers: %s", reasons)
+            status = self.run_training(reasons)
+        finally:
+            with self._lock:
+                self.last_run = self.clock()
+                self.failures = self.failures + 1 if status == "failed" else 0
+            self._running.release()
+        return True
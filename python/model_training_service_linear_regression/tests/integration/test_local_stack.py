@@ -0,0 +1,27 @@
+# tests/integration/test_local_stack.py
+import json
+
+import src.data.io as io_mod
+import src.models.ridge as ridge_mod
+import src.scheduler as scheduler_mod
+import src.services.blob_uploader as blob_mod
+from src.services.mal_api_standin import MalApiStandIn
+
+
+def test_job_against_local_mal_api_and_blob_store(monkeypatch, tmp_path):
+    blob_dir = tmp_path / "blobs"
+    monkeypatch.setattr(blob_mod, "LOCAL_BLOB_DIR", str(blob_dir))
+    monkeypatch.setattr(ridge_mod, "LOCAL_MODELS_DIR", str(tmp_path / "models"))
+
+    with MalApiStandIn(n_samples=2000, threshold=30, latency_s=0.01) as standin:
+        monkeypatch.setattr(io_mod, "DATA_ENDPOINT", f"{standin.base_url}/sensor/data")
+        monkeypatch.setattr(io_mod, "THRESHOLD_ENDPOINT", f"{standin.base_url}/sensor/soilhumiditythreshold")
+        scheduler_mod.job()
+        assert standin.requests == 2
+
+    (metadata_file,) = blob_dir.glob("soil_humidity_baseline_ridge_*.metadata.json")
+    for suffix in (".onnx", ".stats.json"):
+        assert (blob_dir / metadata_file.name.replace(".metadata.json", suffix)).exists()
+    metadata = json.loads(metadata_file.read_text())
+    assert metadata["training_mode"] == "full"
+    assert metadata["feature_sketches"]["features"]["soil_humidity"]["count"] == 2000
@@ -0,0 +1,73 @@
+# tests/unit/test_cleaning.py
+import numpy as np
+import pandas as pd
+
+from src.data.cleaning import clean_sensor_data, filter_spikes
+
+MIN_DEVIATION = {"soil_humidity": 5.0, "air_humidity": 10.0, "temperature": 3.0}
+
+
+def _readings(n=400, seed=1):
+    # Two devices reporting alternately, at very different soil humidity levels
+    rng = np.random.default_rng(seed)
+    device = np.where(np.arange(n) % 2 == 0, "a", "b")
+    soil = np.where(device == "a", 30.0, 60.0) + rng.normal(0, 0.5, n)
+    soil[200::2] += 25  # device a is watered
+    return pd.DataFrame({
+        "timestamp": pd.date_range("2025-01-01", periods=n, freq="5min"),
+        "device_id": device,
+        "soil_humidity": soil,
+        "air_humidity": 50 + rng.normal(0, 1, n),
+        "temperature": 20 + rng.normal(0, 0.2, n),
+        "light": 100.0,
+    })
+
+
+def test_spikes_are_repaired_or_dropped_per_device():
+    df = _readings()
+    df.loc[101, "soil_humidity"] = 95.0             # single spike of device b
+    df.loc[[51, 53], "soil_humidity"] = 5.0         # two consecutive readings of device b
+    df.loc[300, "temperature"] = 35.0
+
+    out, report = filter_spikes(df, MIN_DEVIATION, window=7, sensitivity=3.0)
+
+    assert report["dropped"] == 2 and report["repaired"] == {"soil_humidity": 1, "air_humidity": 0, "temperature": 1}
+    assert 51 not in out.index and 53 not in out.index
+    b = df[df["device_id"] == "b"]["soil_humidity"]
+    expected = b.rolling(7, center=True, min_periods=4).median()[101]
+    assert np.isclose(out.loc[101, "soil_humidity"], expected)
+    # The watering step and every other reading pass unchanged, in input order
+    untouched = out.index.difference([101, 300])
+    pd.testing.assert_frame_equal(out.loc[untouched], df.loc[untouched])
+    assert list(out.index) == sorted(out.index)
+
+
+def test_clean_sensor_data_spike_filter_is_optional():
+    df = _readings()
+    df.loc[101, "soil_humidity"] = 95.0
+
+    assert clean_sensor_data(df, 10, 60)["soil_humidity"].max() == 95.0
+    cleaned = clean_sensor_data(df, 10, 60, spike_filter=True)
+    assert cleaned["soil_humidity"].max() < 90.0
+    assert len(cleaned) == len(df)
+
+
+def test_spike_threshold_uses_the_hampel_mad():
+    rng = np.random.default_rng(3)
+    soil = 40 + rng.standard_t(2, 300) * 4
+    df = pd.DataFrame({"timestamp": pd.date_range("2025-01-01", periods=300, freq="5min"), "soil_humidity": soil})
+
+    out, report = filter_spikes(df, {"soil_humidity": 0.0}, window=7, sensitivity=2.0, group_col="none")
+
+    # Reference: median of |x_j - median_i| over the window of reading i, cut short at the ends
+    spikes = []
+    for i in range(len(soil)):
+        window = soil[max(i - 3, 0):i + 4]
+        median = np.median(window)
+        mad = np.median(np.abs(window - median))
+        spikes.append(abs(soil[i] - median) > 2.0 * 1.4826 * mad)
+    spikes = np.array(spikes)
+    isolated = spikes & ~np.r_[False, spikes[:-1]] & ~np.r_[spikes[1:], False]
+    assert spikes.sum() > 10
+    assert report["repaired"]["soil_humidity"] == isolated.sum()
+    assert report["dropped"] == (spikes & ~isolated).sum()
@@ -0,0 +1,77 @@
+# tests/unit/test_forecast.py
+import json
+
+import numpy as np
+import onnx
+import pandas as pd
+from onnx.reference import ReferenceEvaluator
+
+import src.models.onnx_export as onnx_export_mod
+import src.models.ridge as ridge_mod
+from src.features.horizons import soil_at_horizons
+from src.models.forecast import train_forecast_model
+
+
+def test_soil_at_horizons_matches_nearest_sample_lookup():
+    rng = np.random.default_rng(0)
+    ts = np.cumsum(rng.integers(5, 16, 500))  # irregular 5-15 min sampling
+    ts[200:] += 300                            # and a 5 h sensor gap
+    soil = rng.uniform(10, 70, ts.size)
+    horizons, tolerance = [60, 180], 10
+
+    out = soil_at_horizons(soil, ts, horizons, tolerance)
+
+    for i in range(0, ts.size, 7):
+        for j, h in enumerate(horizons):
+            nearest = np.argmin(np.abs(ts - (ts[i] + h)))
+            expected = soil[nearest] if abs(ts[nearest] - ts[i] - h) <= tolerance else np.nan
+            np.testing.assert_equal(out[i, j], expected)
+    # Across the gap and at the end of the series there is nothing to learn from
+    assert np.isnan(out[199, 0]) and np.isnan(out[-1]).all()
+
+
+def _payload(n=2000):
+    ts = pd.date_range("2025-01-01", periods=n, freq="10min")
+    soil = 60 - (np.arange(n) % 150) * 0.3
+    rows = [{
+        "soil_humidity": float(s),
+        "air_humidity": 50.0,
+        "temperature": 20.0 + (i % 144) / 24,
+        "light": 100.0 + (i % 144),
+        "timestamp": t.strftime("%Y-%m-%dT%H:%M:%S")
+    } for i, (t, s) in enumerate(zip(ts, soil))]
+    return json.dumps(rows)
+
+
+def test_forecast_model_predicts_every_horizon_in_one_call(monkeypatch, tmp_path):
+    monkeypatch.setattr(ridge_mod, "LOCAL_MODELS_DIR", str(tmp_path))
+
+    result = train_forecast_model(_payload())
+
+    metadata = json.loads((tmp_path / result["metadata_file"]).read_text())
+    assert metadata["horizons_minutes"] == [60, 180, 360, 720]
+    assert len(metadata["rmse_last_fold_by_horizon"]) == 4
+    assert len(metadata["feature_names"]) == 7
+
+    onnx_model = onnx.load(str(tmp_path / result["model_file"]))
+    assert [node.op_type for node in onnx_model.graph.node] == ["Gemm"]
+    rows = np.tile([[50.0, -0.3, 50.0, 21.0, 150.0, 0.5, 0.8]], (3, 1)).astype(np.float32)
+    forecast = ReferenceEvaluator(onnx_model).run(None, {"input": rows})[0]
+    assert forecast.shape == (3, 4)
+    # Soil keeps drying: later horizons forecast lower humidity
+    assert (np.diff(forecast[0]) < 0).all()
+
+
+def test_skl2onnx_fallback_declares_every_horizon_output(monkeypatch, tmp_path):
+    monkeypatch.setattr(ridge_mod, "LOCAL_MODELS_DIR", str(tmp_path))
+    monkeypatch.setattr(onnx_export_mod, "RIDGE_ONNX_EXPORTER", "skl2onnx")
+
+    result = train_forecast_model(_payload())
+
+    metadata = json.loads((tmp_path / result["metadata_file"]).read_text())
+    assert metadata["onnx_exporter"] == "skl2onnx" and metadata["onnx_parity_max_abs_diff"] < 0.1
+    onnx_model = onnx.load(str(tmp_path / result["model_file"]))
+    output_dims = onnx_model.graph.output[0].type.tensor_type.shape.dim
+    assert output_dims[1].dim_value == 4
+    rows = np.tile([[50.0, -0.3, 50.0, 21.0, 150.0, 0.5, 0.8]], (3, 1)).astype(np.float32)
+    assert ReferenceEvaluator(onnx_model).run(None, {"input": rows})[0].shape == (3, 4)
@@ -0,0 +1,137 @@
+# tests/unit/test_job_lock.py
+import json
+import threading
+import time
+
+import pytest
+
+import src.scheduler as scheduler_mod
+import src.services.artifacts as artifacts_mod
+import src.services.blob_uploader as blob_mod
+import src.services.job_lock as job_lock_mod
+from src.services.job_lock import FileJobLock, leadership, schedule_slot, trigger_slot
+
+
+def test_file_lock_claims_a_slot_once(tmp_path):
+    lock = FileJobLock(str(tmp_path))
+    assert lock.acquire("slot", "a", ttl_s=60)[0]
+    acquired, holder = lock.acquire("slot", "b", ttl_s=60)
+    assert not acquired and holder["owner"] == "a"
+    # A completed slot stays taken for replicas arriving late
+    lock.release("slot", "a", done=True)
+    assert not lock.acquire("slot", "b", ttl_s=60)[0]
+
+    # An expired claim (its holder died) and a failed run's slot can be taken over
+    assert lock.acquire("expired", "a", ttl_s=-1)[0]
+    assert lock.acquire("expired", "b", ttl_s=60)[0]
+    with pytest.raises(RuntimeError), leadership(lock, "failed", owner="a"):
+        raise RuntimeError("training failed")
+    assert lock.acquire("failed", "b", ttl_s=60)[0]
+
+
+def test_schedule_slot_tolerates_clock_skew():
+    midnight = 1767225600  # 2026-01-01 00:00 UTC
+    assert schedule_slot("m", 3600, now=midnight - 2) == "m_20260101T0000Z"
+    assert schedule_slot("m", 3600, now=midnight + 3) == "m_20260101T0000Z"
+    assert schedule_slot("m", 3600, now=midnight + 3600) == "m_20260101T0100Z"
+
+
+def test_triggered_runs_in_one_hour_get_their_own_slots(tmp_path):
+    lock = FileJobLock(str(tmp_path))
+    half_past = 1767225600 + 31 * 60  # 2026-01-01 00:31 UTC, in the 01:00 schedule slot like 01:29
+    first = trigger_slot("m", "2026-01-01T00:20:00", 3600, now=half_past)
+    with leadership(lock, first, owner="a"):
+        pass
+
+    # The first run published a model with a newer watermark: the next trigger in the same hour is a new run
+    second = trigger_slot("m", "2026-01-01T00:30:00", 3600, now=half_past + 58 * 60)
+    assert first == "m_20260101T0100Z_after_20260101T002000" and second != first
+    assert lock.acquire(second, "b", ttl_s=60)[0]
+    # Replicas polling the same model still agree on the slot, and skip it once done
+    assert not lock.acquire(trigger_slot("m", "2026-01-01T00:20:00", 3600, now=half_past + 60), "c", ttl_s=60)[0]
+
+
+def test_only_one_replica_trains_per_slot(monkeypatch, tmp_path):
+    monkeypatch.setattr(scheduler_mod, "job_lock", lambda: FileJobLock(str(tmp_path)))
+    monkeypatch.setattr(scheduler_mod, "fetch_sensor_data", lambda timeout=...: [])
+    monkeypatch.setattr(scheduler_mod, "fetch_threshold", lambda timeout=...: 30)
+    trained = []
+
+    def slow_train(json_samples, json_threshold):
+        trained.append(json_threshold)
+        time.sleep(0.5)
+        return {"rmse_cv": 1.0, "r2_insample": 0.5}
+
+    monkeypatch.setattr(scheduler_mod, "train_model", slow_train)
+
+    reports = []
+
+    def replica():
+        start = time.perf_counter()
+        report = scheduler_mod.job("slot")
+        reports.append((report, time.perf_counter() - start))
+
+    replicas = [threading.Thread(target=replica) for _ in range(4)]
+    for t in replicas:
+        t.start()
+    for t in replicas:
+        t.join()
+
+    assert len(trained) == 1
+    statuses = sorted(report["status"] for report, _ in reports)
+    assert statuses == ["skipped", "skipped", "skipped", "trained"]
+    assert all(seconds < 0.25 for report, seconds in reports if report["status"] == "skipped")
+    # The holder is reported, and the slot stays done after the leader finished
+    assert all(report["holder"]["state"] == "running" for report, _ in reports if report["status"] == "skipped")
+    assert scheduler_mod.job("slot")["status"] == "skipped"
+    assert scheduler_mod.job("next slot")["status"] == "trained"
+
+
+def test_local_blob_store_locks_files_whatever_the_backend(monkeypatch, tmp_path):
+    monkeypatch.setattr(job_lock_mod, "JOB_LOCK_BACKEND", "blob")
+    monkeypatch.setattr(job_lock_mod, "LOCAL_BLOB_DIR", str(tmp_path))
+    monkeypatch.setattr(job_lock_mod, "JOB_LOCK_DIR", str(tmp_path / "locks"))
+    lock = job_lock_mod.job_lock()
+    assert isinstance(lock, FileJobLock) and lock.directory == str(tmp_path / "locks")
+
+
+def _write_metadata(directory, name, watermark):
+    directory.mkdir(exist_ok=True)
+    (directory / name).write_text(json.dumps({"watermark": watermark}))
+
+
+def test_skipped_replica_follows_the_model_published_by_the_leader(monkeypatch, tmp_path):
+    blobs, models = tmp_path / "blobs", tmp_path / "models"
+    monkeypatch.setattr(blob_mod, "LOCAL_BLOB_DIR", str(blobs))
+    monkeypatch.setattr(artifacts_mod, "JOB_LOCK_BACKEND", "file")
+    monkeypatch.setattr(scheduler_mod, "JOB_LOCK_BACKEND", "file")
+    monkeypatch.setattr(scheduler_mod, "LOCAL_MODELS_DIR", str(models))
+    base = scheduler_mod.BASE_NAME
+    _write_metadata(blobs, f"{base}_20260101T000000.metadata.json", "old")
+    # The replica trained the old model itself, or fetched it before: it has a local copy
+    _write_metadata(models, f"{base}_20260101T000000.metadata.json", "old")
+
+    references = []
+    monkeypatch.setattr(scheduler_mod, "RetrainTrigger", lambda load: type("Trigger", (), {
+        "watermark": None,
+        "refresh": lambda self: references.append(load()["watermark"]),
+        "check": lambda self: [],
+    })())
+    monkeypatch.setattr(scheduler_mod, "job", lambda slot=None: {"slot": slot, "status": "skipped", "holder": None})
+    trigger, coordinator = scheduler_mod.build_triggers()
+
+    # The leader publishes a newer model while this replica skips its slot
+    _write_metadata(blobs, f"{base}_20260101T010000.metadata.json", "new")
+    coordinator.run_training(["new_samples"])
+    assert references == ["old", "new"]
+    assert (models / f"{base}_20260101T010000.metadata.json").exists()
+
+    # Models published later are picked up by the next poll
+    _write_metadata(blobs, f"{base}_20260101T020000.metadata.json", "newer")
+    scheduler_mod.poll_triggers(trigger, coordinator)
+    assert references[-1] == "newer"
+
+    # Without job locking the replica trains every run itself and keeps to its local models
+    monkeypatch.setattr(artifacts_mod, "JOB_LOCK_BACKEND", "")
+    _write_metadata(blobs, f"{base}_20260101T030000.metadata.json", "other")
+    assert artifacts_mod.load_latest_metadata(str(models), base)["watermark"] == "newer"
@@ -0,0 +1,43 @@
+# tests/unit/test_onnx_export.py
+import numpy as np
+from skl2onnx import convert_sklearn
+from skl2onnx.common.data_types import FloatTensorType
+from sklearn.linear_model import Ridge
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+from src.models.onnx_export import onnx_parity_max_abs_diff, ridge_pipeline_to_onnx
+from src.models.ridge_stats import RidgeSufficientStats
+
+
+def _pipeline(n=500, seed=0):
+    rng = np.random.default_rng(seed)
+    # Feature scales like the real ones: soil %, delta, air %, temperature, light, hour sin/cos, threshold
+    X = rng.normal(size=(n, 8)) * [15, 1, 10, 5, 300, 0.7, 0.7, 15] + [40, 0, 55, 20, 400, 0, 0, 35]
+    X[:, 7] = 30.0  # constant column, scale_ falls back to 1
+    y = X @ [30, -100, 2, -20, -0.5, 50, 30, 0] + rng.normal(scale=20, size=n) + 500
+    return make_pipeline(StandardScaler(), Ridge(alpha=2.0)).fit(X, y), X
+
+
+def test_native_export_is_a_single_gemm_matching_the_pipeline():
+    pipe, X = _pipeline()
+    onnx_model = ridge_pipeline_to_onnx(pipe, X.shape[1])
+
+    assert [node.op_type for node in onnx_model.graph.node] == ["Gemm"]
+    assert onnx_parity_max_abs_diff(onnx_model, pipe, X) < 1e-2
+
+    # Same signature as the skl2onnx export the prediction service was built against
+    reference = convert_sklearn(pipe, initial_types=[("input", FloatTensorType([None, X.shape[1]]))])
+    assert [i.SerializeToString() for i in onnx_model.graph.input] == \
+           [i.SerializeToString() for i in reference.graph.input]
+    assert onnx_model.graph.output[0].name == reference.graph.output[0].name
+    assert onnx_model.ByteSize() < reference.ByteSize()
+
+
+def test_native_export_of_statistics_pipeline():
+    _pipe, X = _pipeline(seed=1)
+    y = X[:, 0] * 3 + 10
+    stats = RidgeSufficientStats.from_arrays(X, y, [f"f{i}" for i in range(8)], threshold=30)
+    pipe = stats.to_pipeline(alpha=0.1)
+
+    assert onnx_parity_max_abs_diff(ridge_pipeline_to_onnx(pipe, 8), pipe, X) < 1e-2
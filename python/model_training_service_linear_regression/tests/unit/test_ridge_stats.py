@@ -0,0 +1,194 @@
+# tests/unit/test_ridge_stats.py
+import json
+
+import numpy as np
+import pandas as pd
+from onnx.reference import ReferenceEvaluator
+from skl2onnx import convert_sklearn
+from skl2onnx.common.data_types import FloatTensorType
+from sklearn.linear_model import Ridge
+from sklearn.metrics import r2_score
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+import src.models.ridge as ridge_mod
+import src.services.artifacts as artifacts_mod
+from src.models.ridge import load_previous_stats, train_model
+from src.models.ridge_stats import RidgeSufficientStats
+from src.services.mal_api_standin import generate_samples
+
+FEATURES = ["a", "b", "c", "threshold"]
+
+
+def _make_data(n, seed):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n, len(FEATURES))) * [1.0, 10.0, 0.1, 0.0] + [0.0, 50.0, 3.0, 30.0]
+    y = X[:, :3] @ [2.0, -0.5, 40.0] + rng.normal(scale=0.5, size=n)
+    return X, y
+
+
+def test_merged_stats_match_full_refit():
+    X_old, y_old = _make_data(300, seed=1)
+    X_new, y_new = _make_data(50, seed=2)
+    X_all, y_all = np.vstack([X_old, X_new]), np.concatenate([y_old, y_new])
+
+    old = RidgeSufficientStats.from_arrays(X_old, y_old, FEATURES, threshold=30)
+    new = RidgeSufficientStats.from_arrays(X_new, y_new, FEATURES, threshold=30)
+    merged = old.merge(new)
+
+    alpha = 1.5
+    incremental = merged.to_pipeline(alpha)
+    full = make_pipeline(StandardScaler(), Ridge(alpha=alpha)).fit(X_all, y_all)
+
+    assert merged.n == len(y_all)
+    np.testing.assert_allclose(incremental.predict(X_all), full.predict(X_all), rtol=1e-8, atol=1e-8)
+    assert np.isclose(merged.r2(incremental), r2_score(y_all, full.predict(X_all)))
+
+
+def test_stats_pipeline_exports_to_onnx():
+    X, y = _make_data(200, seed=3)
+    stats = RidgeSufficientStats.from_arrays(X, y, FEATURES, threshold=30)
+    pipe = stats.to_pipeline(alpha=0.1)
+
+    onnx_model = convert_sklearn(pipe, initial_types=[("input", FloatTensorType([None, len(FEATURES)]))])
+    onnx_pred = ReferenceEvaluator(onnx_model).run(None, {"input": X.astype(np.float32)})[0].ravel()
+
+    np.testing.assert_allclose(onnx_pred, pipe.predict(X), rtol=1e-3, atol=1e-2)
+
+
+def test_stats_round_trip(tmp_path):
+    X, y = _make_data(20, seed=4)
+    stats = RidgeSufficientStats.from_arrays(X, y, FEATURES, threshold=30, last_timestamp="2025-01-01T00:00:00",
+                                             first_timestamp="2024-12-01T00:00:00")
+    stats.alpha = 2.0
+    stats.rmse_cv = 12.5
+
+    path = tmp_path / "ridge.stats.json"
+    stats.save(str(path))
+    loaded = RidgeSufficientStats.load(str(path))
+
+    assert loaded.n == stats.n and loaded.alpha == 2.0
+    np.testing.assert_allclose(loaded.xtx, stats.xtx)
+    assert loaded.last_timestamp == "2025-01-01T00:00:00"
+    assert loaded.first_timestamp == "2024-12-01T00:00:00" and loaded.rmse_cv == 12.5
+
+
+def _drying_payload(n, low=6.0):
+    # Drying cycles of 200 samples from 70 down to `low`, watered at the start of each
+    ts = pd.date_range("2025-01-01", periods=n, freq="10min")
+    soil = 70 - (np.arange(n) % 200) * (70 - low) / 199
+    return json.dumps([{
+        "soil_humidity": float(s),
+        "air_humidity": 50.0,
+        "temperature": 20.0 + (i % 144) / 24,
+        "light": 100.0 + (i % 144),
+        "timestamp": t.strftime("%Y-%m-%dT%H:%M:%S")
+    } for i, (t, s) in enumerate(zip(ts, soil))])
+
+
+def _isolated_ridge(monkeypatch, models_dir, all_rows=True):
+    monkeypatch.setattr(ridge_mod, "LOCAL_MODELS_DIR", str(models_dir))
+    monkeypatch.setattr(ridge_mod, "upload_to_blob", lambda *args: None)
+    monkeypatch.setattr(artifacts_mod, "download_latest_blob", lambda *args: None)
+    if all_rows:
+        # Every labelled row is folded in
+        monkeypatch.setattr(ridge_mod, "TRAINING_MAX_ROWS", None)
+        monkeypatch.setattr(ridge_mod, "TARGET_GRID_MAX_ROWS", None)
+
+
+def test_incremental_grid_runs_keep_targets_labelled_late(monkeypatch, tmp_path):
+    # The first payload ends at soil humidity ~25: its last samples only have targets for the high thresholds
+    _isolated_ridge(monkeypatch, tmp_path / "incremental")
+    train_model(_drying_payload(1130), "30", mode="full")
+    second = train_model(_drying_payload(1600), "30", mode="incremental")
+    assert second["model_file"] is not None
+    incremental = load_previous_stats(str(tmp_path / "incremental"))
+
+    _isolated_ridge(monkeypatch, tmp_path / "full")
+    train_model(_drying_payload(1600), "30", mode="full")
+    full = load_previous_stats(str(tmp_path / "full"))
+
+    assert incremental.runs_since_full_refit == 1
+    assert incremental.threshold_rows["10.0"] == full.threshold_rows["10.0"]
+    assert incremental.threshold_rows == full.threshold_rows and incremental.n == full.n
+    assert incremental.threshold_watermarks == full.threshold_watermarks
+    np.testing.assert_allclose(incremental.mean_y, full.mean_y)
+
+
+def test_incremental_runs_report_the_cv_score_of_the_last_full_refit(monkeypatch, tmp_path):
+    _isolated_ridge(monkeypatch, tmp_path)
+    full = train_model(_drying_payload(1130), "30", mode="full")
+    incremental = train_model(_drying_payload(1600), "30", mode="incremental")
+    metadata = json.loads((tmp_path / incremental["metadata_file"]).read_text())
+
+    assert metadata["training_mode"] == "incremental" and metadata["validation"] == "time_series_cv"
+    assert metadata["rmse_cv"] == full["rmse_cv"] and metadata["rmse_cv_from"] == "last_full_refit"
+    assert metadata["rmse_prequential"] is not None and incremental["rmse_prequential"] is not None
+
+
+def test_rows_leaving_the_training_window_force_a_full_refit(monkeypatch, tmp_path):
+    _isolated_ridge(monkeypatch, tmp_path)
+    monkeypatch.setattr(ridge_mod, "TRAINING_MAX_AGE_DAYS", 5)
+    monkeypatch.setattr(ridge_mod, "RIDGE_WINDOW_SLACK_DAYS", 1)
+    train_model(_drying_payload(1000), "30", mode="full")
+    first = load_previous_stats(str(tmp_path)).first_timestamp
+
+    # The window moves by less than the slack: the older rows stay folded in
+    result = train_model(_drying_payload(1100), "30", mode="incremental")
+    metadata = json.loads((tmp_path / result["metadata_file"]).read_text())
+    assert metadata["training_mode"] == "incremental" and metadata["training_rows_since"] == first
+
+    # Two days later the oldest folded-in rows are too old
+    result = train_model(_drying_payload(1400), "30", mode="incremental")
+    metadata = json.loads((tmp_path / result["metadata_file"]).read_text())
+    assert metadata["training_mode"] == "full"
+    assert metadata["training_rows_since"] > first
+
+
+def test_grid_without_samples_below_it_falls_back_to_the_threshold(monkeypatch, tmp_path):
+    _isolated_ridge(monkeypatch, tmp_path)
+    result = train_model(_drying_payload(600, low=62.0), "30", mode="full")
+
+    assert result["model_file"] is not None
+    metadata = json.loads((tmp_path / result["metadata_file"]).read_text())
+    assert metadata["threshold_grid"] is None
+    assert metadata["target"].startswith("minutes_to_dry (<6")
+
+
+def _greenhouse_payload(days, temperature_offset=0.0):
+    # Generated drying cycles with daily cycles, plus weather moving air humidity and temperature over days
+    df = generate_samples(days * 144, seed=5)
+    weather = np.sin(2 * np.pi * np.arange(len(df)) / (144 * 5))
+    df["air_humidity"] = (df["air_humidity"] + 8 * weather).clip(25, 88)
+    df["air_temperature"] += 2 * weather
+    df.loc[df.index[-144:], "air_temperature"] += temperature_offset
+    return df.to_json(orient="records", date_format="iso")
+
+
+def test_day_to_day_variation_keeps_folding_in(monkeypatch, tmp_path):
+    _isolated_ridge(monkeypatch, tmp_path, all_rows=False)
+
+    train_model(_greenhouse_payload(20), "30", mode="full")
+    for days in range(21, 26):
+        train_model(_greenhouse_payload(days), "30", mode="incremental")
+        assert load_previous_stats(str(tmp_path)).runs_since_full_refit == days - 20
+
+    # A temperature sensor reading 20 degrees too high for a day is not ordinary variation
+    result = train_model(_greenhouse_payload(26, temperature_offset=20.0), "30", mode="incremental")
+    metadata = json.loads((tmp_path / result["metadata_file"]).read_text())
+    assert metadata["drift"]["temperature"] > ridge_mod.DRIFT_REFIT_THRESHOLD
+    assert metadata["training_mode"] == "full"
+
+
+def test_threshold_is_adjusted_on_the_training_window(monkeypatch, tmp_path):
+    # Old readings below the threshold are outside the training window, so they do not keep the threshold
+    _isolated_ridge(monkeypatch, tmp_path)
+    monkeypatch.setattr(ridge_mod, "TARGET_THRESHOLD_GRID", None)
+    monkeypatch.setattr(ridge_mod, "TRAINING_MAX_AGE_DAYS", 5)
+    payload = json.loads(_drying_payload(2000))
+    for sample in payload[1000:]:
+        sample["soil_humidity"] = 40 + sample["soil_humidity"] / 2
+
+    result = train_model(json.dumps(payload), "30", mode="full")
+    metadata = json.loads((tmp_path / result["metadata_file"]).read_text())
+    assert not metadata["target"].startswith("minutes_to_dry (<30")
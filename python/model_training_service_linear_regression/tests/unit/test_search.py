@@ -0,0 +1,58 @@
+# tests/unit/test_search.py
+import numpy as np
+from sklearn.linear_model import Ridge
+from sklearn.model_selection import GridSearchCV, TimeSeriesSplit
+
+from src.models.search import neighbourhood_grid, warm_started_search
+
+PARAM_GRID = {"alpha": np.logspace(-4, 3, 20)}
+
+
+def _data(seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(300, 4))
+    return X, X @ [1.0, -2.0, 0.5, 0.0] + rng.normal(scale=0.3, size=300)
+
+
+def _make_search(grid):
+    return GridSearchCV(Ridge(), grid, cv=TimeSeriesSplit(n_splits=3), scoring="neg_root_mean_squared_error")
+
+
+def test_neighbourhood_grid_moves_one_parameter_at_a_time():
+    grid = {"n_estimators": [50, 100], "max_depth": [5, 10, None]}
+
+    candidates = neighbourhood_grid(grid, {"n_estimators": 100, "max_depth": None}, radius=1)
+
+    assert candidates == [
+        {"n_estimators": [100], "max_depth": [None]},
+        {"n_estimators": [50], "max_depth": [None]},
+        {"n_estimators": [100], "max_depth": [10]},
+    ]
+    # Previous parameters that are not on the grid cannot seed it
+    assert neighbourhood_grid(grid, {"n_estimators": 200, "max_depth": None}, radius=1) is None
+
+
+def test_warm_start_searches_neighbourhood_of_previous_alpha():
+    X, y = _data()
+    full, _ = warm_started_search(_make_search, X, y, PARAM_GRID, None, {"alpha": "alpha"}, radius=2, tolerance=0.05)
+    prev_metadata = {"alpha": float(full.best_params_["alpha"]), "rmse_cv": -full.best_score_}
+
+    search, strategy = warm_started_search(_make_search, X, y, PARAM_GRID, prev_metadata, {"alpha": "alpha"},
+                                           radius=2, tolerance=0.05)
+
+    assert strategy["strategy"] == "neighbourhood"
+    assert strategy["candidates_evaluated"] <= 5
+    assert np.isclose(search.best_params_["alpha"], full.best_params_["alpha"])
+
+
+def test_warm_start_widens_when_cv_gets_worse():
+    X, y = _data()
+    # The previous model scored far better than anything this data allows
+    prev_metadata = {"hyperparameter_search": {"best_params": {"alpha": PARAM_GRID["alpha"][-1]}, "rmse_cv": 0.01}}
+
+    search, strategy = warm_started_search(_make_search, X, y, PARAM_GRID, prev_metadata, {"alpha": "alpha"},
+                                           radius=2, tolerance=0.05)
+
+    assert strategy["strategy"] == "widened"
+    assert strategy["candidates_evaluated"] == 3 + 20
+    assert search.best_params_["alpha"] < PARAM_GRID["alpha"][-3]
@@ -1,7 +1,8 @@
 # tests/unit/test_target.py
+import numpy as np
 import pandas as pd
 
-from src.features.target import add_minutes_to_dry
+from src.features.target import add_minutes_to_dry, add_minutes_to_dry_grid
 
 
 def test_add_minutes_to_dry_all_above_threshold():
@@ -20,3 +21,33 @@ def test_add_minutes_to_dry_all_above_threshold():
     # threshold-col needs to be in output and be corrects
     assert "threshold" in out.columns
     assert (out["threshold"] == thresh).all()
+
+
+def _drying_cycles(n=300):
+    # Soil dries by 1% per 10 min from 60% and is watered every 50 samples
+    return pd.DataFrame({
+        "timestamp": pd.date_range("2025-01-01", periods=n, freq="10min"),
+        "soil_humidity": 60.0 - (np.arange(n) % 50),
+    })
+
+
+def test_add_minutes_to_dry_grid_matches_single_threshold_targets():
+    df = _drying_cycles()
+    out = add_minutes_to_dry_grid(df, [20, 40])
+
+    for thresh in (20, 40):
+        single = add_minutes_to_dry(df.copy(), threshold=thresh).dropna(subset=["minutes_to_dry"])
+        stacked = out[out["threshold"] == thresh]
+        assert stacked["timestamp"].tolist() == single["timestamp"].tolist()
+        assert np.array_equal(stacked["minutes_to_dry"].to_numpy(), single["minutes_to_dry"].to_numpy())
+
+    # Chronological, so TimeSeriesSplit never trains on the future
+    assert out["timestamp"].is_monotonic_increasing
+
+
+def test_add_minutes_to_dry_grid_caps_rows_per_threshold():
+    out = add_minutes_to_dry_grid(_drying_cycles(), [20, 30, 40], max_rows=90)
+
+    assert len(out) == 90
+    assert (out.groupby("threshold").size() == 30).all()
+    assert out["timestamp"].is_monotonic_increasing
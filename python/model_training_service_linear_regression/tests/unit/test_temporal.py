@@ -0,0 +1,105 @@
+# tests/unit/test_temporal.py
+import json
+
+import numpy as np
+import onnx
+import pandas as pd
+
+import src.models.ridge as ridge_mod
+import src.services.artifacts as artifacts_mod
+from src.features.temporal import (TemporalFeatureState, TemporalSpec, add_temporal_features, state_from_metadata,
+                                   temporal_state)
+from src.models.ridge import train_model
+
+SPEC = TemporalSpec(lags_minutes=(30, 180), rolling_minutes=(60, 360), ewm_halflife_minutes=(60,))
+
+
+def _samples(n=1500, seed=0):
+    rng = np.random.default_rng(seed)
+    minutes = np.cumsum(rng.integers(5, 16, n))  # irregular 5-15 min sampling
+    minutes[n // 2:] += 300                       # and a 5 h sensor gap
+    return pd.DataFrame({
+        "timestamp": pd.Timestamp("2025-01-01") + pd.to_timedelta(minutes, unit="min"),
+        "device_id": np.where(rng.uniform(size=n) < 0.5, "a", "b"),
+        "soil_humidity": rng.uniform(10, 70, n),
+        "air_humidity": rng.uniform(30, 80, n),
+        "temperature": rng.uniform(15, 25, n),
+        "light": rng.uniform(0, 1000, n),
+    })
+
+
+def test_features_match_per_sample_reference():
+    df = _samples()
+    out = add_temporal_features(df, SPEC)
+
+    dev = out[out["device_id"] == "a"].reset_index(drop=True)
+    t = (dev["timestamp"] - dev["timestamp"][0]).dt.total_seconds().to_numpy() / 60
+    soil = dev["soil_humidity"].to_numpy()
+    ewm = [soil[0]]
+    for i in range(1, len(dev)):
+        decay = 0.5 ** ((t[i] - t[i - 1]) / 60)
+        ewm.append(decay * ewm[-1] + (1 - decay) * soil[i])
+
+    for i in range(0, len(dev), 13):
+        nearest = np.argmin(np.abs(t - (t[i] - 180)))
+        change = soil[i] - soil[nearest] if abs(t[nearest] - t[i] + 180) <= 10 else 0.0
+        in_window = (t > t[i] - 360) & (t <= t[i])
+        slope = np.polyfit(t[in_window] / 60, soil[in_window], 1)[0] if in_window.sum() > 1 else 0.0
+
+        assert np.isclose(dev["soil_humidity_change_180min"][i], change)
+        assert np.isclose(dev["soil_humidity_mean_360min"][i], soil[in_window].mean())
+        assert np.isclose(dev["soil_humidity_slope_360min"][i], slope, rtol=1e-6)
+    np.testing.assert_allclose(dev["soil_humidity_ewm_60min"], ewm)
+    # Right after the gap there is nothing to compare with
+    assert (out.loc[len(df) // 2, ["soil_humidity_change_30min", "soil_humidity_change_180min"]] == 0).all()
+
+
+def test_incremental_update_from_state_matches_full_pass():
+    df = _samples()
+    full = add_temporal_features(df, SPEC)
+    watermark = df["timestamp"].iloc[1000]
+
+    state = temporal_state(full[full["timestamp"] <= watermark], SPEC)
+    state = TemporalFeatureState.from_dict(json.loads(json.dumps(state.to_dict())))
+    new = add_temporal_features(df[df["timestamp"] > watermark], SPEC, state)
+
+    expected = full[full["timestamp"] > watermark]
+    for col in SPEC.feature_cols:
+        np.testing.assert_allclose(new[col], expected[col], rtol=1e-6, atol=1e-9, err_msg=col)
+    # Only the lookback window is kept per device
+    assert all(len(d["timestamp"]) < 60 for d in state.devices.values())
+
+
+def _payload(n):
+    ts = pd.date_range("2025-01-01", periods=n, freq="10min")
+    soil = 60 - (np.arange(n) % 150) * 0.3
+    return json.dumps([{
+        "soil_humidity": float(s),
+        "air_humidity": 50.0,
+        "temperature": 20.0 + (i % 144) / 24,
+        "light": 100.0 + (i % 144),
+        "timestamp": t.strftime("%Y-%m-%dT%H:%M:%S")
+    } for i, (t, s) in enumerate(zip(ts, soil))])
+
+
+def test_ridge_records_temporal_features_and_folds_in_with_saved_state(monkeypatch, tmp_path):
+    monkeypatch.setattr(ridge_mod, "LOCAL_MODELS_DIR", str(tmp_path))
+    monkeypatch.setattr(ridge_mod, "TEMPORAL_FEATURES", True)
+    # The synthetic series drifts, which would force a full refit
+    monkeypatch.setattr(ridge_mod, "DRIFT_REFIT_THRESHOLD", 1.0)
+    monkeypatch.setattr(ridge_mod, "upload_to_blob", lambda *args: None)
+    monkeypatch.setattr(artifacts_mod, "download_latest_blob", lambda *args: None)
+
+    train_model(_payload(1500), "30", mode="full")
+    second = train_model(_payload(2000), "30", mode="incremental")
+
+    metadata = json.loads((tmp_path / second["metadata_file"]).read_text())
+    spec = ridge_mod.temporal_spec()
+    assert metadata["training_mode"] == "incremental"
+    assert metadata["feature_names"] == ridge_mod.FEATURE_COLS + spec.feature_cols
+    assert state_from_metadata(metadata, spec) is not None
+
+    onnx_model = onnx.load(str(tmp_path / second["model_file"]))
+    props = {p.key: p.value for p in onnx_model.metadata_props}
+    assert json.loads(props["feature_names"]) == metadata["feature_names"]
+    assert onnx_model.graph.input[0].type.tensor_type.shape.dim[1].dim_value == len(metadata["feature_names"])
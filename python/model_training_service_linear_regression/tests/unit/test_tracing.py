@@ -0,0 +1,86 @@
+# tests/unit/test_tracing.py
+import json
+import pstats
+
+import numpy as np
+import pytest
+from sklearn.linear_model import Ridge
+from sklearn.model_selection import GridSearchCV, TimeSeriesSplit
+
+import src.services.tracing as tracing
+from src.services.tracing import record_cv_fits, span, trace_run
+
+
+def _read_trace(tmp_path):
+    (trace_file,) = tmp_path.glob("*.trace.jsonl")
+    return [json.loads(line) for line in trace_file.read_text().splitlines()]
+
+
+def test_tracing_is_a_no_op_when_disabled(monkeypatch, tmp_path):
+    monkeypatch.setattr(tracing, "TRACE_ENABLED", False)
+    monkeypatch.setattr(tracing, "TRACE_DIR", str(tmp_path))
+
+    with trace_run("job"):
+        with span("fetch") as s:
+            s["rows"] = 1
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_nested_spans_and_cv_fits_are_written_as_jsonl(monkeypatch, tmp_path):
+    monkeypatch.setattr(tracing, "TRACE_ENABLED", True)
+    monkeypatch.setattr(tracing, "TRACE_DIR", str(tmp_path))
+    monkeypatch.setattr(tracing, "TRACE_PROFILER", "cprofile")
+
+    X = np.random.default_rng(0).normal(size=(60, 2))
+    y = X @ [1.0, 2.0]
+    search = GridSearchCV(Ridge(), {"alpha": [0.1, 1.0]}, cv=TimeSeriesSplit(n_splits=3))
+
+    with pytest.raises(ValueError):
+        with trace_run("job"):
+            with trace_run("train_model") as s:
+                with span("fit"):
+                    search.fit(X, y)
+                    record_cv_fits(search)
+                s["message"] = "done"
+            with span("upload"):
+                raise ValueError("upload failed")
+
+    spans = {r["name"]: r for r in _read_trace(tmp_path) if r["name"] != "cv_fit"}
+    cv_fits = [r for r in _read_trace(tmp_path) if r["name"] == "cv_fit"]
+
+    # A nested trace_run is an ordinary span of the outer run
+    assert spans["job"]["parent_id"] is None
+    assert spans["train_model"]["parent_id"] == spans["job"]["span_id"]
+    assert spans["train_model"]["attrs"]["message"] == "done"
+    assert spans["fit"]["parent_id"] == spans["train_model"]["span_id"]
+    assert spans["upload"]["status"] == "error" and spans["job"]["status"] == "error"
+
+    assert len(cv_fits) == 2
+    assert all(r["parent_id"] == spans["fit"]["span_id"] for r in cv_fits)
+    assert len(cv_fits[0]["attrs"]["fold_scores"]) == 3
+
+    (profile,) = tmp_path.glob("*.prof")
+    assert pstats.Stats(str(profile)).total_calls > 0
+
+
+def test_sampling_profiler_writes_collapsed_stacks(monkeypatch, tmp_path):
+    monkeypatch.setattr(tracing, "TRACE_ENABLED", True)
+    monkeypatch.setattr(tracing, "TRACE_DIR", str(tmp_path))
+    monkeypatch.setattr(tracing, "TRACE_PROFILER", "sampling")
+    monkeypatch.setattr(tracing, "TRACE_SAMPLE_INTERVAL_S", 0.001)
+
+    def busy_loop():
+        total = 0
+        for i in range(3_000_000):
+            total += i
+        return total
+
+    with trace_run("train_model"):
+        busy_loop()
+
+    (folded,) = tmp_path.glob("*.folded")
+    lines = folded.read_text().splitlines()
+    assert lines
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) > 0 and "busy_loop" in stack
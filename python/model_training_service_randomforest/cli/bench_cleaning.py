@@ -0,0 +1,89 @@
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+# Benchmark of the spike filter next to the rest of clean_sensor_data on synthetic multi-device readings with
+# injected spikes. Reports wall time, rows/s and how many of the injected spikes were repaired or dropped.
+# Usage: PYTHONPATH=src_rf python -m cli.bench_cleaning [--sizes 1000000 2000000 5000000] [--devices 200]
+#        [--output out.json]
+
+
+def synthetic_readings(n: int, devices: int, spike_rate: float = 0.001, seed: int = 0):
+    """
+    n readings from `devices` devices sampled every 10 minutes: drying cycles with noise, and spike_rate
+    of them replaced by single spikes and as many again by two-sample bursts. Returns (df, injected counts).
+    """
+    rng = np.random.default_rng(seed)
+    device = rng.integers(0, devices, n)
+    step = np.zeros(n, dtype=np.int64)
+    order = np.argsort(device, kind="stable")
+    step[order] = np.arange(n) - np.searchsorted(device[order], device[order])
+
+    soil = 70 - (step % 300) * 0.15 + rng.normal(0, 0.5, n)
+    df = pd.DataFrame({
+        "timestamp": pd.Timestamp("2020-01-01") + pd.to_timedelta(step * 10 + device % 10, unit="min"),
+        "device_id": device.astype(str),
+        "soil_humidity": soil,
+        "air_humidity": 50 + rng.normal(0, 2, n),
+        "temperature": 20 + rng.normal(0, 0.5, n),
+        "light": rng.uniform(0, 1000, n),
+    })
+
+    # Spikes at every 100th step of a device, far enough apart that they never touch
+    candidates = np.flatnonzero((step % 100 == 50) & (step < np.bincount(device)[device] - 1))
+    singles, bursts = np.split(rng.permutation(candidates)[:2 * int(n * spike_rate)], 2)
+    df.loc[singles, "soil_humidity"] = 99.0
+    # A burst is a reading and the next one of the same device
+    rank = np.empty(n, dtype=np.int64)
+    rank[order] = np.arange(n)
+    df.loc[np.r_[bursts, order[rank[bursts] + 1]], "soil_humidity"] = 1.0
+    return df, {"single_spikes": len(singles), "burst_rows": 2 * len(bursts)}
+
+
+def run_sizes(sizes, devices: int):
+    from config_rf import SPIKE_FILTER_MIN_DEVIATION, SPIKE_FILTER_SENSITIVITY, SPIKE_FILTER_WINDOW
+    from data.cleaning import clean_sensor_data, filter_spikes
+
+    results = []
+    for n in sizes:
+        df, injected = synthetic_readings(n, devices)
+
+        start = time.perf_counter()
+        clean_sensor_data(df, expected_interval_minutes=10, gap_drop_threshold=60, spike_filter=False)
+        baseline_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        _, report = filter_spikes(df, SPIKE_FILTER_MIN_DEVIATION, SPIKE_FILTER_WINDOW, SPIKE_FILTER_SENSITIVITY)
+        filter_s = time.perf_counter() - start
+
+        result = {
+            "rows": n,
+            "devices": devices,
+            **injected,
+            "repaired": sum(report["repaired"].values()),
+            "dropped": report["dropped"],
+            "clean_s": round(baseline_s, 3),
+            "spike_filter_s": round(filter_s, 3),
+            "spike_filter_rows_per_s": round(n / filter_s),
+        }
+        results.append(result)
+        print(f"{n:>9} rows: clean {baseline_s:.2f}s + spike filter {filter_s:.2f}s "
+              f"({result['spike_filter_rows_per_s']:.0f} rows/s). Injected {injected}, "
+              f"repaired {result['repaired']}, dropped {result['dropped']}", flush=True)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark clean_sensor_data with the spike filter.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000_000, 2_000_000, 5_000_000])
+    parser.add_argument("--devices", type=int, default=200)
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    results = run_sizes(args.sizes, args.devices)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,32 @@
+import json
+import sys
+
+import pandas as pd
+from models.histgradientboosting import train_model_hgb
+from models.randomforest import train_model_rf
+
+# Trains RandomForest and HistGradientBoosting on the same data (nothing is uploaded) and prints
+# CV RMSE, training time, ONNX model size and single-row inference latency side by side.
+# Usage: PYTHONPATH=src_rf python -m cli.compare [path/to/data.csv] [threshold]
+
+csv_path = sys.argv[1] if len(sys.argv) > 1 else "src_rf/testdata.csv"
+threshold = float(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+df = pd.read_csv(csv_path, parse_dates=["timestamp"])
+
+sample_list = df.copy()
+sample_list["timestamp"] = sample_list["timestamp"].dt.strftime("%Y-%m-%dT%H:%M:%S")
+sample_list = sample_list.to_dict(orient="records")
+wrapped = json.dumps({
+    "response": {
+        "list": [{"SampleDTO": row} for row in sample_list]
+    }
+})
+
+results = {
+    "RandomForest": train_model_rf(wrapped, json.dumps(threshold), upload=False),
+    "HistGradientBoosting": train_model_hgb(wrapped, json.dumps(threshold), upload=False),
+}
+
+columns = ["rmse_cv", "r2_insample", "training_time_s", "model_size_bytes", "inference_latency_ms"]
+print(pd.DataFrame({name: {c: res.get(c) for c in columns} for name, res in results.items()}).T.to_string())
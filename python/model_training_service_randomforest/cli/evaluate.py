@@ -0,0 +1,52 @@
+import argparse
+import json
+import logging
+
+import joblib
+import pandas as pd
+from evaluation.batch_eval import evaluate_onnx_batch, export_feature_matrix
+
+# Batch evaluation of an exported ONNX model.
+# "export" runs the training data pipeline on a csv of samples and writes the feature matrix (timestamp, features,
+# minutes_to_dry) to parquet. "score" streams a feature matrix (parquet/csv) through the ONNX model; --reference
+# loads the fitted sklearn pipeline (joblib file) and checks the ONNX predictions against it.
+# Usage: PYTHONPATH=src_rf python -m cli.evaluate export data.csv threshold features.parquet
+#        PYTHONPATH=src_rf python -m cli.evaluate score model.onnx features.parquet predictions.parquet
+#            [--chunk-size N] [--reference pipeline.joblib]
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Chunked batch evaluation of an ONNX model")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export", help="Write the training feature matrix of a csv of samples")
+    export.add_argument("samples")
+    export.add_argument("threshold", type=float)
+    export.add_argument("output")
+
+    score = commands.add_parser("score", help="Score a feature matrix with an ONNX model")
+    score.add_argument("model")
+    score.add_argument("feature_matrix")
+    score.add_argument("output")
+    score.add_argument("--chunk-size", type=int, default=50_000)
+    score.add_argument("--window", default="1D")
+    score.add_argument("--threads", type=int, default=4)
+    score.add_argument("--reference", help="fitted sklearn pipeline (joblib) to check ONNX parity against")
+    score.add_argument("--parity-tolerance", type=float, default=1.0)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        df = pd.read_csv(args.samples, parse_dates=["timestamp"])
+        df["timestamp"] = df["timestamp"].dt.strftime("%Y-%m-%dT%H:%M:%S")
+        rows = export_feature_matrix(json.dumps(df.to_dict(orient="records")), json.dumps(args.threshold),
+                                     args.output)
+        print(json.dumps({"rows": rows, "feature_matrix": args.output}, indent=2))
+    else:
+        summary = evaluate_onnx_batch(
+            args.model, args.feature_matrix, args.output,
+            chunk_size=args.chunk_size, window=args.window, n_threads=args.threads,
+            reference_model=joblib.load(args.reference) if args.reference else None,
+            parity_tolerance=args.parity_tolerance,
+        )
+        print(json.dumps(summary, indent=2))
@@ -0,0 +1,57 @@
+import json
+import logging
+import re
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_COLS = ["soil_humidity", "air_humidity", "temperature", "light", "timestamp"]
+
+# Normalize column names
+RENAME_MAP = {
+    "soilhumidity": "soil_humidity",
+    "airhumidity": "air_humidity",
+    "airtemperature": "temperature",
+    "lightvalue": "light",
+    "timestamp": "timestamp"
+}
+
+
+def normalize_col(col: str) -> str:
+    return re.sub(r"[^a-z0-9]", "", col.lower())
+
+
+def parse_samples(json_samples: str) -> pd.DataFrame:
+    """
+    Parses the /sensor/data JSON payload into a DataFrame with normalized column names
+    and a datetime 'timestamp' column.
+    """
+    parsed_samples = json.loads(json_samples)
+
+    sample_data = None
+    if isinstance(parsed_samples, dict) and "response" in parsed_samples and "list" in parsed_samples["response"]:
+        logger.info("Detected nested response/list/SampleDTO structure.")
+        sample_data = [item["SampleDTO"] for item in parsed_samples["response"]["list"]]
+    elif isinstance(parsed_samples, list) and parsed_samples and isinstance(parsed_samples[0], dict):
+        if "SampleDTO" in parsed_samples[0]:
+            logger.info("Detected list of SampleDTO wrappers.")
+            sample_data = [item["SampleDTO"] for item in parsed_samples]
+        else:
+            logger.info("Detected direct list of SampleDTO dicts.")
+            sample_data = parsed_samples
+
+    if sample_data is None:
+        raise ValueError("Unexpected JSON structure from /sensor/data")
+
+    df = pd.DataFrame(sample_data)
+
+    df.rename(columns={col: RENAME_MAP.get(normalize_col(col), col) for col in df.columns}, inplace=True)
+
+    missing = set(REQUIRED_COLS) - set(df.columns)
+    if missing:
+        raise ValueError(f"Missing required columns in sample data: {missing}")
+
+    df["timestamp"] = pd.to_datetime(df["timestamp"])
+
+    return df
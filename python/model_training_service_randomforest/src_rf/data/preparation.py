@@ -0,0 +1,185 @@
+import json
+import logging
+
+from config_rf import (DRIFT_REFERENCE_DAYS, TARGET_THRESHOLD_GRID, TARGET_GRID_MAX_ROWS, TRAINING_MAX_AGE_DAYS, TRAINING_RESAMPLE_MINUTES,
+                       TRAINING_MAX_ROWS, TRAINING_DECAY_HALF_LIFE_DAYS, FORECAST_HORIZON_TOLERANCE_MINUTES,
+                       TEMPORAL_FEATURES, TEMPORAL_LAGS_MINUTES, TEMPORAL_ROLLING_MINUTES,
+                       TEMPORAL_EWM_HALFLIFE_MINUTES, TEMPORAL_LAG_TOLERANCE_MINUTES)
+from data.cleaning import clean_sensor_data
+from data.parsing import parse_samples
+from data.window import apply_training_window, downsample_training_rows
+from features.engineering import FEATURE_COLS, add_time_features
+from features.horizons import add_soil_horizons
+from features.sketches import (adjust_threshold, build_sketches, reference_sketches, sketches_to_dict,
+                               update_feature_sketches)
+from features.target import add_minutes_to_dry, add_minutes_to_dry_grid
+from features.temporal import TemporalSpec, add_temporal_features, metadata_block, temporal_state
+from services.tracing import span
+
+logger = logging.getLogger(__name__)
+
+
+def prepare_training_frame(json_samples: str, json_threshold: str, prev_metadata: dict = None, budget: bool = True):
+    """
+    Shared data pipeline for all trainers:
+    parse -> clean -> threshold -> window -> temporal features -> target -> downsample -> features.
+
+    prev_metadata is the metadata of the trainer's previous model. Its feature sketches are updated
+    with the rows ingested since then, and its reference window is used for drift scoring. The threshold
+    is adjusted on the training window.
+
+    With TARGET_THRESHOLD_GRID set, targets are stacked over the whole grid instead of the received threshold.
+    With budget, the TRAINING_* window and row budget apply (evaluation frames pass budget=False).
+
+    Returns (df, threshold, profile, error_message). profile holds "threshold_grid", "drift", "feature_sketches",
+    "temporal_features" and "training_budget" for the metadata. The model's input columns are
+    feature_columns(profile). error_message is None when df holds usable training rows.
+    """
+    with span("parse", payload_bytes=len(json_samples)) as s:
+        df = parse_samples(json_samples)
+        s["rows"] = len(df)
+    with span("clean") as s:
+        df = clean_sensor_data(df, expected_interval_minutes=10, gap_drop_threshold=60)
+        s["rows"] = len(df)
+
+    if df.empty:
+        logger.error("No valid samples after data cleaning.")
+        return df, None, None, "No valid training samples after cleaning."
+
+    with span("sketches") as s:
+        sketches, drift = update_feature_sketches(df, prev_metadata, incremental=True)
+        s["drift_max"] = drift["max"] if drift else None
+    threshold_grid = list(TARGET_THRESHOLD_GRID) if TARGET_THRESHOLD_GRID else None
+    profile = {
+        "threshold_grid": threshold_grid,
+        "drift": drift,
+        "feature_sketches": sketches_to_dict(sketches, watermark=df["timestamp"].max().isoformat(),
+                                             reference=reference_sketches(df, DRIFT_REFERENCE_DAYS)),
+        "temporal_features": None,
+    }
+
+    max_rows = TRAINING_MAX_ROWS if budget else None
+    if budget:
+        with span("window") as s:
+            df, window = apply_training_window(df, TRAINING_MAX_AGE_DAYS, TRAINING_RESAMPLE_MINUTES)
+            s["rows"] = len(df)
+
+    # Adjusted on the samples the targets are built from, not the whole history
+    threshold = json.loads(json_threshold)
+    logger.info("Threshold value received: %s", threshold)
+    threshold = adjust_threshold(threshold, build_sketches(df, ["soil_humidity"])["soil_humidity"])
+
+    # Lags and rolling windows need the unlabelled samples too, so they are computed before the target
+    temporal = temporal_spec()
+    if temporal:
+        with span("temporal_features") as s:
+            df = add_temporal_features(df, temporal)
+            s["rows"] = len(df)
+        profile["temporal_features"] = metadata_block(temporal, temporal_state(df, temporal))
+
+    with span("target", threshold=threshold, threshold_grid=threshold_grid) as s:
+        samples = df
+        if threshold_grid:
+            # The training budget downsamples below, the grid cap is only the fallback without one
+            df = add_minutes_to_dry_grid(samples, threshold_grid, max_rows=None if max_rows else TARGET_GRID_MAX_ROWS)
+            if df.empty:
+                logger.warning("No samples below any grid threshold. Training on the threshold %.2f only.", threshold)
+                threshold_grid = profile["threshold_grid"] = None
+        if not threshold_grid:
+            df = add_minutes_to_dry(samples, threshold)
+            df.dropna(subset=["minutes_to_dry"], inplace=True)
+        s["rows"] = len(df)
+
+    if df.empty:
+        logger.error("No data remains after filtering minutes_to_dry.")
+        return df, threshold, profile, "No valid training samples after threshold filtering."
+
+    if budget:
+        with span("downsample") as s:
+            df, rows = downsample_training_rows(df, max_rows, TRAINING_DECAY_HALF_LIFE_DAYS)
+            s["rows"] = len(df)
+        profile["training_budget"] = {
+            "max_age_days": TRAINING_MAX_AGE_DAYS,
+            "resample_minutes": TRAINING_RESAMPLE_MINUTES,
+            "max_rows": TRAINING_MAX_ROWS,
+            "decay_half_life_days": TRAINING_DECAY_HALF_LIFE_DAYS,
+            **window,
+            **rows,
+        }
+
+    with span("features"):
+        df = add_time_features(df)
+
+    return df, threshold, profile, None
+
+
+def prepare_forecast_frame(json_samples: str, horizons_minutes):
+    """
+    Data pipeline for the multi-horizon forecast: parse -> clean -> window -> horizon targets -> downsample
+    -> features. Returns (df, training_budget, error_message), see prepare_training_frame.
+    """
+    with span("parse", payload_bytes=len(json_samples)) as s:
+        df = parse_samples(json_samples)
+        s["rows"] = len(df)
+    with span("clean") as s:
+        df = clean_sensor_data(df, expected_interval_minutes=10, gap_drop_threshold=60)
+        s["rows"] = len(df)
+    if df.empty:
+        logger.error("No valid samples after data cleaning.")
+        return df, None, "No valid training samples after cleaning."
+
+    with span("window") as s:
+        df, window = apply_training_window(df, TRAINING_MAX_AGE_DAYS, TRAINING_RESAMPLE_MINUTES)
+        s["rows"] = len(df)
+    with span("target", horizons=list(horizons_minutes)) as s:
+        df = add_soil_horizons(df, horizons_minutes, FORECAST_HORIZON_TOLERANCE_MINUTES)
+        s["rows"] = len(df)
+    if df.empty:
+        logger.error("No samples with observed values at every forecast horizon.")
+        return df, None, "No samples with observed values at every forecast horizon."
+
+    with span("downsample") as s:
+        df, rows = downsample_training_rows(df, TRAINING_MAX_ROWS, TRAINING_DECAY_HALF_LIFE_DAYS)
+        s["rows"] = len(df)
+    with span("features"):
+        df = add_time_features(df)
+
+    training_budget = {
+        "max_age_days": TRAINING_MAX_AGE_DAYS,
+        "resample_minutes": TRAINING_RESAMPLE_MINUTES,
+        "max_rows": TRAINING_MAX_ROWS,
+        "decay_half_life_days": TRAINING_DECAY_HALF_LIFE_DAYS,
+        **window,
+        **rows,
+    }
+    return df, training_budget, None
+
+
+def temporal_spec():
+    """The configured temporal feature windows, or None when TEMPORAL_FEATURES is off."""
+    if not TEMPORAL_FEATURES:
+        return None
+    return TemporalSpec(tuple(TEMPORAL_LAGS_MINUTES), tuple(TEMPORAL_ROLLING_MINUTES),
+                        tuple(TEMPORAL_EWM_HALFLIFE_MINUTES), TEMPORAL_LAG_TOLERANCE_MINUTES)
+
+
+def feature_columns(profile: dict) -> list:
+    """Model input columns of a prepare_training_frame result: FEATURE_COLS, then any temporal features."""
+    temporal = profile.get("temporal_features") or {}
+    return FEATURE_COLS + temporal.get("feature_names", [])
+
+
+def target_description(threshold: float, threshold_grid=None) -> str:
+    if threshold_grid:
+        return f"minutes_to_dry (<threshold% soil humidity, thresholds {min(threshold_grid)}-{max(threshold_grid)})"
+    return f"minutes_to_dry (<{threshold}% soil humidity)"
+
+
+def empty_result(message: str) -> dict:
+    return {
+        "message": message,
+        "model_file": None,
+        "metadata_file": None,
+        "rmse_cv": None,
+        "r2_insample": None
+    }
@@ -0,0 +1,126 @@
+import logging
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+CYCLE_COL = "drying_cycle"
+# A rise of more than this many % soil humidity between two samples is a watering and starts a new drying cycle
+WATERING_JUMP = 5.0
+
+
+def resample_to_grid(df: pd.DataFrame, minutes: int) -> pd.DataFrame:
+    """
+    Averages the numeric columns onto a regular grid of `minutes`-wide bins. Empty bins are not filled,
+    so sensor gaps stay gaps. soil_delta is recomputed as the change per grid step (0 across gaps).
+    """
+    bins = df["timestamp"].dt.floor(f"{minutes}min")
+    out = df.groupby(bins, sort=True).mean(numeric_only=True).reset_index()
+
+    if "soil_delta" in out.columns:
+        gap = out["timestamp"].diff().dt.total_seconds().div(60).fillna(0)
+        out["soil_delta"] = out["soil_humidity"].diff().fillna(0).where(gap <= minutes, 0)
+
+    logger.info("Resampled %d samples onto a %d min grid: %d rows.", len(df), minutes, len(out))
+    return out
+
+
+def label_drying_cycles(df: pd.DataFrame, max_gap_minutes: float) -> np.ndarray:
+    """Drying cycle number per row: a new cycle starts after a watering or a gap longer than max_gap_minutes."""
+    soil = df["soil_humidity"].to_numpy()
+    ts_minutes = df["timestamp"].values.astype("datetime64[m]").view("int")
+    starts = np.ones(len(df), dtype=bool)
+    starts[1:] = (np.diff(soil) > WATERING_JUMP) | (np.diff(ts_minutes) > max_gap_minutes)
+    return np.cumsum(starts) - 1
+
+
+def apply_training_window(df: pd.DataFrame, max_age_days: Optional[float] = None,
+                          resample_minutes: Optional[int] = None, gap_minutes: float = 60):
+    """
+    Bounds the cleaned, chronologically sorted samples to the training window: drops samples older than
+    max_age_days before the newest one, resamples onto a regular grid and labels drying cycles (CYCLE_COL)
+    for downsample_training_rows.
+
+    Returns (df, window) where window describes the kept time range for the metadata.
+    """
+    rows_in = len(df)
+    if max_age_days is not None and not df.empty:
+        start = df["timestamp"].max() - pd.Timedelta(days=max_age_days)
+        df = df[df["timestamp"] >= start]
+        logger.info("Training window: dropped %d samples older than %s days.", rows_in - len(df), max_age_days)
+
+    if resample_minutes and not df.empty:
+        df = resample_to_grid(df, resample_minutes)
+
+    df = df.reset_index(drop=True)
+    df[CYCLE_COL] = label_drying_cycles(df, gap_minutes)
+
+    window = {
+        "window_start": df["timestamp"].min().isoformat() if not df.empty else None,
+        "window_end": df["timestamp"].max().isoformat() if not df.empty else None,
+        "samples_in": rows_in,
+        "samples_in_window": len(df),
+        "drying_cycles": int(df[CYCLE_COL].nunique()),
+    }
+    return df, window
+
+
+def _allocate(budget: int, weights: np.ndarray, capacity: np.ndarray) -> np.ndarray:
+    """Splits budget over strata proportionally to weights, at least 1 and at most capacity each (water-filling)."""
+    quota = np.minimum(capacity, 1)
+    open_ = quota < capacity
+    while open_.any():
+        left = int(budget - quota.sum())
+        if left <= 0:
+            break
+        open_weights = weights * open_
+        if open_weights.sum() == 0:
+            # Only strata whose weight underflowed are left: spread evenly
+            open_weights = open_.astype(float)
+        share = np.floor(left * open_weights / open_weights.sum())
+        if share.sum() == 0:
+            # Less than one row per open stratum left: give it to the heaviest ones
+            share[np.argsort(-open_weights)[:left]] = 1
+        quota = np.minimum(capacity, quota + share)
+        open_ = quota < capacity
+    return quota.astype(int)
+
+
+def downsample_training_rows(df: pd.DataFrame, max_rows: Optional[int], half_life_days: Optional[float] = None,
+                             random_state: int = 42):
+    """
+    Downsamples labelled training rows to about max_rows, stratified by drying cycle (and threshold, if
+    stacked over a grid). Every stratum keeps at least one row, so every drying cycle stays represented.
+    The rest of the budget is split over strata by their summed recency weight 0.5 ** (age / half_life),
+    and rows are drawn uniformly within a stratum. Row order is preserved.
+
+    Returns (df, info) with the row counts for the metadata.
+    """
+    n = len(df)
+    if max_rows is None or n <= max_rows:
+        return df, {"rows_labelled": n, "rows_used": n}
+
+    strata_cols = [c for c in (CYCLE_COL, "threshold") if c in df.columns]
+    codes = df.groupby(strata_cols, sort=False).ngroup().to_numpy()
+
+    if half_life_days:
+        age_days = (df["timestamp"].max() - df["timestamp"]).dt.total_seconds().to_numpy() / 86400
+        weights = 0.5 ** (age_days / half_life_days)
+    else:
+        weights = np.ones(n)
+
+    capacity = np.bincount(codes)
+    quota = _allocate(max_rows, np.bincount(codes, weights=weights), capacity)
+
+    # Rank rows randomly within their stratum and keep the first quota of each
+    rng = np.random.default_rng(random_state)
+    order = np.lexsort((rng.random(n), codes))
+    stratum_start = np.concatenate(([0], np.cumsum(capacity)[:-1]))
+    rank = np.arange(n) - stratum_start[codes[order]]
+    keep = np.sort(order[rank < quota[codes[order]]])
+
+    logger.info("Downsampled %d labelled rows to %d over %d strata (half-life %s days).",
+                n, keep.size, capacity.size, half_life_days)
+    return df.iloc[keep].reset_index(drop=True), {"rows_labelled": n, "rows_used": int(keep.size)}
@@ -0,0 +1,188 @@
+import json
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import onnxruntime as rt
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from data.preparation import feature_columns, prepare_training_frame
+from features.engineering import FEATURE_COLS
+
+logger = logging.getLogger(__name__)
+
+TARGET_COL = "minutes_to_dry"
+DEVICE_COL = "device_id"
+
+
+def export_feature_matrix(json_samples: str, json_threshold: str, path: str) -> int:
+    """
+    Runs the training data pipeline on a /sensor/data payload and writes timestamp, features and
+    target to a parquet file that evaluate_onnx_batch can stream. Returns the number of rows written.
+    """
+    # The whole history, not the training budget
+    df, _threshold, profile, error = prepare_training_frame(json_samples, json_threshold, budget=False)
+    if error:
+        raise ValueError(error)
+
+    features = feature_columns(profile)
+    cols = ["timestamp"] + ([DEVICE_COL] if DEVICE_COL in df.columns else []) + features + [TARGET_COL]
+    df[cols].to_parquet(path, index=False)
+    logger.info("Wrote feature matrix with %d rows to %s", len(df), path)
+    return len(df)
+
+
+def iter_chunks(path: str, chunk_size: int):
+    """Yields DataFrames of at most chunk_size rows from a parquet or csv file, without loading it whole."""
+    if path.endswith(".parquet"):
+        # pre_buffer would keep every row group read so far in memory until the file is closed
+        for batch in pq.ParquetFile(path, pre_buffer=False).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size, parse_dates=["timestamp"])
+
+
+class _ErrorAccumulator:
+    """Running squared/absolute error sums per (window, device). Memory grows with groups, not rows."""
+
+    def __init__(self):
+        # Sums indexed by (window, device)
+        self.sums = None
+
+    def add(self, frame: pd.DataFrame):
+        err = frame["y_pred"] - frame["y_true"]
+        sums = pd.DataFrame({
+            "window": frame["window"],
+            "device": frame["device"],
+            "sq": err ** 2,
+            "abs": err.abs(),
+            "n": 1,
+        }).groupby(["window", "device"]).sum()
+        # Windows and devices seen in only one of the two frames keep their sums
+        self.sums = sums if self.sums is None else self.sums.add(sums, fill_value=0)
+
+    def scores(self) -> pd.DataFrame:
+        columns = ["window", "device", "n", "rmse", "mae"]
+        if self.sums is None:
+            return pd.DataFrame(columns=columns)
+        sums = self.sums.sort_index()
+        return pd.DataFrame({
+            "n": sums["n"].astype(int),
+            "rmse": np.sqrt(sums["sq"] / sums["n"]),
+            "mae": sums["abs"] / sums["n"],
+        }).reset_index()[columns]
+
+    def totals(self) -> dict:
+        if self.sums is None:
+            return {"rows": 0, "rmse": None, "mae": None}
+        sq, ab, n = self.sums["sq"].sum(), self.sums["abs"].sum(), int(self.sums["n"].sum())
+        return {"rows": n, "rmse": float(np.sqrt(sq / n)) if n else None, "mae": float(ab / n) if n else None}
+
+
+def evaluate_onnx_batch(
+        model_path: str,
+        feature_matrix_path: str,
+        output_path: str,
+        feature_names=None,
+        chunk_size: int = 50_000,
+        window: str = "1D",
+        n_threads: int = 4,
+        reference_model=None,
+        parity_tolerance: float = 1.0,
+) -> dict:
+    """
+    Streams a feature matrix through an exported ONNX model in fixed-size chunks.
+
+    Chunks are scored on a thread pool with at most n_threads chunks in flight, so memory stays
+    constant however large the archive is. Predictions are appended to a parquet file at output_path
+    and RMSE/MAE per time window and device go to '<output_path without .parquet>.scores.parquet'.
+    If reference_model (the fitted sklearn pipeline) is given, each chunk is also checked for parity:
+    rows where ONNX and sklearn differ by more than parity_tolerance (minutes) are counted.
+
+    Returns a summary with overall RMSE/MAE, row count, parity and throughput.
+    """
+    options = rt.SessionOptions()
+    # Parallelism comes from the chunk thread pool, one core per chunk
+    options.intra_op_num_threads = 1
+    session = rt.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+    input_name = session.get_inputs()[0].name
+
+    # Models exported with their input columns say which ones they need
+    recorded = session.get_modelmeta().custom_metadata_map.get("feature_names")
+    feature_names = feature_names or (json.loads(recorded) if recorded else FEATURE_COLS)
+
+    def score(chunk: pd.DataFrame):
+        X = chunk[feature_names].to_numpy(dtype=np.float32)
+        y_pred = session.run(None, {input_name: X})[0].ravel()
+        y_ref = reference_model.predict(chunk[feature_names].astype(float)) if reference_model is not None else None
+        return chunk, y_pred, y_ref
+
+    accumulator = _ErrorAccumulator()
+    max_parity_diff = 0.0
+    parity_mismatches = 0
+    writer = None
+    start = time.perf_counter()
+
+    def consume(result):
+        nonlocal writer, max_parity_diff, parity_mismatches
+        chunk, y_pred, y_ref = result
+        out = pd.DataFrame({
+            "timestamp": chunk["timestamp"].to_numpy(),
+            "device": chunk[DEVICE_COL].astype(str).to_numpy() if DEVICE_COL in chunk.columns else "all",
+            "y_true": chunk[TARGET_COL].to_numpy(dtype=float),
+            "y_pred": y_pred.astype(float),
+        })
+        if y_ref is not None:
+            out["y_ref"] = y_ref
+            diff = np.abs(y_pred - y_ref)
+            max_parity_diff = max(max_parity_diff, float(np.max(diff, initial=0.0)))
+            parity_mismatches += int(np.count_nonzero(diff > parity_tolerance))
+
+        table = pa.Table.from_pandas(out, preserve_index=False)
+        if writer is None:
+            writer = pq.ParquetWriter(output_path, table.schema)
+        writer.write_table(table)
+
+        out["window"] = pd.to_datetime(out["timestamp"]).dt.floor(window)
+        accumulator.add(out.dropna(subset=["y_true"]))
+
+    try:
+        with ThreadPoolExecutor(max_workers=n_threads) as pool:
+            in_flight = deque()
+            for chunk in iter_chunks(feature_matrix_path, chunk_size):
+                in_flight.append(pool.submit(score, chunk))
+                # Results are consumed in submission order, so the output file stays chronological
+                if len(in_flight) >= n_threads:
+                    consume(in_flight.popleft().result())
+            while in_flight:
+                consume(in_flight.popleft().result())
+    finally:
+        if writer is not None:
+            writer.close()
+
+    elapsed = time.perf_counter() - start
+
+    scores_path = f"{os.path.splitext(output_path)[0]}.scores.parquet"
+    accumulator.scores().to_parquet(scores_path, index=False)
+
+    summary = accumulator.totals()
+    summary.update({
+        "predictions_file": output_path,
+        "scores_file": scores_path,
+        "elapsed_s": round(elapsed, 3),
+        "rows_per_s": round(summary["rows"] / elapsed, 1) if elapsed else None,
+    })
+    if reference_model is not None:
+        summary["parity_max_abs_diff"] = max_parity_diff
+        summary["parity_mismatch_rows"] = parity_mismatches
+        if parity_mismatches:
+            logger.warning("%d ONNX predictions deviate from the sklearn pipeline by more than %.2f (max %.4f)",
+                           parity_mismatches, parity_tolerance, max_parity_diff)
+
+    logger.info("Batch evaluation done: %s", summary)
+    return summary
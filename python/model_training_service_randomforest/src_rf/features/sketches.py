@@ -0,0 +1,234 @@
+import logging
+import math
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Values are kept at the precision sketches are serialized with, so a loaded sketch and a fresh one of the same
+# readings agree (a KS distance between two copies of a discrete feature would otherwise be 1)
+_DECIMALS = 6
+
+# Raw readings that get a sketch (the derived time features are not worth profiling)
+SKETCH_COLS = ["soil_humidity", "soil_delta", "air_humidity", "temperature", "light"]
+# Drift is scored on at least this much of the newest data, a full daily cycle of light and temperature
+MIN_DRIFT_BATCH = pd.Timedelta(days=1)
+
+
+class QuantileSketch:
+    """
+    Mergeable streaming quantile sketch (KLL) with exact count, min, max and mean.
+
+    Level h holds items of weight 2^h. When a level overflows its capacity it is sorted and every
+    other item (random offset) is promoted to the next level, so memory stays around 3k items
+    regardless of how many values were ingested. Rank error is roughly O(1/k).
+    """
+
+    def __init__(self, k: int = 256, seed: int = 0):
+        self.k = k
+        self.levels = [np.empty(0)]
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self._rng = np.random.default_rng(seed)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else math.nan
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - 1 - level
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def update(self, values) -> "QuantileSketch":
+        values = np.asarray(values, dtype=float).ravel()
+        values = np.round(values[~np.isnan(values)], _DECIMALS)
+        if values.size == 0:
+            return self
+
+        self.count += int(values.size)
+        self.total += float(values.sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+        return self
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            buf = self.levels[level]
+            if buf.size > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                buf = np.sort(buf)
+                # Compact an even number of items; an odd leftover stays on this level
+                n_even = buf.size - (buf.size % 2)
+                offset = int(self._rng.integers(2))
+                promoted = buf[offset:n_even:2]
+                self.levels[level] = buf[n_even:]
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level += 1
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        """Returns a new sketch summarizing both inputs."""
+        merged = QuantileSketch(k=max(self.k, other.k))
+        depth = max(len(self.levels), len(other.levels))
+        merged.levels = [
+            np.concatenate([
+                self.levels[h] if h < len(self.levels) else np.empty(0),
+                other.levels[h] if h < len(other.levels) else np.empty(0),
+            ])
+            for h in range(depth)
+        ]
+        merged.count = self.count + other.count
+        merged.total = self.total + other.total
+        merged.min = min(self.min, other.min)
+        merged.max = max(self.max, other.max)
+        merged._compress()
+        return merged
+
+    def _weighted_items(self):
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(buf.size, 2.0 ** h) for h, buf in enumerate(self.levels)])
+        order = np.argsort(items, kind="stable")
+        return items[order], np.cumsum(weights[order])
+
+    def quantile(self, q):
+        if self.count == 0:
+            return math.nan
+        items, cum = self._weighted_items()
+        q = np.asarray(q, dtype=float)
+        idx = np.searchsorted(cum, q * cum[-1], side="left")
+        result = items[np.clip(idx, 0, items.size - 1)]
+        # The extremes are tracked exactly
+        result = np.where(q <= 0, self.min, np.where(q >= 1, self.max, result))
+        return float(result) if result.ndim == 0 else result
+
+    def cdf(self, x):
+        """Fraction of ingested values <= x."""
+        if self.count == 0:
+            return math.nan
+        items, cum = self._weighted_items()
+        idx = np.searchsorted(items, np.asarray(x, dtype=float), side="right")
+        cum = np.concatenate([[0.0], cum])
+        return cum[idx] / cum[-1]
+
+    def to_dict(self) -> dict:
+        return {
+            "k": self.k,
+            "count": self.count,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+            "mean": self.mean if self.count else None,
+            "levels": [np.round(buf, _DECIMALS).tolist() for buf in self.levels],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "QuantileSketch":
+        sketch = cls(k=data["k"])
+        sketch.levels = [np.asarray(buf, dtype=float) for buf in data["levels"]] or [np.empty(0)]
+        sketch.count = data["count"]
+        if sketch.count:
+            sketch.min, sketch.max = data["min"], data["max"]
+            sketch.total = data["mean"] * sketch.count
+        return sketch
+
+
+def build_sketches(df: pd.DataFrame, cols=None) -> dict:
+    """One vectorized pass per column over df."""
+    cols = cols or SKETCH_COLS
+    return {col: QuantileSketch().update(df[col].to_numpy()) for col in cols if col in df.columns}
+
+
+def merge_sketches(prev: dict, new: dict) -> dict:
+    return {col: prev[col].merge(new[col]) if col in prev else new[col] for col in new}
+
+
+def reference_sketches(df: pd.DataFrame, days: float) -> dict:
+    """Sketches of the last `days` of df, the window the next run scores its drift against."""
+    return build_sketches(df[df["timestamp"] > df["timestamp"].max() - pd.Timedelta(days=days)])
+
+
+def sketches_to_dict(sketches: dict, watermark: Optional[str] = None, reference: Optional[dict] = None) -> dict:
+    """
+    Serializes sketches for the model metadata. watermark is the newest timestamp ingested, reference
+    the reference_sketches() of this run.
+    """
+    data = {
+        "watermark": watermark,
+        "features": {col: sketch.to_dict() for col, sketch in sketches.items()},
+    }
+    if reference is not None:
+        data["reference"] = {col: sketch.to_dict() for col, sketch in reference.items()}
+    return data
+
+
+def sketches_from_dict(data: dict):
+    """Returns (sketches, watermark)."""
+    sketches = {col: QuantileSketch.from_dict(d) for col, d in data.get("features", {}).items()}
+    return sketches, data.get("watermark")
+
+
+def ks_distance(a: QuantileSketch, b: QuantileSketch, n_points: int = 101) -> float:
+    """Approximate Kolmogorov-Smirnov distance between the distributions summarized by a and b."""
+    if a.count == 0 or b.count == 0:
+        return math.nan
+    grid = np.linspace(0, 1, n_points)
+    points = np.union1d(a.quantile(grid), b.quantile(grid))
+    return float(np.max(np.abs(a.cdf(points) - b.cdf(points))))
+
+
+def drift_scores(reference: dict, current: dict) -> dict:
+    """Per-feature KS distance of current against reference, plus the maximum under 'max'."""
+    scores = {col: round(ks_distance(reference[col], current[col]), 4)
+              for col in current if col in reference and current[col].count}
+    scores = {col: s for col, s in scores.items() if not math.isnan(s)}
+    scores["max"] = max(scores.values()) if scores else None
+    return scores
+
+
+def update_feature_sketches(df: pd.DataFrame, prev_metadata: Optional[dict], incremental: bool):
+    """
+    Returns (sketches, drift) for the cleaned data.
+
+    Rows newer than the previous sketch watermark are sketched and, in incremental mode, merged into
+    the previous sketches; otherwise the sketches are rebuilt from the whole history. drift holds the
+    per-feature KS distance of the newest rows, at least MIN_DRIFT_BATCH of them, against the previous
+    run's reference window (None on the first run). A night of readings is not comparable with the whole
+    history: weather moves air humidity and temperature for days. Metadata written before reference
+    windows were kept is scored against the previous sketches.
+    """
+    feature_sketches = (prev_metadata or {}).get("feature_sketches", {})
+    prev_sketches, watermark = sketches_from_dict(feature_sketches)
+    if not prev_sketches or watermark is None:
+        return build_sketches(df), None
+
+    new_rows = df[df["timestamp"] > pd.Timestamp(watermark)]
+    if new_rows.empty:
+        return (prev_sketches if incremental else build_sketches(df)), None
+
+    batch_start = min(pd.Timestamp(watermark), df["timestamp"].max() - MIN_DRIFT_BATCH)
+    reference = {col: QuantileSketch.from_dict(d) for col, d in feature_sketches.get("reference", {}).items()}
+    drift = drift_scores(reference or prev_sketches, build_sketches(df[df["timestamp"] > batch_start]))
+    logger.info("Drift of the rows since %s against previous run (KS): %s", batch_start, drift)
+
+    if incremental:
+        return merge_sketches(prev_sketches, build_sketches(new_rows)), drift
+    return build_sketches(df), drift
+
+
+def adjust_threshold(threshold: float, soil_sketch: QuantileSketch) -> float:
+    """Falls back to the 10th percentile when no reading is below threshold (read from the sketch)."""
+    if soil_sketch.min >= threshold:
+        new_threshold = soil_sketch.quantile(0.10)
+        logger.warning(
+            "Threshold %.2f is too low (min soil_humidity = %.2f). Adjusting threshold to 10th percentile: %.2f",
+            threshold, soil_sketch.min, new_threshold
+        )
+        return new_threshold
+    return threshold
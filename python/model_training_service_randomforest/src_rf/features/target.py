@@ -1,31 +1,90 @@
 import logging
+from typing import Optional
+
 import numpy as np
 import pandas as pd
 
 logger = logging.getLogger(__name__)
 
 
+def minutes_to_dry_matrix(soil: np.ndarray, ts_minutes: np.ndarray, thresholds) -> np.ndarray:
+    """
+    Minutes from each sample until the next later sample below each threshold, shape (thresholds, samples).
+    NaN where the soil never drops below the threshold again.
+
+    One pass per threshold row: a reversed running minimum over the indices of below-threshold samples
+    gives the next such index for every position at once.
+    """
+    thresholds = np.asarray(thresholds, dtype=float).reshape(-1, 1)
+    n = soil.size
+    if n == 0:
+        return np.empty((thresholds.shape[0], 0))
+
+    candidates = np.where(soil[None, :] < thresholds, np.arange(n), n)
+    next_at_or_after = np.minimum.accumulate(candidates[:, ::-1], axis=1)[:, ::-1]
+
+    # Strictly after i: shift by one, the last sample has no successor
+    next_idx = np.full_like(next_at_or_after, n)
+    next_idx[:, :-1] = next_at_or_after[:, 1:]
+
+    ts_padded = np.append(ts_minutes, 0)
+    return np.where(next_idx < n, ts_padded[next_idx] - ts_minutes, np.nan)
+
+
 def add_minutes_to_dry(df: pd.DataFrame, threshold: float) -> pd.DataFrame:
     soil = df["soil_humidity"].to_numpy()
 
     ts_minutes = df["timestamp"].values.astype("datetime64[m]").view("int")
-    below = np.where(soil < threshold)[0]
 
-    if below.size == 0:
+    if not (soil < threshold).any():
         logger.warning(
             "No samples below threshold %.2f found in data. minutes_to_dry cannot be calculated.",
             threshold
         )
         return df.assign(minutes_to_dry=np.nan, threshold=threshold)
 
-    next_idx = np.full(len(df), np.nan, dtype=float)
-
-    for i in range(len(df) - 1):
-        j = below[below > i]
-        if j.size:
-            next_idx[i] = ts_minutes[j[0]] - ts_minutes[i]
-
-    df["minutes_to_dry"] = next_idx
+    df["minutes_to_dry"] = minutes_to_dry_matrix(soil, ts_minutes, [threshold])[0]
     df["threshold"] = threshold
 
     return df
+
+
+def add_minutes_to_dry_grid(df: pd.DataFrame, thresholds, max_rows: Optional[int] = None,
+                            random_state: int = 42) -> pd.DataFrame:
+    """
+    Training rows for a whole grid of thresholds: one copy of each sample per threshold, with the
+    threshold column and minutes_to_dry for that threshold. Rows without a target are left out.
+
+    If more than max_rows remain, each threshold keeps an equal random share. The result is ordered by
+    sample time (then threshold), so TimeSeriesSplit folds stay chronological.
+    """
+    thresholds = np.sort(np.asarray(thresholds, dtype=float))
+    soil = df["soil_humidity"].to_numpy()
+    ts_minutes = df["timestamp"].values.astype("datetime64[m]").view("int")
+
+    minutes = minutes_to_dry_matrix(soil, ts_minutes, thresholds)
+    t_idx, row_idx = np.nonzero(~np.isnan(minutes))
+
+    if max_rows is not None and t_idx.size > max_rows:
+        rng = np.random.default_rng(random_state)
+        quota = max(1, max_rows // len(thresholds))
+        keep = []
+        for t in range(len(thresholds)):
+            positions = np.flatnonzero(t_idx == t)
+            keep.append(positions if positions.size <= quota else rng.choice(positions, quota, replace=False))
+        keep = np.concatenate(keep)
+        t_idx, row_idx = t_idx[keep], row_idx[keep]
+        logger.info("Sampled %d of %d (sample, threshold) training rows.", keep.size, np.count_nonzero(~np.isnan(minutes)))
+
+    order = np.lexsort((t_idx, row_idx))
+    t_idx, row_idx = t_idx[order], row_idx[order]
+
+    out = df.iloc[row_idx].reset_index(drop=True)
+    out["threshold"] = thresholds[t_idx]
+    out["minutes_to_dry"] = minutes[t_idx, row_idx]
+
+    missing = [float(t) for t in np.delete(thresholds, np.unique(t_idx))]
+    if missing:
+        logger.warning("No samples below thresholds %s. They are not represented in the training set.", missing)
+
+    return out
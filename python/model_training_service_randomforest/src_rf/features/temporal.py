@@ -0,0 +1,270 @@
+import logging
+from dataclasses import dataclass, field
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from features.horizons import soil_at_horizons
+
+logger = logging.getLogger(__name__)
+
+DEVICE_COL = "device_id"
+# Samples without a device column are one series
+DEFAULT_DEVICE = "all"
+
+LAG_COLS = ["soil_humidity"]
+ROLLING_COLS = ["soil_humidity", "temperature", "light"]
+SLOPE_COLS = ["soil_humidity"]
+EWM_COLS = ["soil_humidity", "air_humidity", "temperature"]
+SOURCE_COLS = sorted(set(LAG_COLS + ROLLING_COLS + SLOPE_COLS + EWM_COLS))
+
+LN2 = np.log(2)
+# Exponent range of one block in _time_ewm, keeps exp() far from overflow
+_EWM_BLOCK = 200.0
+
+
+@dataclass(frozen=True)
+class TemporalSpec:
+    """Windows of the temporal features, all in minutes."""
+
+    lags_minutes: tuple
+    rolling_minutes: tuple
+    ewm_halflife_minutes: tuple
+    # A lag value is the sample nearest to t - lag, if it is at most this far from it
+    tolerance_minutes: float = 10
+
+    @property
+    def feature_cols(self) -> list:
+        cols = [f"{c}_change_{int(lag)}min" for lag in self.lags_minutes for c in LAG_COLS]
+        for w in self.rolling_minutes:
+            cols += [f"{c}_mean_{int(w)}min" for c in ROLLING_COLS]
+            cols += [f"{c}_slope_{int(w)}min" for c in SLOPE_COLS]
+        cols += [f"{c}_ewm_{int(h)}min" for h in self.ewm_halflife_minutes for c in EWM_COLS]
+        return cols
+
+    @property
+    def lookback_minutes(self) -> float:
+        """How much history the lags and rolling windows of a new sample can reach back."""
+        lags = [lag + self.tolerance_minutes for lag in self.lags_minutes]
+        return float(max(lags + list(self.rolling_minutes), default=0))
+
+    def to_dict(self) -> dict:
+        return {
+            "lags_minutes": [int(v) for v in self.lags_minutes],
+            "rolling_minutes": [int(v) for v in self.rolling_minutes],
+            "ewm_halflife_minutes": [int(v) for v in self.ewm_halflife_minutes],
+            "tolerance_minutes": self.tolerance_minutes,
+        }
+
+
+@dataclass
+class TemporalFeatureState:
+    """
+    Window state of the temporal features at a watermark, per device: the samples within the spec's
+    lookback and the EWM values at the device's last sample. Features of samples newer than the
+    watermark can be computed from it without the history.
+    """
+
+    spec: dict
+    # device -> {"timestamp": [iso...], <source col>: [...], "ewm": {<ewm feature>: value}}
+    devices: dict = field(default_factory=dict)
+
+    def compatible_with(self, spec: TemporalSpec) -> bool:
+        return self.spec == spec.to_dict()
+
+    def to_dict(self) -> dict:
+        return {"spec": self.spec, "devices": self.devices}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "TemporalFeatureState":
+        return cls(**data)
+
+
+def _device_keys(df: pd.DataFrame) -> np.ndarray:
+    if DEVICE_COL in df.columns:
+        return df[DEVICE_COL].astype(str).to_numpy()
+    return np.full(len(df), DEFAULT_DEVICE, dtype=object)
+
+
+def _to_seconds(timestamps) -> np.ndarray:
+    # Whole seconds as floats are exact, so samples exactly on a window boundary compare consistently
+    return np.asarray(timestamps, dtype="datetime64[ns]").astype("datetime64[s]").astype(np.int64).astype(float)
+
+
+def _rolling_sums(t: np.ndarray, values: list, window: float):
+    """Sample counts and sums of each array over the window (t - window, t], via cumulative sums."""
+    start = np.searchsorted(t, t - window, side="right")
+    end = np.arange(1, t.size + 1)
+    sums = []
+    for v in values:
+        cs = np.concatenate([[0.0], np.cumsum(v)])
+        sums.append(cs[end] - cs[start])
+    return end - start, sums
+
+
+def rolling_mean(t: np.ndarray, x: np.ndarray, window_minutes: float) -> np.ndarray:
+    """Mean of x over the time window (t - window, t]. t in seconds."""
+    n, (s,) = _rolling_sums(t, [x], window_minutes * 60)
+    return s / n
+
+
+def rolling_slope(t: np.ndarray, x: np.ndarray, window_minutes: float) -> np.ndarray:
+    """
+    Least-squares slope of x per hour over the time window (t - window, t]. t in seconds.
+    0 with fewer than two samples.
+    """
+    # Hours since the first sample keep the cumulative sums of squares small
+    th = (t - t[0]) / 3600 if t.size else t
+    n, (st, sx, stt, stx) = _rolling_sums(t, [th, x, th * th, th * x], window_minutes * 60)
+    var = stt - st * st / n
+    cov = stx - st * sx / n
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # var of a single sample is only rounding error
+        return np.where((n > 1) & (var > 1e-9), cov / var, 0.0)
+
+
+def _time_ewm(t: np.ndarray, x: np.ndarray, halflife_minutes: float, seed: Optional[tuple] = None) -> np.ndarray:
+    """
+    Time-aware EWM of x at sorted times t (seconds): m_i = a_i * m_(i-1) + (1 - a_i) * x_i with
+    a_i = 0.5 ** ((t_i - t_(i-1)) / halflife), so old values fade by elapsed time and a long gap resets it.
+    Starts at x_0, or continues from seed = (t, m) of an earlier run.
+
+    The recursion is solved with cumulative sums in blocks: scaled by exp(r_i), r_i = ln2 * t_i / halflife,
+    the update is a plain running sum, and each block rescales so exp() stays in range.
+    """
+    if t.size == 0:
+        return np.empty(0)
+    t_prev, m = seed if seed is not None else (t[0], x[0])
+    r = LN2 * (t - t_prev) / (halflife_minutes * 60)
+    gain = -np.expm1(-np.diff(r, prepend=0.0))
+
+    out = np.empty(t.size)
+    block = np.floor(r / _EWM_BLOCK)
+    bounds = np.concatenate([[0], np.flatnonzero(np.diff(block)) + 1, [t.size]])
+    r_prev = 0.0
+    for s, e in zip(bounds[:-1], bounds[1:]):
+        scale = np.exp(r[s:e] - r[s])
+        u = m * np.exp(r_prev - r[s]) + np.cumsum(gain[s:e] * scale * x[s:e])
+        out[s:e] = u / scale
+        m, r_prev = out[e - 1], r[e - 1]
+    return out
+
+
+def _device_features(t: np.ndarray, values: dict, spec: TemporalSpec, n_history: int,
+                     ewm_seed: Optional[dict], t_seed: Optional[float]) -> dict:
+    """Features of one device's rows, history rows first. Returns arrays for the rows after the history."""
+    features = {}
+    for lag in spec.lags_minutes:
+        for c in LAG_COLS:
+            lagged = soil_at_horizons(values[c], t, [-lag * 60], spec.tolerance_minutes * 60)[:, 0]
+            # Same convention as soil_delta: no change when there is no sample to compare with
+            features[f"{c}_change_{int(lag)}min"] = np.nan_to_num(values[c] - lagged, nan=0.0)
+    for w in spec.rolling_minutes:
+        for c in ROLLING_COLS:
+            features[f"{c}_mean_{int(w)}min"] = rolling_mean(t, values[c], w)
+        for c in SLOPE_COLS:
+            features[f"{c}_slope_{int(w)}min"] = rolling_slope(t, values[c], w)
+    features = {name: v[n_history:] for name, v in features.items()}
+
+    t_new = t[n_history:]
+    for h in spec.ewm_halflife_minutes:
+        for c in EWM_COLS:
+            name = f"{c}_ewm_{int(h)}min"
+            seed = (t_seed, ewm_seed[name]) if ewm_seed else None
+            features[name] = _time_ewm(t_new, values[c][n_history:], h, seed)
+    return features
+
+
+def add_temporal_features(df: pd.DataFrame, spec: TemporalSpec,
+                          state: Optional[TemporalFeatureState] = None) -> pd.DataFrame:
+    """
+    Adds spec.feature_cols per device (DEVICE_COL, or one series without it) over time-based windows, so
+    irregular sampling and sensor gaps are handled by time rather than by row count:
+
+    - <col>_change_<lag>min: change since the sample nearest to t - lag (0 if none within tolerance)
+    - <col>_mean_<w>min / <col>_slope_<w>min: mean and least-squares slope (per hour) over (t - w, t]
+    - <col>_ewm_<h>min: time-aware EWM with half-life h
+
+    Each feature is one vectorized pass per device. With a state, the rows are the samples after its
+    watermark and are computed from the state's window instead of the history.
+    """
+    if state is not None and not state.compatible_with(spec):
+        raise ValueError("Temporal feature state was computed with a different spec.")
+
+    out = df.copy()
+    keys = _device_keys(df)
+    times = _to_seconds(df["timestamp"].to_numpy())
+    columns = {name: np.zeros(len(df)) for name in spec.feature_cols}
+
+    for device in pd.unique(keys):
+        rows = np.flatnonzero(keys == device)
+        rows = rows[np.argsort(times[rows], kind="stable")]
+        t = times[rows]
+        values = {c: df[c].to_numpy(dtype=float)[rows] for c in SOURCE_COLS}
+
+        prev = state.devices.get(device) if state is not None else None
+        n_history, ewm_seed, t_seed = 0, None, None
+        if prev is not None:
+            t_hist = _to_seconds(pd.to_datetime(prev["timestamp"]).to_numpy())
+            if t.size and t_hist.size and t[0] <= t_hist[-1]:
+                raise ValueError(f"Device {device}: samples at or before the state watermark {prev['timestamp'][-1]}.")
+            n_history = t_hist.size
+            t = np.concatenate([t_hist, t])
+            values = {c: np.concatenate([np.asarray(prev[c], dtype=float), values[c]]) for c in SOURCE_COLS}
+            ewm_seed, t_seed = prev["ewm"], t_hist[-1]
+
+        for name, v in _device_features(t, values, spec, n_history, ewm_seed, t_seed).items():
+            columns[name][rows] = v
+
+    for name in spec.feature_cols:
+        out[name] = columns[name]
+    return out
+
+
+def temporal_state(df: pd.DataFrame, spec: TemporalSpec, until=None,
+                   prev_state: Optional[TemporalFeatureState] = None) -> TemporalFeatureState:
+    """
+    Window state at the watermark `until` (default: the last sample) of rows that went through
+    add_temporal_features. prev_state is the state those rows were computed from, if any; devices
+    without rows up to the watermark keep their previous state.
+    """
+    state = TemporalFeatureState(spec=spec.to_dict(),
+                                 devices=dict(prev_state.devices) if prev_state is not None else {})
+    keys = _device_keys(df)
+    times = _to_seconds(df["timestamp"].to_numpy())
+    until = times.max(initial=-np.inf) if until is None else _to_seconds([pd.Timestamp(until)])[0]
+    ewm_cols = [f"{c}_ewm_{int(h)}min" for h in spec.ewm_halflife_minutes for c in EWM_COLS]
+
+    for device in pd.unique(keys):
+        rows = np.flatnonzero((keys == device) & (times <= until))
+        if rows.size == 0:
+            continue
+        rows = rows[np.argsort(times[rows], kind="stable")]
+        last = rows[-1]
+
+        prev = state.devices.get(device)
+        timestamps = (list(pd.to_datetime(prev["timestamp"])) if prev else []) + list(df["timestamp"].iloc[rows])
+        tail = {c: (list(prev[c]) if prev else []) + df[c].iloc[rows].astype(float).tolist() for c in SOURCE_COLS}
+        t = _to_seconds(np.array(timestamps, dtype="datetime64[ns]"))
+        keep = t > t[-1] - spec.lookback_minutes * 60
+
+        state.devices[device] = {
+            "timestamp": [pd.Timestamp(ts).isoformat() for ts, k in zip(timestamps, keep) if k],
+            **{c: [v for v, k in zip(tail[c], keep) if k] for c in SOURCE_COLS},
+            "ewm": {name: float(df[name].iloc[last]) for name in ewm_cols},
+        }
+    return state
+
+
+def state_from_metadata(metadata: Optional[dict], spec: TemporalSpec) -> Optional[TemporalFeatureState]:
+    """The window state saved in a model's "temporal_features" metadata block, if it was computed with spec."""
+    block = (metadata or {}).get("temporal_features") or {}
+    if not block.get("state"):
+        return None
+    state = TemporalFeatureState.from_dict(block["state"])
+    return state if state.compatible_with(spec) else None
+
+
+def metadata_block(spec: TemporalSpec, state: TemporalFeatureState) -> dict:
+    return {**spec.to_dict(), "feature_names": spec.feature_cols, "state": state.to_dict()}
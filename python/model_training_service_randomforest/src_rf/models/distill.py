@@ -0,0 +1,81 @@
+import logging
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.ensemble import HistGradientBoostingRegressor
+from sklearn.model_selection import TimeSeriesSplit
+from sklearn.pipeline import Pipeline
+
+logger = logging.getLogger(__name__)
+
+
+def float32_inputs(X: pd.DataFrame) -> pd.DataFrame:
+    """X rounded to the float32 values an ONNX model is fed, kept as float64 for sklearn."""
+    return pd.DataFrame(np.asarray(X, dtype=np.float32).astype(float), columns=X.columns, index=X.index)
+
+
+def synthetic_samples(X: np.ndarray, n_samples: int, noise: float, random_state: int = 42) -> np.ndarray:
+    """
+    Rows near the training data: random training rows with Gaussian noise of `noise` feature standard
+    deviations added, clipped to the observed range of each feature.
+    """
+    rng = np.random.default_rng(random_state)
+    rows = X[rng.integers(0, len(X), n_samples)]
+    jitter = rng.normal(size=rows.shape) * (noise * X.std(axis=0))
+    return np.clip(rows + jitter, X.min(axis=0), X.max(axis=0))
+
+
+def fit_student(teacher, X: pd.DataFrame, max_iter: int, max_leaf_nodes: int, synthetic_fraction: float,
+                noise: float, random_state: int = 42) -> Pipeline:
+    """
+    Fits a shallow gradient boosted ensemble to the teacher's predictions on X plus
+    synthetic_fraction * len(X) synthetic rows, which fill in the teacher's function between the samples.
+
+    The student is fit on float32 inputs. Otherwise a split between two float64 values that round to the
+    same float32 (hour_sin/hour_cos produce such pairs) sends rows one way in sklearn and the other in ONNX.
+    Evaluate it on float32_inputs(X) as well.
+    """
+    X_real = X.to_numpy(dtype=float)
+    X_fake = synthetic_samples(X_real, int(len(X_real) * synthetic_fraction), noise, random_state)
+    X_all = float32_inputs(pd.DataFrame(np.vstack([X_real, X_fake]), columns=X.columns))
+
+    student = Pipeline([
+        ("hgb", HistGradientBoostingRegressor(max_iter=max_iter, max_leaf_nodes=max_leaf_nodes,
+                                              early_stopping=False, random_state=random_state))
+    ])
+    return student.fit(X_all, teacher.predict(X_all))
+
+
+def distill_forest(teacher, X: pd.DataFrame, y: pd.Series, tscv: TimeSeriesSplit, **student_params):
+    """
+    Student for a fitted teacher pipeline, with the accuracy cost measured on the last time-series split:
+    teacher and student are refit on its training rows and both scored on its test rows.
+
+    Returns (student fitted on all of X, report) where report holds rmse_last_fold of both, the
+    student's fidelity RMSE against the teacher on X and the row counts it was fit on.
+    """
+    train_idx, test_idx = list(tscv.split(X))[-1]
+    X_train, y_train = X.iloc[train_idx], y.iloc[train_idx]
+    X_test, y_test = X.iloc[test_idx], y.iloc[test_idx]
+
+    fold_teacher = clone(teacher).fit(X_train, y_train)
+    fold_student = fit_student(fold_teacher, X_train, **student_params)
+    teacher_rmse = float(np.sqrt(np.mean((fold_teacher.predict(X_test) - y_test) ** 2)))
+    student_rmse = float(np.sqrt(np.mean((fold_student.predict(float32_inputs(X_test)) - y_test) ** 2)))
+
+    student = fit_student(teacher, X, **student_params)
+    fidelity = float(np.sqrt(np.mean((student.predict(float32_inputs(X)) - teacher.predict(X)) ** 2)))
+    logger.info("Distilled student: last fold RMSE %.2f (teacher %.2f), fidelity RMSE %.2f.",
+                student_rmse, teacher_rmse, fidelity)
+
+    report = {
+        "student_model": "HistGradientBoosting",
+        **student_params,
+        "rows_real": len(X),
+        "rows_synthetic": int(len(X) * student_params["synthetic_fraction"]),
+        "teacher_rmse_last_fold": round(teacher_rmse, 2),
+        "student_rmse_last_fold": round(student_rmse, 2),
+        "student_fidelity_rmse": round(fidelity, 2),
+    }
+    return student, report
@@ -0,0 +1,97 @@
+import json
+import logging
+import os
+import time
+
+import numpy as np
+import onnxruntime as rt
+from onnx import helper
+from skl2onnx import convert_sklearn
+from skl2onnx.common.data_types import FloatTensorType
+
+from services.artifacts import notify_model_published
+from services.blob_uploader import upload_to_blob
+from services.tracing import span
+
+logger = logging.getLogger(__name__)
+
+# MODELS_DIR moves the local artifact dir, e.g. to a scratch dir for load tests
+LOCAL_MODELS_DIR = os.getenv("MODELS_DIR", os.path.join(os.path.dirname(__file__), "models"))
+
+
+def export_onnx(estimator, n_features: int, n_outputs: int = 1, feature_names: list = None):
+    """
+    Converts a fitted estimator to ONNX with a float [N, n_features] "input". feature_names, if given, is
+    recorded as a model property, so the ONNX file describes its own input column order.
+    """
+    initial_type = [("input", FloatTensorType([None, n_features]))]
+    # Declared explicitly, skl2onnx types a pipeline's output as [N, 1] even for multi-output regressors
+    final_type = [("variable", FloatTensorType([None, n_outputs]))] if n_outputs > 1 else None
+    onnx_model = convert_sklearn(estimator, initial_types=initial_type, final_types=final_type)
+    if feature_names is not None:
+        helper.set_model_props(onnx_model, {"feature_names": json.dumps(list(feature_names))})
+    return onnx_model
+
+
+def measure_inference_latency_ms(onnx_model, X: np.ndarray, repeats: int = 200) -> float:
+    """Median single-row inference latency of the exported ONNX model, in milliseconds."""
+    session = rt.InferenceSession(onnx_model.SerializeToString(), providers=["CPUExecutionProvider"])
+    input_name = session.get_inputs()[0].name
+    rows = np.asarray(X, dtype=np.float32)
+
+    timings = []
+    for i in range(repeats):
+        row = rows[i % len(rows)].reshape(1, -1)
+        start = time.perf_counter()
+        session.run(None, {input_name: row})
+        timings.append(time.perf_counter() - start)
+
+    return float(np.median(timings) * 1000)
+
+
+def onnx_parity_max_abs_diff(onnx_model, estimator, X) -> float:
+    """Largest absolute difference between onnxruntime and sklearn predictions on X."""
+    session = rt.InferenceSession(onnx_model.SerializeToString(), providers=["CPUExecutionProvider"])
+    input_name = session.get_inputs()[0].name
+    onnx_pred = session.run(None, {input_name: np.asarray(X, dtype=np.float32)})[0].ravel()
+    return float(np.max(np.abs(onnx_pred - np.ravel(estimator.predict(X))), initial=0.0))
+
+
+def save_model_artifacts(onnx_model, metadata: dict, base_name: str, ts_str: str, upload: bool = True,
+                         extra_models: dict = None):
+    """
+    Writes model + metadata to the local models dir and (optionally) uploads both. Returns the file names.
+    extra_models ({file name: onnx model}, e.g. a distilled student) are written and uploaded first, so they
+    exist by the time the metadata announces the model.
+    """
+    model_fname = f"{base_name}_{ts_str}.onnx"
+    meta_fname = f"{base_name}_{ts_str}.metadata.json"
+
+    os.makedirs(LOCAL_MODELS_DIR, exist_ok=True)
+
+    extra_paths = {}
+    for fname, extra_model in (extra_models or {}).items():
+        extra_paths[fname] = os.path.join(LOCAL_MODELS_DIR, fname)
+        with open(extra_paths[fname], "wb") as f:
+            f.write(extra_model.SerializeToString())
+
+    model_path = os.path.join(LOCAL_MODELS_DIR, model_fname)
+    with open(model_path, "wb") as f:
+        f.write(onnx_model.SerializeToString())
+
+    meta_path = os.path.join(LOCAL_MODELS_DIR, meta_fname)
+    with open(meta_path, "w") as f:
+        json.dump(metadata, f, indent=4)
+
+    if upload:
+        with span("upload"):
+            for fname, path in extra_paths.items():
+                upload_to_blob(path, fname)
+            upload_to_blob(model_path, model_fname)
+            upload_to_blob(meta_path, meta_fname)
+        logger.info("Model and metadata uploaded: %s, %s", model_fname, meta_fname)
+    else:
+        logger.info("Model and metadata saved locally (upload disabled): %s, %s", model_fname, meta_fname)
+
+    notify_model_published(base_name, model_path)
+    return model_fname, meta_fname
@@ -0,0 +1,123 @@
+import logging
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.model_selection import TimeSeriesSplit, GridSearchCV
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+from config_rf import FORECAST_HORIZONS_MINUTES
+from data.preparation import prepare_forecast_frame, empty_result
+from features.engineering import FORECAST_FEATURE_COLS
+from features.horizons import horizon_target_cols
+from models.export import export_onnx, measure_inference_latency_ms, onnx_parity_max_abs_diff, save_model_artifacts
+from services.tracing import record_cv_fits, span, trace_run
+
+logger = logging.getLogger(__name__)
+
+BASE_NAME = "soil_humidity_forecast_randomforest"
+
+
+def train_forecast_rf(json_samples: str, upload: bool = False) -> dict:
+    """
+    Multi-horizon soil humidity forecast: one multi-output RandomForest with a target column per
+    FORECAST_HORIZONS_MINUTES entry, exported as one ONNX graph whose output row is the whole forecast.
+
+    Upload is off by default: the prediction build service does not know this model type yet.
+    """
+    with trace_run("train_forecast_rf", upload=upload) as trace:
+        result = _train_forecast_rf(json_samples, upload)
+        trace["message"] = result["message"]
+        return result
+
+
+def _train_forecast_rf(json_samples: str, upload: bool) -> dict:
+    horizons = list(FORECAST_HORIZONS_MINUTES)
+    target_cols = horizon_target_cols(horizons)
+
+    df, training_budget, error = prepare_forecast_frame(json_samples, horizons)
+    if error:
+        return empty_result(error)
+
+    feature_cols = FORECAST_FEATURE_COLS
+    X = df[feature_cols].astype(float)
+    Y = df[target_cols].astype(float)
+
+    pipeline = Pipeline([
+        ("scaler", StandardScaler()),
+        ("rf", RandomForestRegressor(n_estimators=100, random_state=42))
+    ])
+
+    tscv = TimeSeriesSplit(n_splits=5)
+    param_grid = {
+        "rf__n_estimators": [50, 100],
+        "rf__max_depth": [5, 10]
+    }
+
+    grid = GridSearchCV(pipeline, param_grid, cv=tscv, scoring="neg_root_mean_squared_error", n_jobs=-1)
+    fit_start = time.perf_counter()
+    with span("fit", rows=len(X), outputs=len(target_cols)):
+        grid.fit(X, Y)
+        record_cv_fits(grid)
+    training_time = time.perf_counter() - fit_start
+
+    rmse = -grid.best_score_
+    r2 = grid.best_estimator_.score(X, Y)
+    rmse_by_horizon = last_fold_rmse(grid.best_estimator_, X, Y, tscv)
+
+    with span("export") as s:
+        onnx_model = export_onnx(grid.best_estimator_, len(feature_cols), len(target_cols), feature_names=feature_cols)
+        model_size = onnx_model.ByteSize()
+        s["model_size_bytes"] = model_size
+    with span("onnx_checks"):
+        latency_ms = measure_inference_latency_ms(onnx_model, X.to_numpy())
+        parity = onnx_parity_max_abs_diff(onnx_model, grid.best_estimator_, X)
+
+    now = datetime.now()
+    ts_str = now.strftime("%Y%m%d%H%M%S")
+
+    metadata = {
+        "model_type": "RandomForest forecast",
+        "target": f"soil_humidity at +{', +'.join(str(h) for h in horizons)} minutes",
+        "horizons_minutes": horizons,
+        "output_names": target_cols,
+        "feature_names": feature_cols,
+        "n_estimators": grid.best_params_["rf__n_estimators"],
+        "max_depth": grid.best_params_["rf__max_depth"],
+        "cross_val_splits": tscv.n_splits,
+        "training_timestamp_utc": now.isoformat(),
+        "rmse_cv": round(rmse, 2),
+        "rmse_last_fold_by_horizon": {col: round(v, 2) for col, v in zip(target_cols, rmse_by_horizon)},
+        "r2_insample": round(r2, 2),
+        "training_time_s": round(training_time, 3),
+        "model_size_bytes": model_size,
+        "inference_latency_ms": round(latency_ms, 4),
+        "onnx_parity_max_abs_diff": round(parity, 4),
+        "training_budget": training_budget,
+    }
+
+    model_fname, meta_fname = save_model_artifacts(onnx_model, metadata, BASE_NAME, ts_str, upload=upload)
+
+    return {
+        "message": "Model and metadata uploaded successfully." if upload else "Model and metadata saved locally.",
+        "model_file": model_fname,
+        "metadata_file": meta_fname,
+        "rmse_cv": round(rmse, 2),
+        "r2_insample": round(r2, 2),
+        "rmse_last_fold_by_horizon": metadata["rmse_last_fold_by_horizon"],
+        "training_time_s": round(training_time, 3),
+        "model_size_bytes": model_size,
+        "inference_latency_ms": round(latency_ms, 4)
+    }
+
+
+def last_fold_rmse(estimator, X: pd.DataFrame, Y: pd.DataFrame, tscv: TimeSeriesSplit) -> list:
+    """Per-output RMSE of the estimator's parameters refit on the last time-series training split."""
+    train_idx, test_idx = list(tscv.split(X))[-1]
+    fold_model = clone(estimator).fit(X.iloc[train_idx], Y.iloc[train_idx])
+    errors = fold_model.predict(X.iloc[test_idx]) - Y.iloc[test_idx].to_numpy()
+    return np.sqrt(np.mean(errors ** 2, axis=0)).tolist()
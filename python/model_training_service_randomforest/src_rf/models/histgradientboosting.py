@@ -0,0 +1,141 @@
+import logging
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import HistGradientBoostingRegressor
+from sklearn.model_selection import TimeSeriesSplit, GridSearchCV
+from sklearn.pipeline import Pipeline
+
+from config_rf import HGB_MAX_ITER
+from data.preparation import prepare_training_frame, empty_result, feature_columns, target_description
+from models.export import (LOCAL_MODELS_DIR, export_onnx, measure_inference_latency_ms, onnx_parity_max_abs_diff,
+                           save_model_artifacts)
+from services.artifacts import load_latest_metadata
+from services.tracing import record_cv_fits, span, trace_run
+
+logger = logging.getLogger(__name__)
+
+BASE_NAME = "soil_humidity_histgradientboosting"
+
+LEARNING_RATES = [0.05, 0.1]
+MAX_LEAF_NODES = [15, 31]
+
+
+def train_model_hgb(json_samples: str, json_threshold: str, upload: bool = False) -> dict:
+    """
+    Histogram gradient boosting alternative to train_model_rf, trained on the same data pipeline.
+
+    Upload is off by default: the prediction build service only recognizes the RandomForest and
+    Ridge model types so far, so these models are meant for offline comparison for now.
+    """
+    with trace_run("train_model_hgb", upload=upload) as trace:
+        result = _train_model_hgb(json_samples, json_threshold, upload)
+        trace["message"] = result["message"]
+        return result
+
+
+def _train_model_hgb(json_samples: str, json_threshold: str, upload: bool) -> dict:
+    prev_metadata = load_latest_metadata(LOCAL_MODELS_DIR, BASE_NAME)
+    df, threshold, profile, error = prepare_training_frame(json_samples, json_threshold, prev_metadata)
+    if error:
+        return empty_result(error)
+
+    feature_cols = feature_columns(profile)
+
+    X = df[feature_cols].astype(float)
+    y = df["minutes_to_dry"].astype(float)
+
+    # Trees are scale invariant, so no scaler is needed here.
+    # Built-in early stopping would hold out a random 10% of rows, and these are time-ordered samples stacked once
+    # per grid threshold: the holdout would be copies and near neighbours of training rows. The iterations are
+    # chosen on the chronologically last fold instead, and the grid only searches learning rate and leaves.
+    pipeline = Pipeline([
+        ("hgb", HistGradientBoostingRegressor(early_stopping=False, random_state=42))
+    ])
+
+    tscv = TimeSeriesSplit(n_splits=5)
+    fit_start = time.perf_counter()
+    with span("iterations", rows=len(X)) as s:
+        iterations = iterations_on_last_fold(X, y, tscv, HGB_MAX_ITER)
+        s["max_iter"] = max(iterations.values())
+    param_grid = [
+        {"hgb__learning_rate": [lr], "hgb__max_leaf_nodes": [leaves], "hgb__max_iter": [n_iter]}
+        for (lr, leaves), n_iter in iterations.items()
+    ]
+
+    grid = GridSearchCV(pipeline, param_grid, cv=tscv, scoring="neg_root_mean_squared_error", n_jobs=-1)
+    with span("fit", rows=len(X)):
+        grid.fit(X, y)
+        record_cv_fits(grid)
+    training_time = time.perf_counter() - fit_start
+
+    rmse = -grid.best_score_
+    r2 = grid.best_estimator_.score(X, y)
+    hgb = grid.best_estimator_.named_steps["hgb"]
+
+    # Export model to ONNX
+    with span("export") as s:
+        onnx_model = export_onnx(grid.best_estimator_, len(feature_cols), feature_names=feature_cols)
+        model_size = onnx_model.ByteSize()
+        s["model_size_bytes"] = model_size
+    with span("onnx_checks"):
+        latency_ms = measure_inference_latency_ms(onnx_model, X.to_numpy())
+        parity = onnx_parity_max_abs_diff(onnx_model, grid.best_estimator_, X)
+
+    now = datetime.now()
+    ts_str = now.strftime("%Y%m%d%H%M%S")
+
+    metadata = {
+        "model_type": "HistGradientBoosting",
+        "target": target_description(threshold, profile["threshold_grid"]),
+        "feature_names": feature_cols,
+        "learning_rate": grid.best_params_["hgb__learning_rate"],
+        "max_leaf_nodes": grid.best_params_["hgb__max_leaf_nodes"],
+        "max_iter": grid.best_params_["hgb__max_iter"],
+        "n_iter": int(hgb.n_iter_),
+        "max_iter_by_params": {f"{lr}/{leaves}": n_iter for (lr, leaves), n_iter in iterations.items()},
+        "cross_val_splits": tscv.n_splits,
+        "training_timestamp_utc": now.isoformat(),
+        "rmse_cv": round(rmse, 2),
+        "r2_insample": round(r2, 2),
+        "training_time_s": round(training_time, 3),
+        "model_size_bytes": model_size,
+        "inference_latency_ms": round(latency_ms, 4),
+        "onnx_parity_max_abs_diff": round(parity, 4),
+        **profile
+    }
+
+    model_fname, meta_fname = save_model_artifacts(onnx_model, metadata, BASE_NAME, ts_str, upload=upload)
+
+    return {
+        "message": "Model and metadata uploaded successfully." if upload else "Model and metadata saved locally.",
+        "model_file": model_fname,
+        "metadata_file": meta_fname,
+        "rmse_cv": round(rmse, 2),
+        "r2_insample": round(r2, 2),
+        "training_time_s": round(training_time, 3),
+        "model_size_bytes": model_size,
+        "inference_latency_ms": round(latency_ms, 4)
+    }
+
+
+def iterations_on_last_fold(X: pd.DataFrame, y: pd.Series, tscv: TimeSeriesSplit, max_iter: int) -> dict:
+    """
+    Boosting iterations per (learning_rate, max_leaf_nodes) in the grid: one fit of max_iter iterations on the
+    training split of the last time-series fold, then the iteration count with the lowest RMSE on its
+    (chronologically last) test split, read from staged_predict.
+    """
+    train_idx, test_idx = list(tscv.split(X))[-1]
+    y_test = y.iloc[test_idx].to_numpy()
+    iterations = {}
+    for lr in LEARNING_RATES:
+        for leaves in MAX_LEAF_NODES:
+            hgb = HistGradientBoostingRegressor(learning_rate=lr, max_leaf_nodes=leaves, max_iter=max_iter,
+                                                early_stopping=False, random_state=42)
+            hgb.fit(X.iloc[train_idx], y.iloc[train_idx])
+            rmse = [np.sqrt(np.mean((pred - y_test) ** 2)) for pred in hgb.staged_predict(X.iloc[test_idx])]
+            iterations[(lr, leaves)] = int(np.argmin(rmse)) + 1
+    logger.info("Boosting iterations on the last fold: %s", iterations)
+    return iterations
@@ -1,105 +1,43 @@
-import json
 import logging
-import os
-import re
+import time
 from datetime import datetime
 
-import numpy as np
-import pandas as pd
-from skl2onnx import convert_sklearn
-from skl2onnx.common.data_types import FloatTensorType
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.model_selection import TimeSeriesSplit, GridSearchCV
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import StandardScaler
 
-from data.cleaning import (clean_sensor_data)
-from features.target import add_minutes_to_dry
-from services.blob_uploader import upload_to_blob
+from config_rf import (WARM_START_SEARCH, WARM_START_RADIUS, WARM_START_TOLERANCE, DISTILL_ENABLED, DISTILL_MAX_ITER,
+                       DISTILL_MAX_LEAF_NODES, DISTILL_SYNTHETIC_FRACTION, DISTILL_NOISE)
+from data.preparation import prepare_training_frame, empty_result, feature_columns, target_description
+from models.distill import distill_forest, float32_inputs
+from models.export import (LOCAL_MODELS_DIR, export_onnx, measure_inference_latency_ms, onnx_parity_max_abs_diff,
+                           save_model_artifacts)
+from models.search import warm_started_search
+from services.artifacts import load_latest_metadata
+from services.tracing import span, trace_run
 
 logger = logging.getLogger(__name__)
 
+BASE_NAME = "soil_humidity_randomforest"
+# Not '<BASE_NAME>_...', so lookups of the latest forest never pick up a student
+STUDENT_BASE_NAME = "soil_humidity_distilled_randomforest"
 
-def train_model_rf(json_samples: str, json_threshold: str) -> dict:
-    parsed_samples = json.loads(json_samples)
-
-    sample_data = None
-    if isinstance(parsed_samples, dict) and "response" in parsed_samples and "list" in parsed_samples["response"]:
-        logger.info("Detected nested response/list/SampleDTO structure.")
-        sample_data = [item["SampleDTO"] for item in parsed_samples["response"]["list"]]
-    elif isinstance(parsed_samples, list) and parsed_samples and isinstance(parsed_samples[0], dict):
-        if "SampleDTO" in parsed_samples[0]:
-            logger.info("Detected list of SampleDTO wrappers.")
-            sample_data = [item["SampleDTO"] for item in parsed_samples]
-        else:
-            logger.info("Detected direct list of SampleDTO dicts.")
-            sample_data = parsed_samples
-
-    if sample_data is None:
-        raise ValueError("Unexpected JSON structure from /sensor/data")
-
-    df = pd.DataFrame(sample_data)
-
-    # Normalize column names
-    rename_map = {
-        "soilhumidity": "soil_humidity",
-        "airhumidity": "air_humidity",
-        "airtemperature": "temperature",
-        "lightvalue": "light",
-        "timestamp": "timestamp"
-    }
 
-    def normalize_col(col: str) -> str:
-        return re.sub(r"[^a-z0-9]", "", col.lower())
-
-    df.rename(columns={col: rename_map.get(normalize_col(col), col) for col in df.columns}, inplace=True)
-
-    required_cols = ["soil_humidity", "air_humidity", "temperature", "light", "timestamp"]
-    missing = set(required_cols) - set(df.columns)
-    if missing:
-        raise ValueError(f"Missing required columns in sample data: {missing}")
-
-    df["timestamp"] = pd.to_datetime(df["timestamp"])
-    df = clean_sensor_data(df, expected_interval_minutes=10, gap_drop_threshold=60)
-
-    if df.empty:
-        logger.error("No valid samples after data cleaning.")
-        return {
-            "message": "No valid training samples after cleaning.",
-            "model_file": None,
-            "metadata_file": None,
-            "rmse_cv": None,
-            "r2_insample": None
-        }
-
-    threshold = json.loads(json_threshold)
-    logger.info("Threshold value received: %s", threshold)
-
-    if df["soil_humidity"].min() >= threshold:
-        new_threshold = df["soil_humidity"].quantile(0.10)
-        logger.warning("Adjusting low threshold %.2f to 10th percentile: %.2f", threshold, new_threshold)
-        threshold = new_threshold
-
-    df = add_minutes_to_dry(df, threshold)
-    df.dropna(subset=["minutes_to_dry"], inplace=True)
-
-    if df.empty:
-        logger.error("No data remains after filtering minutes_to_dry.")
-        return {
-            "message": "No valid training samples after threshold filtering.",
-            "model_file": None,
-            "metadata_file": None,
-            "rmse_cv": None,
-            "r2_insample": None
-        }
-
-    df["hour_sin"] = np.sin(df["timestamp"].dt.hour / 24 * 2 * np.pi)
-    df["hour_cos"] = np.cos(df["timestamp"].dt.hour / 24 * 2 * np.pi)
-
-    feature_cols = [
-        "soil_humidity", "soil_delta", "air_humidity", "temperature", "light",
-        "hour_sin", "hour_cos", "threshold"
-    ]
+def train_model_rf(json_samples: str, json_threshold: str, upload: bool = True) -> dict:
+    with trace_run("train_model_rf", upload=upload) as trace:
+        result = _train_model_rf(json_samples, json_threshold, upload)
+        trace["message"] = result["message"]
+        return result
+
+
+def _train_model_rf(json_samples: str, json_threshold: str, upload: bool) -> dict:
+    prev_metadata = load_latest_metadata(LOCAL_MODELS_DIR, BASE_NAME)
+    df, threshold, profile, error = prepare_training_frame(json_samples, json_threshold, prev_metadata)
+    if error:
+        return empty_result(error)
+
+    feature_cols = feature_columns(profile)
 
     X = df[feature_cols].astype(float)
     y = df["minutes_to_dry"].astype(float)
@@ -115,53 +53,89 @@ def train_model_rf(json_samples: str, json_threshold: str) -> dict:
         "rf__max_depth": [5, 10, None]
     }
 
-    grid = GridSearchCV(pipeline, param_grid, cv=tscv, scoring="neg_root_mean_squared_error", n_jobs=-1)
-    grid.fit(X, y)
+    def make_search(grid):
+        return GridSearchCV(pipeline, grid, cv=tscv, scoring="neg_root_mean_squared_error", n_jobs=-1)
+
+    fit_start = time.perf_counter()
+    with span("fit", rows=len(X)):
+        grid, search = warm_started_search(
+            make_search, X, y, param_grid, prev_metadata,
+            metadata_keys={"rf__n_estimators": "n_estimators", "rf__max_depth": "max_depth"},
+            radius=WARM_START_RADIUS, tolerance=WARM_START_TOLERANCE, enabled=WARM_START_SEARCH,
+        )
+    training_time = time.perf_counter() - fit_start
 
     rmse = -grid.best_score_
     r2 = grid.best_estimator_.score(X, y)
 
     # Export model to ONNX
-    initial_type = [("input", FloatTensorType([None, len(feature_cols)]))]
-    onnx_model = convert_sklearn(grid.best_estimator_, initial_types=initial_type)
+    with span("export") as s:
+        onnx_model = export_onnx(grid.best_estimator_, len(feature_cols), feature_names=feature_cols)
+        model_size = onnx_model.ByteSize()
+        s["model_size_bytes"] = model_size
+    with span("onnx_checks"):
+        latency_ms = measure_inference_latency_ms(onnx_model, X.to_numpy())
+        parity = onnx_parity_max_abs_diff(onnx_model, grid.best_estimator_, X)
 
     now = datetime.now()
     ts_str = now.strftime("%Y%m%d%H%M%S")
-    base_name = "soil_humidity_randomforest"
-    model_fname = f"{base_name}_{ts_str}.onnx"
-    meta_fname = f"{base_name}_{ts_str}.metadata.json"
-
-    local_models_dir = os.path.join(os.path.dirname(__file__), "models")
-    os.makedirs(local_models_dir, exist_ok=True)
 
-    model_path = os.path.join(local_models_dir, model_fname)
-    with open(model_path, "wb") as f:
-        f.write(onnx_model.SerializeToString())
+    distillation, extra_models = None, {}
+    if DISTILL_ENABLED:
+        with span("distill", rows=len(X)):
+            student, distillation = distill_forest(
+                grid.best_estimator_, X, y, tscv, max_iter=DISTILL_MAX_ITER, max_leaf_nodes=DISTILL_MAX_LEAF_NODES,
+                synthetic_fraction=DISTILL_SYNTHETIC_FRACTION, noise=DISTILL_NOISE,
+            )
+        with span("export_student") as s:
+            student_onnx = export_onnx(student, len(feature_cols), feature_names=feature_cols)
+            student_size = student_onnx.ByteSize()
+            student_latency_ms = measure_inference_latency_ms(student_onnx, X.to_numpy())
+            s["model_size_bytes"] = student_size
+
+        student_fname = f"{STUDENT_BASE_NAME}_{ts_str}.onnx"
+        extra_models[student_fname] = student_onnx
+        distillation.update({
+            "student_model_file": student_fname,
+            "student_model_size_bytes": student_size,
+            "student_inference_latency_ms": round(student_latency_ms, 4),
+            "student_onnx_parity_max_abs_diff": round(
+                onnx_parity_max_abs_diff(student_onnx, student, float32_inputs(X)), 4),
+            # The trade-off: accuracy lost on the last fold against size and latency gained
+            "rmse_increase": round(distillation["student_rmse_last_fold"] - distillation["teacher_rmse_last_fold"], 2),
+            "size_ratio": round(student_size / model_size, 4),
+            "latency_speedup": round(latency_ms / student_latency_ms, 2),
+        })
 
     metadata = {
         "model_type": "RandomForest",
-        "target": f"minutes_to_dry (<{threshold}% soil humidity)",
+        "target": target_description(threshold, profile["threshold_grid"]),
         "feature_names": feature_cols,
         "n_estimators": grid.best_params_["rf__n_estimators"],
         "max_depth": grid.best_params_["rf__max_depth"],
         "cross_val_splits": tscv.n_splits,
         "training_timestamp_utc": now.isoformat(),
         "rmse_cv": round(rmse, 2),
-        "r2_insample": round(r2, 2)
+        "r2_insample": round(r2, 2),
+        "training_time_s": round(training_time, 3),
+        "model_size_bytes": model_size,
+        "inference_latency_ms": round(latency_ms, 4),
+        "onnx_parity_max_abs_diff": round(parity, 4),
+        "hyperparameter_search": search,
+        "distillation": distillation,
+        **profile
     }
 
-    meta_path = os.path.join(local_models_dir, meta_fname)
-    with open(meta_path, "w") as f:
-        json.dump(metadata, f, indent=4)
-
-    upload_to_blob(model_path, model_fname)
-    upload_to_blob(meta_path, meta_fname)
-    logger.info("Model and metadata uploaded: %s, %s", model_fname, meta_fname)
+    model_fname, meta_fname = save_model_artifacts(onnx_model, metadata, BASE_NAME, ts_str, upload=upload,
+                                                   extra_models=extra_models)
 
     return {
-        "message": "Model and metadata uploaded successfully.",
+        "message": "Model and metadata uploaded successfully." if upload else "Model and metadata saved locally.",
         "model_file": model_fname,
         "metadata_file": meta_fname,
         "rmse_cv": round(rmse, 2),
-        "r2_insample": round(r2, 2)
+        "r2_insample": round(r2, 2),
+        "training_time_s": round(training_time, 3),
+        "model_size_bytes": model_size,
+        "inference_latency_ms": round(latency_ms, 4)
     }
@@ -0,0 +1,120 @@
+import logging
+from typing import Callable, Optional
+
+import numpy as np
+from sklearn.model_selection import GridSearchCV, ParameterGrid
+from services.tracing import record_cv_fits, span
+
+logger = logging.getLogger(__name__)
+
+
+def _index_of(values: list, value) -> Optional[int]:
+    for i, candidate in enumerate(values):
+        if candidate is None or value is None:
+            if candidate is value:
+                return i
+        elif isinstance(candidate, (float, np.floating)) or isinstance(value, float):
+            # Float grid values went through JSON, compare with a tolerance
+            if np.isclose(candidate, value, rtol=1e-9, atol=0):
+                return i
+        elif candidate == value:
+            return i
+    return None
+
+
+def neighbourhood_grid(param_grid: dict, best_params: dict, radius: int) -> Optional[list]:
+    """
+    Candidates around best_params: best_params itself, plus the values within `radius` grid positions of it
+    along one parameter at a time, as a GridSearchCV param_grid list. None if best_params is not a grid point.
+    """
+    position = {}
+    for name, values in param_grid.items():
+        i = _index_of(list(values), best_params.get(name, object()))
+        if i is None:
+            return None
+        position[name] = i
+
+    centre = {name: param_grid[name][i] for name, i in position.items()}
+    candidates = [centre]
+    for name, values in param_grid.items():
+        i = position[name]
+        for j in range(max(0, i - radius), min(len(values), i + radius + 1)):
+            if j != i:
+                candidates.append({**centre, name: values[j]})
+    return [{name: [value] for name, value in candidate.items()} for candidate in candidates]
+
+
+def previous_search(prev_metadata: Optional[dict], metadata_keys: dict):
+    """
+    Best parameters and CV RMSE of the previous model's search, as (params, rmse_cv). Reads the
+    "hyperparameter_search" block, or the top-level keys in metadata_keys (param name -> metadata key)
+    for models trained before it existed. rmse_cv is None when the previous score is not a CV score.
+    """
+    if not prev_metadata:
+        return None, None
+
+    search = prev_metadata.get("hyperparameter_search") or {}
+    if search.get("best_params"):
+        return search["best_params"], search.get("rmse_cv")
+
+    if not all(key in prev_metadata for key in metadata_keys.values()):
+        return None, None
+    params = {name: prev_metadata[key] for name, key in metadata_keys.items()}
+    cross_validated = prev_metadata.get("validation", "time_series_cv") == "time_series_cv"
+    rmse = prev_metadata.get("rmse_cv") if cross_validated else None
+    return params, rmse
+
+
+def warm_started_search(make_search: Callable[[object], GridSearchCV], X, y, param_grid: dict,
+                        prev_metadata: Optional[dict], metadata_keys: dict, radius: int, tolerance: float,
+                        enabled: bool = True):
+    """
+    Hyperparameter search seeded from the previous model: searches the neighbourhood of its best parameters
+    first and the full grid only if that CV RMSE is worse than the previous one by more than `tolerance`
+    (relative), or if there is no usable previous model. make_search(grid) returns an unfitted GridSearchCV.
+
+    Returns (fitted search, strategy) where strategy is the "hyperparameter_search" metadata block.
+    """
+    prev_params, prev_rmse = previous_search(prev_metadata, metadata_keys) if enabled else (None, None)
+    neighbourhood = neighbourhood_grid(param_grid, prev_params, radius) if prev_params else None
+    full_size = len(ParameterGrid(param_grid))
+
+    strategy = {
+        "previous_params": prev_params,
+        "previous_rmse_cv": prev_rmse,
+        "radius": radius,
+        "tolerance": tolerance,
+        "full_grid_candidates": full_size,
+    }
+
+    if neighbourhood is None:
+        reason = "warm start disabled" if not enabled else "no previous parameters on the grid"
+        with span("search_full", candidates=full_size):
+            search = make_search(param_grid).fit(X, y)
+            record_cv_fits(search)
+        strategy.update(strategy="full", reason=reason, candidates_evaluated=full_size)
+    else:
+        with span("search_neighbourhood", candidates=len(neighbourhood)):
+            search = make_search(neighbourhood).fit(X, y)
+            record_cv_fits(search)
+        rmse = -search.best_score_
+        strategy.update(strategy="neighbourhood", candidates_evaluated=len(neighbourhood))
+
+        if prev_rmse is None:
+            strategy["reason"] = "no previous CV score to compare with"
+        elif rmse <= prev_rmse * (1 + tolerance):
+            strategy["reason"] = f"CV RMSE {rmse:.3f} within {tolerance:.0%} of previous {prev_rmse:.3f}"
+        else:
+            logger.info("Neighbourhood CV RMSE %.3f is worse than previous %.3f by more than %.0f%%. Widening to the "
+                        "full grid.", rmse, prev_rmse, tolerance * 100)
+            with span("search_full", candidates=full_size):
+                search = make_search(param_grid).fit(X, y)
+                record_cv_fits(search)
+            strategy.update(strategy="widened", candidates_evaluated=len(neighbourhood) + full_size,
+                            reason=f"neighbourhood CV RMSE {rmse:.3f} worse than previous {prev_rmse:.3f} "
+                                   f"by more than {tolerance:.0%}")
+
+    strategy.update(best_params=search.best_params_, rmse_cv=float(-search.best_score_))
+    logger.info("Hyperparameter search: %s (%d of %d grid candidates). %s", strategy["strategy"],
+                strategy["candidates_evaluated"], full_size, strategy["reason"])
+    return search, strategy
@@ -0,0 +1,62 @@
+import glob
+import json
+import logging
+import os
+from typing import Callable, Optional
+
+from config_rf import JOB_LOCK_BACKEND
+from services.blob_uploader import download_latest_blob, latest_blob_name
+
+logger = logging.getLogger(__name__)
+
+METADATA_SUFFIX = ".metadata.json"
+
+# Called as callback(base_name, model_path) whenever this process publishes a new model
+_publish_listeners = []
+
+
+def add_publish_listener(callback: Callable[[str, str], None]):
+    _publish_listeners.append(callback)
+
+
+def remove_publish_listener(callback: Callable[[str, str], None]):
+    if callback in _publish_listeners:
+        _publish_listeners.remove(callback)
+
+
+def notify_model_published(base_name: str, model_path: str):
+    for callback in list(_publish_listeners):
+        try:
+            callback(base_name, model_path)
+        except Exception as e:
+            logger.warning("Model publish listener failed for %s: %s", base_name, e)
+
+
+def latest_artifact_path(models_dir: str, base_name: str, suffix: str) -> Optional[str]:
+    """
+    Returns the newest '<base_name>_<timestamp><suffix>' artifact. Looks in the local models dir first
+    and falls back to blob storage. Timestamped names sort chronologically.
+
+    With job locking on (JOB_LOCK_BACKEND) the replicas take turns training, so a newer model may have been
+    published by another one: the local copy is then only used while no newer blob exists.
+    """
+    candidates = sorted(glob.glob(os.path.join(models_dir, f"{base_name}_*{suffix}")))
+    local = candidates[-1] if candidates else None
+    if local and not JOB_LOCK_BACKEND:
+        return local
+
+    try:
+        if local and os.path.basename(latest_blob_name(base_name, suffix) or "") <= os.path.basename(local):
+            return local
+        return download_latest_blob(base_name, suffix, models_dir) or local
+    except Exception as e:
+        logger.warning("Could not fetch previous '%s' artifact from blob storage: %s", suffix, e)
+        return local
+
+
+def load_latest_metadata(models_dir: str, base_name: str) -> Optional[dict]:
+    path = latest_artifact_path(models_dir, base_name, METADATA_SUFFIX)
+    if path is None:
+        return None
+    with open(path) as f:
+        return json.load(f)
@@ -0,0 +1,174 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+import onnxruntime as rt
+
+from config_rf import (PREDICTION_CACHE_MAX_ENTRIES, PREDICTION_CACHE_TTL_SECONDS, PREDICTION_CACHE_QUANTA,
+                       PREDICTION_CACHE_DEFAULT_QUANTUM, PREDICTION_MODEL_REFRESH_SECONDS)
+from features.engineering import FEATURE_COLS
+from models.export import LOCAL_MODELS_DIR
+from services.artifacts import add_publish_listener, latest_artifact_path, remove_publish_listener
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class PredictionCache:
+    """
+    Thread-safe LRU cache of prediction results with a time-to-live.
+    Keys are (model_version, quantized feature tuple), see CachedPredictor.
+    """
+
+    def __init__(self, max_entries: int = PREDICTION_CACHE_MAX_ENTRIES,
+                 ttl_s: Optional[float] = PREDICTION_CACHE_TTL_SECONDS, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.clock = clock
+        # key -> (expires_at, value), least recently used first
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING and entry[0] is not None and entry[0] <= self.clock():
+                del self._entries[key]
+                self.expirations += 1
+                entry = _MISSING
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            expires_at = self.clock() + self.ttl_s if self.ttl_s is not None else None
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self):
+        """Drops every entry, e.g. when a new model is published."""
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+
+class CachedPredictor:
+    """
+    Serves the newest '<base_name>_<timestamp>.onnx' model from the models dir with a PredictionCache in front.
+
+    Inputs are rounded to PREDICTION_CACHE_QUANTA per feature (PREDICTION_CACHE_DEFAULT_QUANTUM for features
+    not listed there), and both the cache key and the model input
+    use the rounded vector, so a cached result is exactly what the model returns for it. The model version
+    (the file name) is part of the key. The cache is cleared when this process publishes a new model, and
+    the models dir is checked for models published elsewhere every refresh_s seconds.
+    """
+
+    def __init__(self, base_name: str, models_dir: Optional[str] = None, cache: Optional[PredictionCache] = None,
+                 feature_names=None, quanta: Optional[dict] = None,
+                 refresh_s: float = PREDICTION_MODEL_REFRESH_SECONDS, clock=time.monotonic):
+        self.base_name = base_name
+        self.models_dir = models_dir or LOCAL_MODELS_DIR
+        self.cache = cache if cache is not None else PredictionCache(clock=clock)
+        self.feature_names = list(feature_names or FEATURE_COLS)
+        quanta = quanta or PREDICTION_CACHE_QUANTA
+        unlisted = [name for name in self.feature_names if name not in quanta]
+        if unlisted:
+            logger.info("No cache quantum for %s, rounding to %g.", unlisted, PREDICTION_CACHE_DEFAULT_QUANTUM)
+        self.steps = np.array([quanta.get(name, PREDICTION_CACHE_DEFAULT_QUANTUM) for name in self.feature_names],
+                              dtype=float)
+        self.refresh_s = refresh_s
+        self.clock = clock
+        self.version = None
+        self._session = None
+        self._input_name = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+        add_publish_listener(self._on_model_published)
+
+    def close(self):
+        remove_publish_listener(self._on_model_published)
+
+    def _on_model_published(self, base_name: str, model_path: str):
+        if base_name == self.base_name:
+            self._load(model_path)
+
+    def _load(self, model_path: str):
+        version = os.path.splitext(os.path.basename(model_path))[0]
+        with self._lock:
+            if version == self.version:
+                return
+            session = rt.InferenceSession(model_path, providers=["CPUExecutionProvider"])
+            self._session, self._input_name = session, session.get_inputs()[0].name
+            previous, self.version = self.version, version
+            self.cache.invalidate()
+        logger.info("Serving model %s (was %s). Prediction cache cleared.", version, previous)
+
+    def refresh(self):
+        """Loads the newest model in the models dir if it differs from the one being served."""
+        self._checked_at = self.clock()
+        path = latest_artifact_path(self.models_dir, self.base_name, ".onnx")
+        if path is None:
+            if self.version is None:
+                raise FileNotFoundError(f"No '{self.base_name}' model found in {self.models_dir}")
+            return
+        self._load(path)
+
+    def quantize(self, X) -> np.ndarray:
+        X = np.asarray(X, dtype=float).reshape(-1, len(self.feature_names))
+        return np.round(X / self.steps).astype(np.int64)
+
+    def predict(self, X) -> np.ndarray:
+        """Predictions for the rows of X (columns in feature_names order). Only cache misses reach the model."""
+        if self._checked_at is None or self.clock() - self._checked_at >= self.refresh_s:
+            self.refresh()
+
+        with self._lock:
+            version, session, input_name = self.version, self._session, self._input_name
+
+        keys = [(version, row) for row in map(tuple, self.quantize(X).tolist())]
+        results = [self.cache.get(key, _MISSING) for key in keys]
+
+        # Duplicate rows within a batch are computed once
+        missing = list(dict.fromkeys(key for key, result in zip(keys, results) if result is _MISSING))
+        if missing:
+            rows = (np.array([key[1] for key in missing], dtype=float) * self.steps).astype(np.float32)
+            outputs = session.run(None, {input_name: rows})[0].reshape(len(missing), -1)
+            computed = dict(zip(missing, outputs))
+            for key, output in computed.items():
+                self.cache.put(key, output)
+            results = [computed[key] if result is _MISSING else result for key, result in zip(keys, results)]
+
+        out = np.array(results, dtype=np.float32).reshape(len(keys), -1)
+        return out[:, 0] if out.shape[1] == 1 else out
@@ -0,0 +1,27 @@
+import json
+
+import data.io as io_mod
+import models.export as export_mod
+import models.randomforest as rf_mod
+import scheduler as scheduler_mod
+import services.blob_uploader as blob_mod
+from services.mal_api_standin import MalApiStandIn
+
+
+def test_job_against_local_mal_api_and_blob_store(monkeypatch, tmp_path):
+    blob_dir = tmp_path / "blobs"
+    monkeypatch.setattr(blob_mod, "LOCAL_BLOB_DIR", str(blob_dir))
+    monkeypatch.setattr(export_mod, "LOCAL_MODELS_DIR", str(tmp_path / "models"))
+    monkeypatch.setattr(rf_mod, "LOCAL_MODELS_DIR", str(tmp_path / "models"))
+
+    with MalApiStandIn(n_samples=300, threshold=30, latency_s=0.01) as standin:
+        monkeypatch.setattr(io_mod, "DATA_ENDPOINT", f"{standin.base_url}/sensor/data")
+        monkeypatch.setattr(io_mod, "THRESHOLD_ENDPOINT", f"{standin.base_url}/sensor/soilhumiditythreshold")
+        scheduler_mod.job()
+        assert standin.requests == 2
+
+    (metadata_file,) = blob_dir.glob("soil_humidity_randomforest_*.metadata.json")
+    assert (blob_dir / metadata_file.name.replace(".metadata.json", ".onnx")).exists()
+    metadata = json.loads(metadata_file.read_text())
+    assert metadata["model_type"] == "RandomForest"
+    assert metadata["feature_sketches"]["features"]["soil_humidity"]["count"] == 300
@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+
+from evaluation.batch_eval import evaluate_onnx_batch
+from features.engineering import FEATURE_COLS
+from models.export import export_onnx
+
+
+def test_chunked_onnx_evaluation_matches_sklearn(tmp_path):
+    rng = np.random.default_rng(0)
+    n = 5_000
+    df = pd.DataFrame(rng.uniform(0, 100, size=(n, len(FEATURE_COLS))), columns=FEATURE_COLS)
+    df["minutes_to_dry"] = 3 * df["soil_humidity"] + rng.normal(size=n)
+    df["timestamp"] = pd.date_range("2025-01-01", periods=n, freq="10min")
+    df["device_id"] = np.where(np.arange(n) % 2, "a", "b")
+    matrix_path = str(tmp_path / "features.parquet")
+    df.to_parquet(matrix_path, index=False)
+
+    model = RandomForestRegressor(n_estimators=5, max_depth=6, random_state=0).fit(df[FEATURE_COLS], df["minutes_to_dry"])
+    model_path = str(tmp_path / "model.onnx")
+    with open(model_path, "wb") as f:
+        f.write(export_onnx(model, len(FEATURE_COLS)).SerializeToString())
+
+    output_path = str(tmp_path / "predictions.parquet")
+    summary = evaluate_onnx_batch(model_path, matrix_path, output_path, chunk_size=700, n_threads=3,
+                                  reference_model=model)
+
+    predictions = pd.read_parquet(output_path)
+    scores = pd.read_parquet(summary["scores_file"])
+
+    assert summary["rows"] == n and len(predictions) == n
+    assert predictions["timestamp"].is_monotonic_increasing
+    assert summary["parity_mismatch_rows"] == 0
+    expected_rmse = np.sqrt(np.mean((model.predict(df[FEATURE_COLS]) - df["minutes_to_dry"]) ** 2))
+    assert np.isclose(summary["rmse"], expected_rmse, rtol=1e-3)
+    assert set(scores["device"]) == {"a", "b"} and scores["n"].sum() == n
+    # Per-chunk sums merge into the same per-(window, device) scores as one pass over all rows
+    err = model.predict(df[FEATURE_COLS]) - df["minutes_to_dry"]
+    expected = (err ** 2).groupby([df["timestamp"].dt.floor("1D"), df["device_id"]]).mean() ** 0.5
+    np.testing.assert_allclose(scores["rmse"], expected.sort_index().to_numpy(), rtol=1e-3)
@@ -0,0 +1,61 @@
+import json
+
+import numpy as np
+import onnxruntime as rt
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.model_selection import TimeSeriesSplit
+
+import models.export as export_mod
+import models.randomforest as rf_mod
+import services.artifacts as artifacts_mod
+from models.distill import distill_forest, synthetic_samples
+from tests.unit.test_histgradientboosting import _payload
+
+STUDENT = {"max_iter": 50, "max_leaf_nodes": 15, "synthetic_fraction": 1.0, "noise": 0.1}
+
+
+def test_synthetic_samples_stay_in_the_observed_range():
+    X = np.random.default_rng(0).uniform([0, 10], [1, 20], size=(500, 2))
+
+    fake = synthetic_samples(X, 2000, noise=0.5)
+
+    assert fake.shape == (2000, 2)
+    assert (fake >= X.min(axis=0)).all() and (fake <= X.max(axis=0)).all()
+
+
+def test_student_tracks_the_forest():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.uniform(size=(2000, 3)), columns=["a", "b", "c"])
+    y = pd.Series(100 * X["a"] + 20 * np.sin(6 * X["b"]) + rng.normal(scale=2, size=len(X)))
+    teacher = RandomForestRegressor(n_estimators=50, random_state=0).fit(X, y)
+
+    student, report = distill_forest(teacher, X, y, TimeSeriesSplit(n_splits=3), **STUDENT)
+
+    assert report["student_rmse_last_fold"] < 1.5 * report["teacher_rmse_last_fold"]
+    assert report["student_fidelity_rmse"] < 0.1 * y.std()
+    assert report["rows_synthetic"] == len(X)
+
+
+def test_train_model_rf_exports_student_next_to_forest(monkeypatch, tmp_path):
+    monkeypatch.setattr(export_mod, "LOCAL_MODELS_DIR", str(tmp_path))
+    monkeypatch.setattr(rf_mod, "LOCAL_MODELS_DIR", str(tmp_path))
+    monkeypatch.setattr(artifacts_mod, "download_latest_blob", lambda *args: None)
+    uploads = []
+    monkeypatch.setattr(export_mod, "upload_to_blob", lambda path, name: uploads.append(name))
+    monkeypatch.setattr(rf_mod, "DISTILL_ENABLED", True)
+
+    result = rf_mod.train_model_rf(_payload(), json.dumps(30))
+
+    distillation = json.loads((tmp_path / result["metadata_file"]).read_text())["distillation"]
+    assert distillation["size_ratio"] < 1
+    assert distillation["student_onnx_parity_max_abs_diff"] < 0.01
+    assert {"rmse_increase", "latency_speedup", "student_inference_latency_ms"} <= distillation.keys()
+    # The student goes up before the metadata that announces the model
+    assert uploads == [distillation["student_model_file"], result["model_file"], result["metadata_file"]]
+    assert artifacts_mod.latest_artifact_path(str(tmp_path), rf_mod.BASE_NAME, ".onnx").endswith(result["model_file"])
+
+    session = rt.InferenceSession(str(tmp_path / distillation["student_model_file"]),
+                                  providers=["CPUExecutionProvider"])
+    assert session.get_inputs()[0].name == "input"
+    assert session.run(None, {"input": np.zeros((2, 8), dtype=np.float32)})[0].shape[0] == 2
@@ -0,0 +1,60 @@
+import json
+
+import numpy as np
+import onnxruntime as rt
+import pandas as pd
+
+import models.export as export_mod
+from features.horizons import soil_at_horizons
+from models.forecast import train_forecast_rf
+
+
+def test_soil_at_horizons_matches_nearest_sample_lookup():
+    rng = np.random.default_rng(0)
+    ts = np.cumsum(rng.integers(5, 16, 500))  # irregular 5-15 min sampling
+    ts[200:] += 300                            # and a 5 h sensor gap
+    soil = rng.uniform(10, 70, ts.size)
+    horizons, tolerance = [60, 180], 10
+
+    out = soil_at_horizons(soil, ts, horizons, tolerance)
+
+    for i in range(0, ts.size, 7):
+        for j, h in enumerate(horizons):
+            nearest = np.argmin(np.abs(ts - (ts[i] + h)))
+            expected = soil[nearest] if abs(ts[nearest] - ts[i] - h) <= tolerance else np.nan
+            np.testing.assert_equal(out[i, j], expected)
+    # Across the gap and at the end of the series there is nothing to learn from
+    assert np.isnan(out[199, 0]) and np.isnan(out[-1]).all()
+
+
+def _payload(n=1200):
+    ts = pd.date_range("2025-01-01", periods=n, freq="10min")
+    soil = 60 - (np.arange(n) % 150) * 0.3
+    rows = [{
+        "soil_humidity": float(s),
+        "air_humidity": 50.0,
+        "temperature": 20.0 + (i % 144) / 24,
+        "light": 100.0 + (i % 144),
+        "timestamp": t.strftime("%Y-%m-%dT%H:%M:%S")
+    } for i, (t, s) in enumerate(zip(ts, soil))]
+    return json.dumps(rows)
+
+
+def test_forecast_rf_predicts_every_horizon_in_one_call(monkeypatch, tmp_path):
+    monkeypatch.setattr(export_mod, "LOCAL_MODELS_DIR", str(tmp_path))
+    uploads = []
+    monkeypatch.setattr(export_mod, "upload_to_blob", lambda *args: uploads.append(args))
+
+    result = train_forecast_rf(_payload())
+
+    assert uploads == []  # local only by default
+    metadata = json.loads((tmp_path / result["metadata_file"]).read_text())
+    assert metadata["horizons_minutes"] == [60, 180, 360, 720]
+    assert len(metadata["rmse_last_fold_by_horizon"]) == 4
+    assert metadata["output_names"] == ["soil_humidity_plus_60min", "soil_humidity_plus_180min",
+                                        "soil_humidity_plus_360min", "soil_humidity_plus_720min"]
+
+    session = rt.InferenceSession(str(tmp_path / result["model_file"]), providers=["CPUExecutionProvider"])
+    rows = np.tile([[50.0, -0.3, 50.0, 21.0, 150.0, 0.5, 0.8]], (3, 1)).astype(np.float32)
+    forecast = session.run(None, {"input": rows})[0]
+    assert forecast.shape == (3, 4)
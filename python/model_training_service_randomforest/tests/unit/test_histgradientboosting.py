@@ -0,0 +1,50 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+import models.export as export_mod
+import models.histgradientboosting as hgb_mod
+import services.artifacts as artifacts_mod
+from models.histgradientboosting import train_model_hgb
+
+
+def _payload(n=600):
+    # Soil dries linearly and is watered every 100 samples (10 min interval)
+    ts = pd.date_range("2025-01-01", periods=n, freq="10min")
+    soil = 60 - (np.arange(n) % 100) * 0.4
+    rows = [{
+        "soil_humidity": float(s),
+        "air_humidity": 50.0,
+        "temperature": 20.0 + (i % 24) / 4,
+        "light": 100.0 + (i % 144),
+        "timestamp": t.strftime("%Y-%m-%dT%H:%M:%S")
+    } for i, (t, s) in enumerate(zip(ts, soil))]
+    return json.dumps({"response": {"list": [{"SampleDTO": r} for r in rows]}})
+
+
+def test_train_model_hgb_exports_and_reports_cost_metrics(monkeypatch, tmp_path):
+    monkeypatch.setattr(export_mod, "LOCAL_MODELS_DIR", str(tmp_path))
+    monkeypatch.setattr(hgb_mod, "LOCAL_MODELS_DIR", str(tmp_path))
+    monkeypatch.setattr(artifacts_mod, "download_latest_blob", lambda *args: None)
+    uploads = []
+    monkeypatch.setattr(export_mod, "upload_to_blob", lambda *args: uploads.append(args))
+
+    result = train_model_hgb(_payload(), json.dumps(30))
+
+    assert result["model_file"].endswith(".onnx")
+    assert (tmp_path / result["model_file"]).exists()
+    assert uploads == []  # local only by default
+
+    metadata = json.loads((tmp_path / result["metadata_file"]).read_text())
+    assert metadata["model_type"] == "HistGradientBoosting"
+    for key in ("rmse_cv", "training_time_s", "model_size_bytes", "inference_latency_ms"):
+        assert metadata[key] is not None and metadata[key] >= 0
+    # The iteration count comes from the chronologically last fold, not from a random early stopping split
+    assert metadata["n_iter"] == metadata["max_iter"] <= hgb_mod.HGB_MAX_ITER
+    assert metadata["max_iter"] in metadata["max_iter_by_params"].values()
+    assert len(metadata["max_iter_by_params"]) == 4
+
+    # First run: nothing to score drift against yet, but the sketches are stored for the next one
+    assert metadata["drift"] is None
+    assert metadata["feature_sketches"]["features"]["soil_humidity"]["count"] > 0
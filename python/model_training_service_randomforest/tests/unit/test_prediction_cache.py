@@ -0,0 +1,101 @@
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+
+import models.export as export_mod
+import services.artifacts as artifacts_mod
+import services.prediction_cache as cache_mod
+from features.engineering import FEATURE_COLS
+from features.temporal import TemporalSpec
+from models.export import export_onnx, save_model_artifacts
+from services.prediction_cache import CachedPredictor, PredictionCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_prediction_cache_lru_and_ttl():
+    clock = FakeClock()
+    cache = PredictionCache(max_entries=2, ttl_s=10, clock=clock)
+
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1       # a is now most recently used
+    cache.put("c", 3)                # evicts b
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+    clock.now = 11
+    assert cache.get("a") is None    # expired
+
+    assert cache.stats() == {"entries": 1, "hits": 2, "misses": 2, "hit_rate": 0.5,
+                             "evictions": 1, "expirations": 1, "invalidations": 0}
+
+
+def _publish_model(seed, ts_str):
+    rng = np.random.default_rng(seed)
+    X = rng.uniform(0, 100, (200, len(FEATURE_COLS)))
+    estimator = RandomForestRegressor(n_estimators=5, random_state=seed).fit(X, X[:, 0] * 3 + rng.normal(0, 1, 200))
+    save_model_artifacts(export_onnx(estimator, len(FEATURE_COLS)), {}, "soil_humidity_test", ts_str, upload=False)
+    return X
+
+
+def test_cached_predictor_hits_on_near_identical_inputs_and_invalidates_on_publish(monkeypatch, tmp_path):
+    monkeypatch.setattr(export_mod, "LOCAL_MODELS_DIR", str(tmp_path))
+    monkeypatch.setattr(artifacts_mod, "download_latest_blob", lambda *args: None)
+    X = _publish_model(0, "20250101000000")
+
+    predictor = CachedPredictor("soil_humidity_test", models_dir=str(tmp_path), refresh_s=3600)
+    try:
+        # Rows on the quantization grid, so the noise below cannot cross a rounding boundary
+        X = predictor.quantize(X) * predictor.steps
+        first = predictor.predict(X[:10])
+        assert predictor.version == "soil_humidity_test_20250101000000"
+        assert predictor.cache.stats()["misses"] == 10
+
+        # Sensor noise below the quantization step: served from the cache
+        again = predictor.predict(X[:10] + 1e-4)
+        assert np.array_equal(first, again)
+        assert predictor.cache.stats()["hits"] == 10
+
+        # Cached results are the model's output for the quantized input
+        expected = predictor._session.run(None, {"input": X[:10].astype(np.float32)})[0].ravel()
+        assert np.allclose(first, expected)
+
+        _publish_model(1, "20250102000000")
+        assert predictor.version == "soil_humidity_test_20250102000000"
+        assert len(predictor.cache) == 0 and predictor.cache.stats()["invalidations"] == 2
+
+        predictor.predict(X[:10])
+        assert predictor.cache.stats()["misses"] == 20
+    finally:
+        predictor.close()
+
+
+def test_cached_predictor_serves_a_temporal_feature_model(monkeypatch, tmp_path):
+    monkeypatch.setattr(export_mod, "LOCAL_MODELS_DIR", str(tmp_path))
+    monkeypatch.setattr(artifacts_mod, "download_latest_blob", lambda *args: None)
+    feature_names = FEATURE_COLS + TemporalSpec((30, 60), (60,), (60,), 10).feature_cols
+    rng = np.random.default_rng(2)
+    X = rng.uniform(0, 1, (200, len(feature_names)))
+    estimator = RandomForestRegressor(n_estimators=5, random_state=2).fit(X, X[:, -1] * 100)
+    save_model_artifacts(export_onnx(estimator, len(feature_names), feature_names=feature_names), {},
+                         "soil_humidity_temporal", "20250101000000", upload=False)
+
+    # Temporal features are not in PREDICTION_CACHE_QUANTA: they are rounded to the default step
+    predictor = CachedPredictor("soil_humidity_temporal", models_dir=str(tmp_path), feature_names=feature_names,
+                                refresh_s=3600)
+    try:
+        assert predictor.steps[-1] == cache_mod.PREDICTION_CACHE_DEFAULT_QUANTUM
+        first = predictor.predict(X[:5])
+        assert np.array_equal(predictor.predict(X[:5]), first)
+        assert predictor.cache.stats()["hits"] == 5
+        expected = predictor._session.run(None, {"input": (predictor.quantize(X[:5]) * predictor.steps)
+                                                 .astype(np.float32)})[0].ravel()
+        assert np.allclose(first, expected)
+    finally:
+        predictor.close()
@@ -0,0 +1,51 @@
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.model_selection import GridSearchCV, TimeSeriesSplit
+
+from models.search import neighbourhood_grid, previous_search, warm_started_search
+
+PARAM_GRID = {"n_estimators": [10, 20], "max_depth": [2, 4, None]}
+METADATA_KEYS = {"n_estimators": "n_estimators", "max_depth": "max_depth"}
+
+
+def _data(seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.uniform(size=(300, 3))
+    return X, 10 * X[:, 0] + np.sin(6 * X[:, 1]) + rng.normal(scale=0.1, size=300)
+
+
+def _make_search(grid):
+    return GridSearchCV(RandomForestRegressor(random_state=0), grid, cv=TimeSeriesSplit(n_splits=3),
+                        scoring="neg_root_mean_squared_error")
+
+
+def test_neighbourhood_grid_moves_one_parameter_at_a_time():
+    candidates = neighbourhood_grid(PARAM_GRID, {"n_estimators": 10, "max_depth": 4}, radius=1)
+
+    assert candidates == [
+        {"n_estimators": [10], "max_depth": [4]},
+        {"n_estimators": [20], "max_depth": [4]},
+        {"n_estimators": [10], "max_depth": [2]},
+        {"n_estimators": [10], "max_depth": [None]},
+    ]
+
+
+def test_previous_search_reads_models_trained_before_the_search_block():
+    legacy = {"n_estimators": 20, "max_depth": None, "rmse_cv": 1.5}
+
+    assert previous_search(legacy, METADATA_KEYS) == ({"n_estimators": 20, "max_depth": None}, 1.5)
+    assert previous_search({"n_estimators": 20}, METADATA_KEYS) == (None, None)
+
+
+def test_warm_start_keeps_neighbourhood_result_within_tolerance():
+    X, y = _data()
+    full, strategy = warm_started_search(_make_search, X, y, PARAM_GRID, None, METADATA_KEYS, radius=1,
+                                         tolerance=0.05)
+    assert strategy["strategy"] == "full" and strategy["candidates_evaluated"] == 6
+
+    search, strategy = warm_started_search(_make_search, X, y, PARAM_GRID, {"hyperparameter_search": strategy},
+                                           METADATA_KEYS, radius=1, tolerance=0.05)
+
+    assert strategy["strategy"] == "neighbourhood"
+    assert strategy["candidates_evaluated"] < 6
+    assert search.best_params_ == full.best_params_
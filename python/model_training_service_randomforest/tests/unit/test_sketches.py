@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+from features.sketches import (QuantileSketch, build_sketches, drift_scores, reference_sketches, sketches_from_dict,
+                               sketches_to_dict, update_feature_sketches)
+
+
+def test_sketch_quantiles_min_max_mean():
+    rng = np.random.default_rng(0)
+    values = rng.uniform(0, 100, size=200_000)
+
+    sketch = QuantileSketch().update(values[:120_000]).merge(QuantileSketch().update(values[120_000:]))
+
+    assert sketch.count == values.size
+    assert sketch.min == values.min().round(6) and sketch.max == values.max().round(6)
+    assert np.isclose(sketch.mean, values.mean())
+    # Rank error well below 2%
+    qs = np.array([0.05, 0.1, 0.5, 0.9])
+    assert np.abs(sketch.cdf(sketch.quantile(qs)) - qs).max() < 0.02
+    assert sum(level.size for level in sketch.levels) < 3 * sketch.k + 10
+
+
+def test_sketch_round_trip_and_drift():
+    ts = pd.date_range("2025-01-01", periods=2000, freq="10min")
+    df = pd.DataFrame({"timestamp": ts, "soil_humidity": np.linspace(20, 80, 2000)})
+    first = df.iloc[:1000]
+    metadata = {"feature_sketches": sketches_to_dict(build_sketches(first), first["timestamp"].max().isoformat())}
+
+    sketches, drift = update_feature_sketches(df, metadata, incremental=True)
+
+    # Second half only holds higher readings than anything seen before
+    assert drift["soil_humidity"] > 0.9
+    assert sketches["soil_humidity"].count == 2000
+
+    # A loaded sketch of a discrete feature compares equal to a fresh one
+    steps = pd.DataFrame({"timestamp": ts, "soil_delta": np.full(2000, -64 / 199)})
+    loaded = sketches_from_dict(sketches_to_dict(build_sketches(steps)))[0]
+    assert drift_scores(loaded, build_sketches(steps))["max"] == 0
+
+
+def test_drift_is_scored_against_the_previous_runs_reference_window():
+    # Air humidity moved from 40% to 60% three weeks in, and the newest day continues at 60%
+    ts = pd.date_range("2025-01-01", periods=31 * 144, freq="10min")
+    rng = np.random.default_rng(1)
+    air = np.where(ts < pd.Timestamp("2025-01-21"), 40.0, 60.0) + rng.normal(0, 2, len(ts))
+    df = pd.DataFrame({"timestamp": ts, "air_humidity": air})
+    previous = df[df["timestamp"] < pd.Timestamp("2025-01-31")]
+    watermark = previous["timestamp"].max().isoformat()
+
+    stale = {"feature_sketches": sketches_to_dict(build_sketches(previous), watermark)}
+    current = {"feature_sketches": sketches_to_dict(build_sketches(previous), watermark,
+                                                    reference=reference_sketches(previous, 7))}
+
+    # Against the whole history the day looks drifted, against the last week it does not
+    assert update_feature_sketches(df, stale, incremental=True)[1]["air_humidity"] > 0.5
+    _, drift = update_feature_sketches(df, current, incremental=True)
+    assert drift["air_humidity"] < 0.1
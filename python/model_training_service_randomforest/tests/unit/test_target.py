@@ -1,6 +1,10 @@
+import json
+
+import numpy as np
 import pandas as pd
 
-from src_rf.features.target import add_minutes_to_dry
+from data.preparation import prepare_training_frame
+from src_rf.features.target import add_minutes_to_dry, add_minutes_to_dry_grid
 
 
 def test_add_minutes_to_dry_all_above_threshold():
@@ -19,3 +23,48 @@ def test_add_minutes_to_dry_all_above_threshold():
     # threshold column should exist and match the input
     assert "threshold" in out.columns
     assert (out["threshold"] == thresh).all()
+
+
+def _drying_cycles(n=300):
+    # Soil dries by 1% per 10 min from 60% and is watered every 50 samples
+    return pd.DataFrame({
+        "timestamp": pd.date_range("2025-01-01", periods=n, freq="10min"),
+        "soil_humidity": 60.0 - (np.arange(n) % 50),
+    })
+
+
+def test_add_minutes_to_dry_grid_matches_single_threshold_targets():
+    df = _drying_cycles()
+    out = add_minutes_to_dry_grid(df, [20, 40])
+
+    for thresh in (20, 40):
+        single = add_minutes_to_dry(df.copy(), threshold=thresh).dropna(subset=["minutes_to_dry"])
+        stacked = out[out["threshold"] == thresh]
+        assert stacked["timestamp"].tolist() == single["timestamp"].tolist()
+        assert np.array_equal(stacked["minutes_to_dry"].to_numpy(), single["minutes_to_dry"].to_numpy())
+
+    # Chronological, so TimeSeriesSplit never trains on the future
+    assert out["timestamp"].is_monotonic_increasing
+
+
+def test_add_minutes_to_dry_grid_caps_rows_per_threshold():
+    out = add_minutes_to_dry_grid(_drying_cycles(), [20, 30, 40], max_rows=90)
+
+    assert len(out) == 90
+    assert (out.groupby("threshold").size() == 30).all()
+    assert out["timestamp"].is_monotonic_increasing
+
+
+def test_grid_without_samples_below_it_falls_back_to_the_threshold():
+    # Soil never dries below 62%, under every grid threshold; the received threshold is adjusted to the 10th percentile
+    ts = pd.date_range("2025-01-01", periods=600, freq="10min")
+    payload = json.dumps([{
+        "soil_humidity": 70.0 - (i % 100) * 0.08, "air_humidity": 50.0, "temperature": 20.0, "light": 100.0,
+        "timestamp": t.strftime("%Y-%m-%dT%H:%M:%S"),
+    } for i, t in enumerate(ts)])
+
+    df, threshold, profile, error = prepare_training_frame(payload, "30")
+
+    assert error is None and not df.empty
+    assert profile["threshold_grid"] is None
+    assert threshold > 62 and (df["threshold"] == threshold).all()
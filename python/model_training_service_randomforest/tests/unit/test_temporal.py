@@ -0,0 +1,76 @@
+import json
+
+import numpy as np
+import onnx
+import pandas as pd
+
+import data.preparation as preparation_mod
+import models.export as export_mod
+import models.histgradientboosting as hgb_mod
+import services.artifacts as artifacts_mod
+from features.engineering import FEATURE_COLS
+from features.temporal import TemporalFeatureState, TemporalSpec, add_temporal_features, temporal_state
+from models.histgradientboosting import train_model_hgb
+from tests.unit.test_histgradientboosting import _payload
+
+SPEC = TemporalSpec(lags_minutes=(30, 180), rolling_minutes=(60, 360), ewm_halflife_minutes=(60,))
+
+
+def _samples(n=1500, seed=0):
+    rng = np.random.default_rng(seed)
+    minutes = np.cumsum(rng.integers(5, 16, n))  # irregular 5-15 min sampling
+    minutes[n // 2:] += 300                       # and a 5 h sensor gap
+    return pd.DataFrame({
+        "timestamp": pd.Timestamp("2025-01-01") + pd.to_timedelta(minutes, unit="min"),
+        "device_id": np.where(rng.uniform(size=n) < 0.5, "a", "b"),
+        "soil_humidity": rng.uniform(10, 70, n),
+        "air_humidity": rng.uniform(30, 80, n),
+        "temperature": rng.uniform(15, 25, n),
+        "light": rng.uniform(0, 1000, n),
+    })
+
+
+def test_features_are_per_device_and_gap_aware():
+    df = _samples()
+    out = add_temporal_features(df, SPEC)
+
+    dev = out[out["device_id"] == "b"].reset_index(drop=True)
+    t = (dev["timestamp"] - dev["timestamp"][0]).dt.total_seconds().to_numpy() / 60
+    for i in range(0, len(dev), 11):
+        in_window = (t > t[i] - 60) & (t <= t[i])
+        assert np.isclose(dev["light_mean_60min"][i], dev["light"][in_window].mean())
+    # Right after the gap there is nothing to compare with
+    assert (out.loc[len(df) // 2, ["soil_humidity_change_30min", "soil_humidity_change_180min"]] == 0).all()
+
+
+def test_incremental_update_from_state_matches_full_pass():
+    df = _samples()
+    full = add_temporal_features(df, SPEC)
+    watermark = df["timestamp"].iloc[1000]
+
+    state = temporal_state(full[full["timestamp"] <= watermark], SPEC)
+    state = TemporalFeatureState.from_dict(json.loads(json.dumps(state.to_dict())))
+    new = add_temporal_features(df[df["timestamp"] > watermark], SPEC, state)
+
+    expected = full[full["timestamp"] > watermark]
+    for col in SPEC.feature_cols:
+        np.testing.assert_allclose(new[col], expected[col], rtol=1e-6, atol=1e-9, err_msg=col)
+
+
+def test_trainer_exports_temporal_features_with_their_names(monkeypatch, tmp_path):
+    monkeypatch.setattr(export_mod, "LOCAL_MODELS_DIR", str(tmp_path))
+    monkeypatch.setattr(hgb_mod, "LOCAL_MODELS_DIR", str(tmp_path))
+    monkeypatch.setattr(artifacts_mod, "download_latest_blob", lambda *args: None)
+    monkeypatch.setattr(preparation_mod, "TEMPORAL_FEATURES", True)
+
+    result = train_model_hgb(_payload(), json.dumps(30))
+
+    metadata = json.loads((tmp_path / result["metadata_file"]).read_text())
+    temporal = metadata["temporal_features"]
+    assert metadata["feature_names"] == FEATURE_COLS + temporal["feature_names"]
+    assert temporal["state"]["devices"]["all"]["timestamp"][-1] == "2025-01-05T03:50:00"
+
+    onnx_model = onnx.load(str(tmp_path / result["model_file"]))
+    props = {p.key: p.value for p in onnx_model.metadata_props}
+    assert json.loads(props["feature_names"]) == metadata["feature_names"]
+    assert onnx_model.graph.input[0].type.tensor_type.shape.dim[1].dim_value == len(metadata["feature_names"])
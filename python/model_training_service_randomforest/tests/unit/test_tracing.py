@@ -0,0 +1,51 @@
+import json
+from collections import Counter
+
+import models.export as export_mod
+import models.randomforest as rf_mod
+import scheduler as scheduler_mod
+import services.artifacts as artifacts_mod
+import services.tracing as tracing
+from tests.unit.test_histgradientboosting import _payload
+
+
+def test_traced_job_writes_nested_spans_and_profile(monkeypatch, tmp_path):
+    trace_dir = tmp_path / "traces"
+    monkeypatch.setattr(tracing, "TRACE_ENABLED", True)
+    monkeypatch.setattr(tracing, "TRACE_DIR", str(trace_dir))
+    monkeypatch.setattr(tracing, "TRACE_PROFILER", "sampling")
+
+    monkeypatch.setattr(export_mod, "LOCAL_MODELS_DIR", str(tmp_path))
+    monkeypatch.setattr(rf_mod, "LOCAL_MODELS_DIR", str(tmp_path))
+    monkeypatch.setattr(artifacts_mod, "download_latest_blob", lambda *args: None)
+    monkeypatch.setattr(export_mod, "upload_to_blob", lambda *args: None)
+
+    payload = json.loads(_payload())
+    monkeypatch.setattr(scheduler_mod, "fetch_sensor_data", lambda timeout=...: payload)
+    monkeypatch.setattr(scheduler_mod, "fetch_threshold", lambda timeout=...: 30)
+
+    scheduler_mod.job()
+
+    (trace_file,) = trace_dir.glob("job_*.trace.jsonl")
+    records = [json.loads(line) for line in trace_file.read_text().splitlines()]
+    by_id = {r["span_id"]: r for r in records}
+    names = Counter(r["name"] for r in records)
+
+    for name in ("job", "fetch", "train_model_rf", "parse", "clean", "target", "features", "fit", "export", "upload"):
+        assert names[name] == 1, name
+    # 2 x 3 grid candidates
+    assert names["cv_fit"] == 6
+    assert all(r["status"] == "ok" for r in records)
+
+    def parent(name):
+        record = next(r for r in records if r["name"] == name)
+        return by_id[record["parent_id"]]["name"] if record["parent_id"] else None
+
+    assert parent("job") is None
+    assert parent("train_model_rf") == "job"
+    assert parent("parse") == "train_model_rf"
+    assert parent("search_full") == "fit"
+    assert parent("cv_fit") == "search_full"
+
+    (profile,) = trace_dir.glob("job_*.folded")
+    assert any("grid" in line or "fit" in line for line in profile.read_text().splitlines())
@@ -0,0 +1,129 @@
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from features.sketches import build_sketches, sketches_to_dict
+from triggers import RetrainCoordinator, RetrainTrigger
+
+
+def _samples(start, n, soil=40.0):
+    ts = pd.date_range(start, periods=n, freq="10min")
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "timestamp": ts,
+        "soil_humidity": soil + rng.normal(0, 2, n),
+        "air_humidity": 50.0,
+        "temperature": 20.0,
+        "light": 100.0,
+    })
+
+
+def _payload(df):
+    rows = df.assign(timestamp=df["timestamp"].dt.strftime("%Y-%m-%dT%H:%M:%S")).to_dict(orient="records")
+    return {"response": {"list": [{"SampleDTO": r} for r in rows]}}
+
+
+def _trigger(history, new, **kwargs):
+    metadata = {"feature_sketches": sketches_to_dict(build_sketches(history),
+                                                     watermark=history["timestamp"].max().isoformat())}
+    trigger = RetrainTrigger(lambda: metadata, fetch_since=lambda since: _payload(new), **kwargs)
+    trigger.refresh()
+    return trigger
+
+
+def test_trigger_counts_new_samples_and_scores_drift():
+    history = _samples("2025-01-01", 500)
+
+    quiet = _trigger(history, _samples("2025-01-05", 50), min_new_samples=100, drift_min_samples=20)
+    assert quiet.check() == []
+    assert quiet.new_samples == 50
+
+    busy = _trigger(history, _samples("2025-01-05", 150), min_new_samples=100, drift_min_samples=20)
+    assert busy.check() == ["new_samples=150"]
+
+    # Soil suddenly much wetter: few samples, but far from the reference distribution
+    drifted = _trigger(history, _samples("2025-01-05", 30, soil=70.0), min_new_samples=100, drift_min_samples=20)
+    reasons = drifted.check()
+    assert len(reasons) == 1 and reasons[0].startswith("drift=")
+
+    empty = RetrainTrigger(lambda: None, fetch_since=lambda since: {"response": {"list": []}})
+    empty.refresh()
+    assert empty.check() == ["no_model"]
+
+
+def test_coordinator_merges_triggers_and_respects_min_interval():
+    now = [0.0]
+    runs = []
+    coordinator = RetrainCoordinator(runs.append, debounce_s=60, min_interval_s=3600, clock=lambda: now[0])
+
+    coordinator.request("new_samples=150")
+    now[0] = 30
+    coordinator.request("drift=0.5")
+    coordinator.request("new_samples=160")
+    assert not coordinator.tick()  # still inside the debounce window
+
+    now[0] = 61
+    assert coordinator.tick()
+    assert runs == [["new_samples=160", "drift=0.5"]]
+
+    # A new trigger shortly after the run waits for the minimum interval
+    coordinator.request("drift=0.6", delay=0)
+    now[0] = 600
+    assert not coordinator.tick()
+    now[0] = 61 + 3600
+    assert coordinator.tick()
+    assert runs[-1] == ["drift=0.6"]
+
+
+def test_checks_from_scheduler_threads_do_not_interleave():
+    history, new = _samples("2025-01-01", 500), _samples("2025-01-05", 50)
+    active, overlaps = [0], []
+
+    def slow_fetch(since):
+        active[0] += 1
+        overlaps.append(active[0])
+        time.sleep(0.05)
+        active[0] -= 1
+        return _payload(new)
+
+    trigger = _trigger(history, new, min_new_samples=100, drift_min_samples=20)
+    trigger.fetch_since = slow_fetch
+    threads = [threading.Thread(target=trigger.check) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert max(overlaps) == 1 and trigger.check_new_samples() == ([], 50)
+
+    # A failed check forgets the previous count, so the cron fallback does not skip on a stale 0
+    trigger.fetch_since = lambda since: 1 / 0
+    with pytest.raises(ZeroDivisionError):
+        trigger.check_new_samples()
+    assert trigger.new_samples is None
+
+
+def test_coordinator_backs_off_after_failed_runs():
+    now = [0.0]
+    statuses = ["failed", "failed", "trained"]
+    coordinator = RetrainCoordinator(lambda reasons: statuses.pop(0), debounce_s=0, min_interval_s=3600,
+                                     max_backoff_s=4 * 3600, clock=lambda: now[0])
+
+    coordinator.request("drift=0.5")
+    assert coordinator.tick() and coordinator.failures == 1
+
+    # The trigger keeps firing: after one failure the next run waits twice the minimum interval
+    coordinator.request("drift=0.5")
+    now[0] = 3600
+    assert not coordinator.tick()
+    now[0] = 2 * 3600
+    assert coordinator.tick() and coordinator.failures == 2
+
+    coordinator.request("drift=0.5")
+    now[0] = 2 * 3600 + 3 * 3600
+    assert not coordinator.tick()
+    now[0] = 2 * 3600 + 4 * 3600  # four times the minimum interval, here also max_backoff_s
+    assert coordinator.tick() and coordinator.failures == 0
+    assert coordinator.interval() == 3600
@@ -0,0 +1,57 @@
+# tests/unit/test_window.py
+import numpy as np
+import pandas as pd
+
+from src_rf.data.window import CYCLE_COL, apply_training_window, downsample_training_rows
+
+
+def _samples(n=2000, freq="10min", start="2025-01-01"):
+    # Soil dries by 1% per sample from 60% and is watered every 40 samples
+    return pd.DataFrame({
+        "timestamp": pd.date_range(start, periods=n, freq=freq),
+        "soil_humidity": 60.0 - (np.arange(n) % 40),
+        "soil_delta": np.where(np.arange(n) % 40 == 0, 0.0, -1.0),
+    })
+
+
+def test_window_drops_old_samples_and_resamples_onto_grid():
+    df = _samples(n=3000, freq="5min")
+    # Jitter the timestamps so the raw data is irregular
+    df["timestamp"] += pd.to_timedelta(np.random.default_rng(0).integers(0, 60, len(df)), unit="s")
+
+    out, window = apply_training_window(df, max_age_days=5, resample_minutes=10)
+
+    assert out["timestamp"].min() >= df["timestamp"].max() - pd.Timedelta(days=5, minutes=10)
+    assert (out["timestamp"].diff().dropna() == pd.Timedelta(minutes=10)).all()
+    # Two 1% steps per grid step within a cycle
+    assert (out["soil_delta"].value_counts().idxmax()) == -2.0
+    assert window["samples_in"] == 3000
+    assert window["samples_in_window"] == len(out)
+    assert window["drying_cycles"] == out[CYCLE_COL].nunique() > 1
+
+
+def test_downsample_keeps_every_cycle_and_favours_recent_rows():
+    df, _window = apply_training_window(_samples(n=4000))
+    n_cycles = df[CYCLE_COL].nunique()
+
+    out, rows = downsample_training_rows(df, max_rows=500, half_life_days=3)
+
+    assert rows == {"rows_labelled": 4000, "rows_used": len(out)}
+    assert len(out) <= 500
+    assert out[CYCLE_COL].nunique() == n_cycles
+    assert out["timestamp"].is_monotonic_increasing
+
+    newest_day = out["timestamp"] > out["timestamp"].max() - pd.Timedelta(days=1)
+    oldest_day = out["timestamp"] < out["timestamp"].min() + pd.Timedelta(days=1)
+    assert newest_day.sum() > 4 * oldest_day.sum()
+
+
+def test_downsample_stratifies_by_threshold():
+    df, _window = apply_training_window(_samples(n=1000))
+    stacked = pd.concat([df.assign(threshold=t) for t in (20, 40)]).sort_values("timestamp", kind="stable")
+
+    out, _rows = downsample_training_rows(stacked, max_rows=300)
+
+    assert len(out) == 300
+    assert (out.groupby([CYCLE_COL, "threshold"]).size() > 0).all()
+    assert out.groupby([CYCLE_COL, "threshold"]).ngroups == stacked.groupby([CYCLE_COL, "threshold"]).ngroups